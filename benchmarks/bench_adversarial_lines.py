@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк враждебных строк: худшее время шаблонов парсеров и защита TemplateParser
+
+1. Каждая строка-ловушка (длинные пробелы, повторы флагов и слов, строки
+   на 4 тысячи символов) парсится каждым парсером напрямую - так видно,
+   какие шаблоны перебираются долго.
+2. Вставленный текст из таких строк целиком разбирается parse_message:
+   длинные строки отсекает классификатор, а строки на пределе длины
+   проходят через бюджет времени на строку.
+
+Запуск: python benchmarks/bench_adversarial_lines.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+# Общая база в памяти: сохранения идут из потока sync_to_async
+settings.DATABASES['default']['NAME'] = 'file:bench_adversarial?mode=memory&cache=shared'
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+from services.hybrid_parser import template_parser
+from services.line_classifier import MAX_LINE_LENGTH
+
+# Длина строк-ловушек: как одна строка в сообщении Telegram
+LONG_LINE = 4000
+
+
+def repeat_to(prefix: str, unit: str, suffix: str, length: int) -> str:
+    """prefix + unit * n + suffix длиной не больше length"""
+    count = max(1, (length - len(prefix) - len(suffix)) // len(unit))
+    return prefix + unit * count + suffix
+
+
+def adversarial_lines(length: int) -> List[Tuple[str, str]]:
+    """Строки-ловушки длиной около length: (название, строка)"""
+    return [
+        ('пробелы после цвета', repeat_to('Ultra 2 49mm Black', ' ', 'x', length)),
+        ('повтор флагов', repeat_to('MacBook Air 13 M2 16 128 Black ', '🇺🇸', '', length)),
+        ('повтор цвета', repeat_to('Ultra 2 49mm ', 'Black ', 'M/L - x', length)),
+        ('повтор слов iPhone', repeat_to('16 Pro 128 ', 'Black ', '-', length)),
+        ('незакрытая скобка iPad', repeat_to('iPad Air (', 'a b ', '', length)),
+        ('повтор ремешка Watch', repeat_to('Apple Watch S10 42 ', 'Rose ', 'Al LB S/M GPS', length)),
+        ('пробелы AirPods', repeat_to('AirPods Pro 2', ' ', 'x 1', length)),
+    ]
+
+
+def time_parsers(line: str) -> Tuple[str, float]:
+    """Самый медленный парсер для строки без предварительных проверок"""
+    worst_device, worst_ms = '', 0.0
+    for device_type, parser_info in template_parser.device_parsers.items():
+        start = time.perf_counter()
+        try:
+            parser_info['parser'].parse_lines([line])
+        except Exception:
+            pass
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > worst_ms:
+            worst_device, worst_ms = device_type, elapsed_ms
+    return worst_device, worst_ms
+
+
+async def time_message(lines: List[str]) -> Tuple[float, dict]:
+    start = time.perf_counter()
+    results = await template_parser.parse_message('\n'.join(lines), "benchmark")
+    return time.perf_counter() - start, results
+
+
+def main():
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    print(f"🧨 Строки-ловушки, парсеры напрямую (предел длины строки: {MAX_LINE_LENGTH})")
+    print(f"{'строка':<26} {'длина':>6} {'худший парсер':>14} {'мс':>8} {'на пределе, мс':>15}")
+    for (name, line), (_, capped_line) in zip(adversarial_lines(LONG_LINE), adversarial_lines(MAX_LINE_LENGTH)):
+        device_type, elapsed_ms = time_parsers(line)
+        _, capped_ms = time_parsers(capped_line)
+        print(f"{name:<26} {len(line):>6} {device_type:>14} {elapsed_ms:>8.1f} {capped_ms:>15.2f}")
+    print()
+
+    print("📋 Вставленный текст целиком через parse_message")
+    for title, length, copies in [('строки по 4000 символов', LONG_LINE, 20),
+                                  (f'строки на пределе ({MAX_LINE_LENGTH})', MAX_LINE_LENGTH, 300)]:
+        lines = [line for _, line in adversarial_lines(length)] * copies
+        elapsed, results = asyncio.run(time_message(lines))
+        print(f"   {title}: {len(lines)} строк за {elapsed * 1000:.0f} мс, "
+              f"отсечено длинных: {results['too_long_lines']}, "
+              f"дольше бюджета: {len(results['overruns'])}")
+
+
+if __name__ == "__main__":
+    main()
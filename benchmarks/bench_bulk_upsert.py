@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: количество SQL-запросов при сохранении прайса
+
+Сравнивает построчное сохранение (update_or_create на каждую строку через
+sync_to_async) с пакетным upsert из services/bulk_upsert.py.
+Прайс bot/exampleprices.txt сохраняется дважды: в пустую базу и повторно.
+
+Запуск: python benchmarks/bench_bulk_upsert.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+# Общая база в памяти: сохранения идут из потока sync_to_async
+settings.DATABASES['default']['NAME'] = 'file:bench_bulk_upsert?mode=memory&cache=shared'
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db.backends.signals import connection_created
+
+from services.hybrid_parser import template_parser
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+
+
+class QueryCounter:
+    """Считает SQL-запросы во всех потоках (обертка ставится на каждое новое соединение)"""
+
+    def __init__(self):
+        self.queries = 0
+        connection_created.connect(self._install)
+
+    def _install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def parse_message_items(text: str) -> List[Tuple[str, Any, List[Any]]]:
+    """Парсит сообщение так же, как TemplateParser, но без сохранения"""
+    lines = text.strip().split('\n')
+    routed_lines, _ = template_parser.classifier.classify(lines)
+    processed_lines = set()
+    result = []
+
+    sorted_parsers = sorted(template_parser.device_parsers.items(), key=lambda x: x[1].get('priority', 999))
+    for device_type, parser_info in sorted_parsers:
+        device_lines = [line for line in routed_lines[device_type] if line.strip() not in processed_lines]
+        parsed_data, _ = parser_info['parser'].parse_lines(device_lines)
+        processed_lines.update(data.source_line.strip() for data in parsed_data)
+        result.append((device_type, parser_info['service'], parsed_data))
+
+    return result
+
+
+async def save_per_row(items: List[Tuple[str, Any, List[Any]]], source: str) -> int:
+    """Старая схема: отдельный update_or_create и переход в поток на каждую строку"""
+    saved_count = 0
+    for device_type, service, parsed_data in items:
+        for data in parsed_data:
+            if device_type == 'iphone':
+                saved = await service._save_iphone_price(data, source)
+            elif device_type in ('macbook', 'ipad'):
+                saved = await getattr(service, f'save_{device_type}_price')({**data.to_dict(), 'source': source})
+            else:
+                saved = await getattr(service, f'save_{device_type}_price')(service._item_to_dict(data, source))
+            if saved:
+                saved_count += 1
+    return saved_count
+
+
+async def save_bulk(items: List[Tuple[str, Any, List[Any]]], source: str) -> int:
+    """Новая схема: одна пачка на модель"""
+    saved_count = 0
+    for _, service, parsed_data in items:
+        save_result = await service.save_parsed_prices(parsed_data, source)
+        saved_count += save_result['total_saved']
+    return saved_count
+
+
+def clear_tables():
+    """Очищает таблицы устройств перед следующим прогоном"""
+    from db_app.models import IPhone, MacBook, iPad, AppleWatch, iMac, AirPods, ApplePencil
+    for model in (IPhone, MacBook, iPad, AppleWatch, iMac, AirPods, ApplePencil):
+        model.objects.all().delete()
+
+
+def run_mode(name: str, save_func, items, counter: QueryCounter) -> Dict[str, Any]:
+    """Сохраняет прайс дважды (пустая база и повторная загрузка) и считает запросы"""
+    clear_tables()
+    report = {}
+    for stage in ('первая загрузка', 'повторная загрузка'):
+        counter.queries = 0
+        start = time.perf_counter()
+        saved_count = asyncio.run(save_func(items, "benchmark"))
+        elapsed = time.perf_counter() - start
+        report[stage] = (counter.queries, saved_count, elapsed)
+        print(f"   {name}, {stage}: {counter.queries} запросов, сохранено {saved_count}, {elapsed:.3f}s")
+    return report
+
+
+def main():
+    # Логи на каждую строку искажают замер времени
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    counter = QueryCounter()
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    items = parse_message_items(text)
+    total_items = sum(len(parsed_data) for _, _, parsed_data in items)
+
+    print(f"📄 Строк в сообщении: {len(text.strip().splitlines())}, распознано: {total_items}")
+    run_mode("🐢 update_or_create", save_per_row, items, counter)
+    run_mode("⚡ bulk upsert", save_bulk, items, counter)
+
+
+if __name__ == "__main__":
+    main()
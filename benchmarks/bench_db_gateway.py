@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк DatabaseGateway: чтения каталога во время загрузки большого прайса
+
+Пока parse_message сохраняет размноженный bot/exampleprices.txt, несколько
+"пользователей" раз в READ_INTERVAL перестраивают каталог
+(CatalogService._build_catalog_data, чтение всех таблиц устройств). Сравниваются две схемы:
+- один общий поток для чтений и записей (как sync_to_async с thread_sensitive=True);
+- шлюз: пул потоков чтения и поток записи пачками.
+Затем много коротких сообщений сохраняются одновременно - видно объединение записей.
+
+База - временный файл SQLite, чтобы блокировки были как в работе бота.
+
+Запуск: python benchmarks/bench_db_gateway.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+settings.DATABASES['default']['NAME'] = str(Path(DATABASE_DIR.name) / 'bench_db_gateway.sqlite3')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+from services.catalog_service import CatalogService
+from services.db_gateway import DatabaseLane, db_gateway, DB_READ_THREADS, DB_WRITE_BATCH
+from services.hybrid_parser import template_parser
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+
+PRICE_LIST_COPIES = 10
+READERS = 4
+# Пауза читателя между запросами каталога (пользователь листает каталог)
+READ_INTERVAL = 0.1
+SHORT_MESSAGES = 200
+
+
+def expand_text(text: str, copies: int, shift: int) -> str:
+    """Копии прайса с разными ценами (shift меняет цены между прогонами)"""
+    return '\n'.join(text.replace('000', f'0{shift}{copy}') for copy in range(copies))
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+def use_lanes(shared: bool):
+    """Один общий поток для всего или отдельные очереди чтения и записи"""
+    db_gateway.close()
+    if shared:
+        lane = DatabaseLane('shared', 1)
+        db_gateway.reads = db_gateway.writes = lane
+    else:
+        db_gateway.reads = DatabaseLane('read', DB_READ_THREADS)
+        db_gateway.writes = DatabaseLane('write', 1, batch_size=DB_WRITE_BATCH)
+
+
+async def read_catalog(done: asyncio.Event, latencies: List[float]):
+    catalog_service = CatalogService()
+    while not done.is_set():
+        start = time.perf_counter()
+        await catalog_service._build_catalog_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(READ_INTERVAL)
+
+
+async def ingest_with_readers(text: str, source: str) -> Dict[str, Any]:
+    done = asyncio.Event()
+    latencies: List[float] = []
+    readers = [asyncio.create_task(read_catalog(done, latencies)) for _ in range(READERS)]
+
+    start = time.perf_counter()
+    results = await template_parser.parse_message(text, source)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*readers)
+
+    return {
+        'elapsed': elapsed,
+        'saved': results['total_saved'],
+        'reads': len(latencies),
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+    }
+
+
+async def short_messages(lines: List[str], shift: int) -> float:
+    """Одновременные сообщения из одной строки (как поток сообщений userbot)"""
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        template_parser.parse_message(line.replace('000', f'0{shift}0'), f"bench-short-{shift}-{index}")
+        for index, line in enumerate(lines)
+    ])
+    return time.perf_counter() - start
+
+
+def main():
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    base_text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    price_lines = [line for line in base_text.split('\n') if template_parser.classifier.candidates(line)]
+    step = max(1, len(price_lines) // SHORT_MESSAGES)
+    sample_lines = price_lines[::step][:SHORT_MESSAGES]
+
+    # Первая загрузка заполняет пустую базу, чтобы чтения во время замеров читали полный каталог
+    asyncio.run(template_parser.parse_message(expand_text(base_text, PRICE_LIST_COPIES, 0), "bench-fill"))
+
+    print(f"📄 Прайс x{PRICE_LIST_COPIES}, читателей каталога: {READERS}, "
+          f"потоков чтения: {DB_READ_THREADS}, пачка записи: {DB_WRITE_BATCH}")
+    for shift, (title, shared) in enumerate([('один общий поток', True), ('шлюз чтение/запись', False)], 1):
+        use_lanes(shared)
+        ingest = asyncio.run(ingest_with_readers(expand_text(base_text, PRICE_LIST_COPIES, shift), f"bench-{shift}"))
+        short_elapsed = asyncio.run(short_messages(sample_lines, shift))
+        metrics = db_gateway.metrics()
+
+        print(f"\n🔧 {title}")
+        print(f"   Загрузка прайса: {ingest['elapsed']:.2f}s, сохранено {ingest['saved']}")
+        print(f"   Чтений каталога во время загрузки: {ingest['reads']}, "
+              f"p50 {ingest['p50']:.0f} мс, p99 {ingest['p99']:.0f} мс")
+        print(f"   {len(sample_lines)} коротких сообщений одновременно: {short_elapsed:.2f}s")
+        for lane, lane_metrics in metrics.items():
+            lane = 'общая' if shared else lane
+            print(f"   Очередь {lane}: выполнено {lane_metrics['done']} за {lane_metrics['batches']} пачек, "
+                  f"макс. глубина {lane_metrics['max_depth']}, ожидание {lane_metrics['avg_wait_ms']:.1f} мс, "
+                  f"выполнение {lane_metrics['avg_run_ms']:.1f} мс")
+            if shared:
+                break
+
+    db_gateway.close()
+
+
+if __name__ == "__main__":
+    main()
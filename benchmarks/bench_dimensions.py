@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк интернирования измерений: ключ уникальности по строкам и по целым id
+
+Во временной базе SQLite создается --rows записей iPhone (поколение, вариант,
+память, цвет, страна, код страны). Для сравнения рядом с уникальным индексом по
+id измерений строится индекс по строковым столбцам, как был раньше. Замеряются
+размер обоих индексов, поиск записи по ключу в каждом и пакетное сохранение
+прайса (bulk_upsert): число запросов к таблице измерений при повторном прайсе.
+
+Запуск: python benchmarks/bench_dimensions.py [--rows 50000] [--probes 20000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+settings.DATABASES['default']['NAME'] = str(Path(DATABASE_DIR.name) / 'bench_dimensions.sqlite3')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from db_app.models import IPhone
+from services.bulk_upsert import bulk_upsert_service
+from services.dimensions import dimension_cache
+
+STRING_INDEX = 'bench_iphone_string_key'
+STRING_KEY = ['generation', 'variant', 'storage', 'color', 'country', 'country_code']
+INT_KEY = ['generation_dim_id', 'variant_dim_id', 'storage_dim_id', 'color_dim_id', 'country_dim_id', 'country_code']
+
+GENERATIONS = ['13', '14', '15', '16', '16E', '17']
+VARIANTS = ['', 'Plus', 'Pro', 'Pro Max']
+STORAGES = ['128GB', '256GB', '512GB', '1TB', '2TB']
+COUNTRIES = ['🇺🇸', '🇯🇵', '🇮🇳', '🇭🇰', '🇪🇺', '🇦🇪', '🇨🇳', '🇰🇷', '🇬🇧', '🇨🇦']
+CODES = ['', '2SIM', 'eSIM']
+
+
+def generate_rows(count: int):
+    """Уникальные строки прайса; цвета нумеруются, чтобы набрать нужное число конфигураций"""
+    colors = max(1, count // (len(GENERATIONS) * len(VARIANTS) * len(STORAGES) * len(COUNTRIES) * len(CODES)) + 1)
+    rows = []
+    for generation in GENERATIONS:
+        for variant in VARIANTS:
+            for storage in STORAGES:
+                for color in range(colors):
+                    for country in COUNTRIES:
+                        for code in CODES:
+                            lookup = {'generation': generation, 'variant': variant, 'storage': storage,
+                                      'color': f"Color {color}", 'country': country, 'country_code': code}
+                            rows.append((lookup, {'price': 50000 + len(rows) % 1000, 'source': ''}))
+    return rows[:count]
+
+
+def page_count() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA page_count')
+        return cursor.fetchone()[0]
+
+
+def index_size_mb(sql: str) -> float:
+    """Размер индекса: прирост файла базы после его создания"""
+    before = page_count()
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        cursor.execute('PRAGMA page_size')
+        page_size = cursor.fetchone()[0]
+    return (page_count() - before) * page_size / 1024 / 1024
+
+
+def time_probes(columns, keys) -> float:
+    """Среднее время поиска записи по ключу, мкс"""
+    conditions = ' AND '.join(f'{column} = %s' for column in columns)
+    sql = f"SELECT id FROM {IPhone._meta.db_table} WHERE {conditions}"
+    with connection.cursor() as cursor:
+        start = time.perf_counter()
+        for key in keys:
+            cursor.execute(sql, key)
+            assert cursor.fetchone() is not None
+        return (time.perf_counter() - start) / len(keys) * 1000 * 1000
+
+
+class DimensionQueries:
+    """Считает запросы к таблице измерений"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'db_app_dimension' in sql:
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ключ уникальности по строкам и по id измерений")
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--probes', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+    dimension_cache.load_sync()
+
+    rows = generate_rows(args.rows)
+    start = time.perf_counter()
+    with transaction.atomic():
+        for index in range(0, len(rows), 5000):
+            bulk_upsert_service.upsert_sync(IPhone, rows[index:index + 5000])
+    print(f"📄 {len(rows)} записей iPhone, загрузка {time.perf_counter() - start:.1f}s")
+
+    # Оба индекса строятся одинаково (обычные, после VACUUM), чтобы размеры были сравнимы
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+    string_size = index_size_mb(
+        f"CREATE INDEX {STRING_INDEX} ON {IPhone._meta.db_table} ({', '.join(STRING_KEY)})")
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX {STRING_INDEX}")
+        cursor.execute('VACUUM')
+    int_size = index_size_mb(
+        f"CREATE INDEX bench_iphone_int_key ON {IPhone._meta.db_table} ({', '.join(INT_KEY)})")
+    index_size_mb(f"CREATE INDEX {STRING_INDEX} ON {IPhone._meta.db_table} ({', '.join(STRING_KEY)})")
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    random_generator = random.Random(0)
+    sample = random_generator.sample(list(IPhone.objects.values_list(*STRING_KEY, *INT_KEY)), args.probes)
+    string_time = time_probes(STRING_KEY, [key[:6] for key in sample])
+    int_time = time_probes(INT_KEY, [key[6:] for key in sample])
+    print(f"   индекс по строкам: {string_size:.2f} МБ, поиск {string_time:.1f} мкс")
+    print(f"   индекс по id:      {int_size:.2f} МБ, поиск {int_time:.1f} мкс")
+
+    counter = DimensionQueries()
+    prices = [(lookup, {**defaults, 'price': defaults['price'] + 100}) for lookup, defaults in rows[:1000]]
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        with transaction.atomic():
+            counts = bulk_upsert_service.upsert_sync(IPhone, prices)
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"   прайс из {len(prices)} строк: {elapsed:.0f} мс, обновлено {counts['updated']}, "
+          f"запросов к измерениям: {counter.queries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Набор бенчмарков пропускной способности парсеров на bot/exampleprices.txt
+
+Прайс берется как есть (x1) и размноженным в 10 и 100 раз (цены в копиях
+разные, как в test_parse_latency.py). Для каждого парсера и для
+TemplateParser.parse_message целиком считаются:
+- строк в секунду;
+- вызовов регулярных выражений на строку;
+- пиковая память (tracemalloc);
+- p50/p99 времени разбора одной строки (для parse_message - сообщения
+  из одной строки, с классификацией и сохранением).
+
+Результаты пишутся в JSON, чтобы сравнивать два коммита; с --compare
+скрипт завершается с кодом 1, если метрика ухудшилась больше допуска.
+
+Запуск:
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --scales 1,10 --output /tmp/new.json --compare /tmp/old.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+# Общая база в памяти: сохранения идут из потока sync_to_async
+settings.DATABASES['default']['NAME'] = 'file:bench_parsers?mode=memory&cache=shared'
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+from services.hybrid_parser import template_parser
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+DEFAULT_SCALES = "1,10,100"
+# Сколько строк разбирается отдельными сообщениями для задержки parse_message
+MESSAGE_SAMPLE_LINES = 200
+DEFAULT_TOLERANCE = 0.2
+
+# Метрики, по которым ищется регрессия: True - чем больше, тем лучше
+CHECKED_METRICS = {
+    'lines_per_sec': True,
+    'regex_calls_per_line': False,
+    'peak_memory_kb': False,
+    'p99_ms': False,
+}
+
+
+class RegexCallCounter:
+    """Считает вызовы методов re.Pattern (re.search и скомпилированные шаблоны)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def profile(self, frame, event, arg):
+        if event == 'c_call' and isinstance(getattr(arg, '__self__', None), re.Pattern):
+            self.calls += 1
+
+    def run(self, func: Callable, *args) -> Any:
+        self.calls = 0
+        sys.setprofile(self.profile)
+        try:
+            return func(*args)
+        finally:
+            sys.setprofile(None)
+
+
+def expand_text(text: str, copies: int) -> str:
+    """Прайс, повторенный copies раз; в копиях меняются цены, чтобы строки не совпадали"""
+    if copies == 1:
+        return text
+    return '\n'.join(text.replace('000', f'00{copy}') for copy in range(copies))
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+def measure_peak_memory(func: Callable, *args) -> Tuple[Any, float]:
+    """Выполняет func и возвращает пиковый прирост памяти в КБ"""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 1024
+
+
+def line_parse_func(parser_info: Dict[str, Any], device_lines: List[str],
+                    lines: List[str]) -> Callable[[int, str], Tuple[List[Any], List[str]]]:
+    """Разбор одной строки так же, как в TemplateParser._parse_device_lines"""
+    parser = parser_info['parser']
+    if parser_info.get('context'):
+        contexts = parser.section_contexts(device_lines, lines)
+        return lambda index, line: parser.parse_lines([line], contexts=[contexts[index]])
+    return lambda index, line: parser.parse_lines([line])
+
+
+def parse_block(parser_info: Dict[str, Any], device_lines: List[str], lines: List[str],
+                latencies: List[float] = None) -> List[Any]:
+    """Парсит блок строк устройства по одной, при необходимости с замером каждой строки"""
+    parse_line = line_parse_func(parser_info, device_lines, lines)
+    parsed_data = []
+    for index, line in enumerate(device_lines):
+        start = time.perf_counter()
+        line_parsed, _ = parse_line(index, line)
+        if latencies is not None:
+            latencies.append((time.perf_counter() - start) * 1000)
+        parsed_data.extend(line_parsed)
+    return parsed_data
+
+
+def bench_parsers(lines: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Метрики каждого парсера на строках, которые ему отдает классификатор"""
+    routed_lines, _ = template_parser.classifier.classify(lines)
+    processed_lines = set()
+    counter = RegexCallCounter()
+    results = {}
+
+    sorted_parsers = sorted(template_parser.device_parsers.items(), key=lambda x: x[1].get('priority', 999))
+    for device_type, parser_info in sorted_parsers:
+        device_lines = [line for line in routed_lines[device_type] if line.strip() not in processed_lines]
+        if not device_lines:
+            continue
+
+        # Подсчет вызовов и памяти идет первым и заодно прогревает парсер перед замером времени
+        parsed_data = counter.run(parse_block, parser_info, device_lines, lines)
+        processed_lines.update(data.source_line.strip() for data in parsed_data)
+        _, peak_kb = measure_peak_memory(parse_block, parser_info, device_lines, lines)
+
+        latencies: List[float] = []
+        start = time.perf_counter()
+        parse_block(parser_info, device_lines, lines, latencies)
+        elapsed = time.perf_counter() - start
+
+        results[device_type] = {
+            'lines': len(device_lines),
+            'parsed': len(parsed_data),
+            'lines_per_sec': len(device_lines) / elapsed,
+            'regex_calls_per_line': counter.calls / len(device_lines),
+            'peak_memory_kb': peak_kb,
+            'p50_ms': percentile(latencies, 50),
+            'p99_ms': percentile(latencies, 99),
+        }
+
+    return results
+
+
+def parse_message(text: str, source: str) -> Dict[str, Any]:
+    return asyncio.run(template_parser.parse_message(text, source))
+
+
+def count_message_regex_calls(text: str, source: str) -> Tuple[Dict[str, Any], int]:
+    """Вызовы regex при parse_message: в основном потоке и в потоках парсинга"""
+    counter = RegexCallCounter()
+    executor = template_parser.executor
+    # Профилировщик ставится в каждый поток парсинга при его запуске
+    template_parser.executor = ThreadPoolExecutor(
+        max_workers=executor._max_workers, thread_name_prefix='bench-parser',
+        initializer=sys.setprofile, initargs=(counter.profile,)
+    )
+    try:
+        results = counter.run(parse_message, text, source)
+    finally:
+        template_parser.executor.shutdown(wait=True)
+        template_parser.executor = executor
+    return results, counter.calls
+
+
+def bench_parse_message(text: str, scale: int) -> Dict[str, Any]:
+    """Метрики parse_message на всем тексте; источники разные, чтобы строки не пропускались как повторы"""
+    lines = text.strip().split('\n')
+
+    results, regex_calls = count_message_regex_calls(text, f"bench-x{scale}-regex")
+    _, peak_kb = measure_peak_memory(parse_message, text, f"bench-x{scale}-memory")
+
+    # Время меряется последним: цены уже в базе, как при повторной загрузке прайса
+    start = time.perf_counter()
+    parse_message(text, f"bench-x{scale}-time")
+    elapsed = time.perf_counter() - start
+
+    # Задержка сообщения из одной строки: строки берутся равномерно по прайсу
+    step = max(1, len(lines) // MESSAGE_SAMPLE_LINES)
+    latencies = []
+    for index in range(0, len(lines), step)[:MESSAGE_SAMPLE_LINES]:
+        start = time.perf_counter()
+        parse_message(lines[index], f"bench-x{scale}-line-{index}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'lines': len(lines),
+        'parsed': len(results['parsed_lines']),
+        'saved': results['total_saved'],
+        'lines_per_sec': len(lines) / elapsed,
+        'regex_calls_per_line': regex_calls / len(lines),
+        'peak_memory_kb': peak_kb,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(scales: List[int]) -> Dict[str, Any]:
+    base_text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'source_lines': len(base_text.strip().split('\n')),
+        'results': {},
+    }
+
+    for scale in scales:
+        text = expand_text(base_text, scale)
+        lines = text.strip().split('\n')
+        print(f"📄 x{scale}: {len(lines)} строк")
+        scale_results = bench_parsers(lines)
+        scale_results['parse_message'] = bench_parse_message(text, scale)
+        report['results'][f"x{scale}"] = scale_results
+        print_scale(scale_results)
+
+    return report
+
+
+def print_scale(scale_results: Dict[str, Dict[str, Any]]):
+    print(f"   {'':<14} {'строк':>7} {'строк/с':>9} {'regex/строка':>13} {'память, КБ':>11} {'p50, мс':>8} {'p99, мс':>8}")
+    for name, metrics in scale_results.items():
+        print(f"   {name:<14} {metrics['lines']:>7} {metrics['lines_per_sec']:>9.0f} "
+              f"{metrics['regex_calls_per_line']:>13.1f} {metrics['peak_memory_kb']:>11.0f} "
+              f"{metrics['p50_ms']:>8.3f} {metrics['p99_ms']:>8.3f}")
+    print()
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Метрики, ухудшившиеся относительно baseline больше чем на tolerance"""
+    regressions = []
+    for scale, scale_results in report['results'].items():
+        for name, metrics in scale_results.items():
+            base_metrics = baseline.get('results', {}).get(scale, {}).get(name)
+            if not base_metrics:
+                continue
+            for metric, higher_is_better in CHECKED_METRICS.items():
+                old, new = base_metrics.get(metric), metrics.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                    regressions.append(f"{scale} {name} {metric}: {old:.3f} -> {new:.3f} ({change * 100:+.0f}%)")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарки парсеров прайсов")
+    arg_parser.add_argument('--scales', default=DEFAULT_SCALES, help="во сколько раз размножить прайс, через запятую")
+    arg_parser.add_argument('--output', type=Path, help="JSON с результатами (по умолчанию benchmarks/results/<коммит>.json)")
+    arg_parser.add_argument('--compare', type=Path, help="JSON прошлого запуска для поиска регрессий")
+    arg_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="допустимое ухудшение метрики (доля)")
+    args = arg_parser.parse_args()
+
+    # Логи парсеров на каждую строку искажают замер времени
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    report = run_benchmarks([int(scale) for scale in args.scales.split(',')])
+
+    output = args.output or RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"💾 Результаты: {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = find_regressions(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Регрессии относительно {baseline.get('commit')} (допуск {args.tolerance * 100:.0f}%):")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ Регрессий относительно {baseline.get('commit')} нет (допуск {args.tolerance * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк истории цен: запросы по одному SKU на истории за полгода от 100 каналов
+
+История генерируется напрямую в таблицы PriceObservation/LatestPrice временной
+базы SQLite: каждый день каждый канал меняет цену SKU с вероятностью --change-rate
+(в историю попадают только изменения, как в PriceHistoryService.record_sync).
+Каждый SKU - отдельная конфигурация, лучшая цена (BestPrice) - самая низкая
+из последних. Затем замеряются get_history (вся история и последние 30 дней) и
+get_latest_prices для случайных SKU, а также запись прайса одного канала
+(история, последние цены и индекс лучших цен).
+
+Запуск: python benchmarks/bench_price_history.py [--skus 500] [--sources 100] [--days 180]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+settings.DATABASES['default']['NAME'] = str(Path(DATABASE_DIR.name) / 'bench_price_history.sqlite3')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from db_app.models import IPhone, PriceObservation, LatestPrice, PriceSource, PriceConfig, BestPrice
+from services.db_gateway import db_gateway
+from services.price_history import price_history_service, PRICE_HISTORY_DEVICES
+
+DAY = 24 * 3600
+QUERIES = 200
+
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+def generate_history(skus: int, sources: int, days: int, change_rate: float, now: int) -> int:
+    """Заполняет историю, последние и лучшие цены, возвращает число строк истории"""
+    device = PRICE_HISTORY_DEVICES['IPhone']
+    PriceSource.objects.bulk_create([PriceSource(name=f"Канал {index}") for index in range(sources)])
+    # Конфигурация SKU - его номер (id конфигурации совпадает с sku_id в новой базе)
+    PriceConfig.objects.bulk_create([PriceConfig(device=device, key=str(sku_id)) for sku_id in range(1, skus + 1)],
+                                    batch_size=500)
+    source_ids = list(PriceSource.objects.values_list('pk', flat=True))
+    random_generator = random.Random(0)
+    start = now - days * DAY
+
+    observations = 0
+    with connection.cursor() as cursor:
+        for sku_id in range(1, skus + 1):
+            rows = []
+            latest_rows = []
+            for source_id in source_ids:
+                price = random_generator.randrange(30000, 200000) * 100
+                rows.append((device, sku_id, source_id, price, start))
+                observed_at = start
+                for day in range(1, days):
+                    if random_generator.random() < change_rate:
+                        price += random_generator.randrange(-20, 21) * 10000
+                        observed_at = start + day * DAY + random_generator.randrange(DAY)
+                        rows.append((device, sku_id, source_id, price, observed_at))
+                latest_rows.append((device, sku_id, source_id, sku_id, price, observed_at))
+            best = min(latest_rows, key=lambda row: row[4])
+            with transaction.atomic():
+                cursor.executemany(
+                    f"INSERT INTO {PriceObservation._meta.db_table} "
+                    f"(device, sku_id, source_id, price, observed_at) VALUES (%s, %s, %s, %s, %s)", rows)
+                cursor.executemany(
+                    f"INSERT INTO {LatestPrice._meta.db_table} "
+                    f"(device, sku_id, source_id, config_id, price, observed_at) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s)", latest_rows)
+                BestPrice.objects.create(device=device, config_id=sku_id, sku_id=sku_id, source_id=best[2],
+                                         price=best[4], observed_at=best[5])
+            observations += len(rows)
+    return observations
+
+
+async def time_queries(skus: int, since: datetime):
+    random_generator = random.Random(1)
+    timings = {'история целиком': [], 'история за 30 дней': [], 'последние цены': []}
+    sizes = {name: 0 for name in timings}
+    for _ in range(QUERIES):
+        sku_id = random_generator.randrange(1, skus + 1)
+        for name, query in (
+            ('история целиком', lambda: price_history_service.get_history('IPhone', sku_id)),
+            ('история за 30 дней', lambda: price_history_service.get_history('IPhone', sku_id, since)),
+            ('последние цены', lambda: price_history_service.get_latest_prices('IPhone', sku_id)),
+        ):
+            start = time.perf_counter()
+            rows = await query()
+            timings[name].append((time.perf_counter() - start) * 1000)
+            sizes[name] += len(rows)
+    return timings, sizes
+
+
+def time_ingest(now: int) -> float:
+    """Прайс одного канала со всеми SKU: у половины SKU цена изменилась"""
+    source = PriceSource.objects.order_by('pk').first()
+    latest = dict(LatestPrice.objects.filter(source_id=source.pk).values_list('sku_id', 'price'))
+    prices = {sku_id: (price + (10000 if sku_id % 2 else 0)) / 100 for sku_id, price in latest.items()}
+    start = time.perf_counter()
+    with transaction.atomic():
+        price_history_service.record_sync(IPhone, source.name, prices, {sku_id: str(sku_id) for sku_id in prices},
+                                          now)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запросы истории цен по SKU")
+    parser.add_argument('--skus', type=int, default=500)
+    parser.add_argument('--sources', type=int, default=100)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--change-rate', type=float, default=0.2, help="вероятность изменения цены за день")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+    now = int(time.time())
+
+    start = time.perf_counter()
+    observations = generate_history(args.skus, args.sources, args.days, args.change_rate, now)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        # Переносим WAL в файл базы, чтобы размер файла был полным
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    size_mb = os.path.getsize(settings.DATABASES['default']['NAME']) / 1024 / 1024
+    print(f"📄 {args.skus} SKU x {args.sources} каналов x {args.days} дней: "
+          f"{observations} строк истории, база {size_mb:.0f} МБ "
+          f"({size_mb * 1024 * 1024 / observations:.0f} байт на строку), генерация {time.perf_counter() - start:.1f}s")
+
+    since = datetime.fromtimestamp(now, tz=dt_timezone.utc) - timedelta(days=30)
+    timings, sizes = asyncio.run(time_queries(args.skus, since))
+    for name, values in timings.items():
+        print(f"   {name}: p50 {percentile(values, 50):.1f} мс, p99 {percentile(values, 99):.1f} мс, "
+              f"в среднем {sizes[name] / QUERIES:.0f} строк")
+
+    # Первая запись заодно заменяет устаревшие лучшие цены сгенерированной истории
+    print(f"   запись прайса канала ({args.skus} цен): первая {time_ingest(now):.0f} мс, "
+          f"следующая {time_ingest(now + DAY):.0f} мс")
+    db_gateway.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: количество вызовов регулярных выражений на одно сообщение
+
+Сравнивает старую схему сохранения (сервис получал склеенные source_line и
+парсил их повторно) с новой (сервис получает уже распарсенные объекты).
+Парсинг выполняется на bot/exampleprices.txt с базой SQLite в памяти.
+
+Запуск: python benchmarks/bench_regex_calls.py
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+# Общая база в памяти: сохранения идут из потока sync_to_async
+settings.DATABASES['default']['NAME'] = 'file:bench_regex_calls?mode=memory&cache=shared'
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+from services.hybrid_parser import template_parser
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+
+# Устройства, чьи сервисы раньше сохраняли через parse_and_save_prices(text)
+LEGACY_REPARSE_DEVICES = ['iphone', 'ipad', 'apple_watch', 'imac', 'airpods', 'apple_pencil']
+
+
+class RegexCallCounter:
+    """Считает вызовы методов re.Pattern (re.search и скомпилированные шаблоны)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _profile(self, frame, event, arg):
+        if event == 'c_call' and isinstance(getattr(arg, '__self__', None), re.Pattern):
+            self.calls += 1
+
+    def run(self, func: Callable, *args) -> Any:
+        self.calls = 0
+        sys.setprofile(self._profile)
+        try:
+            return func(*args)
+        finally:
+            sys.setprofile(None)
+
+
+def record_parsed_lines() -> Dict[str, List[str]]:
+    """Оборачивает parse_lines парсеров и запоминает распознанные строки по устройствам"""
+    parsed_lines: Dict[str, List[str]] = {}
+
+    for device_type, parser_info in template_parser.device_parsers.items():
+        parser = parser_info['parser']
+        original = parser.parse_lines
+
+        def wrapped(lines, _original=original, _device=device_type):
+            parsed_data, unparsed_lines = _original(lines)
+            parsed_lines.setdefault(_device, []).extend(
+                getattr(data, 'source_line', '') for data in parsed_data
+            )
+            return parsed_data, unparsed_lines
+
+        parser.parse_lines = wrapped
+
+    return parsed_lines
+
+
+def main():
+    # Логи парсеров на каждую строку искажают замер времени
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    counter = RegexCallCounter()
+    parsed_lines = record_parsed_lines()
+
+    start = time.perf_counter()
+    results = counter.run(asyncio.run, template_parser.parse_message(text, "benchmark"))
+    elapsed = time.perf_counter() - start
+    after_calls = counter.calls
+
+    # Стоимость старой схемы: те же строки повторно проходили каскад шаблонов в сервисе
+    reparse_calls = 0
+    for device_type in LEGACY_REPARSE_DEVICES:
+        source_lines = parsed_lines.get(device_type)
+        if not source_lines:
+            continue
+        parser = template_parser.device_parsers[device_type]['parser']
+        # Вызываем метод класса, минуя обертку из record_parsed_lines
+        counter.run(type(parser).parse_lines, parser, '\n'.join(source_lines).strip().split('\n'))
+        reparse_calls += counter.calls
+    before_calls = after_calls + reparse_calls
+
+    total_lines = len(text.strip().split('\n'))
+    print(f"📄 Строк в сообщении: {total_lines}")
+    print(f"✅ Распознано: {len(results['parsed_lines'])}, сохранено: {results['total_saved']}")
+    print(f"⏱️ parse_message: {elapsed:.3f}s")
+    print(f"🔁 Вызовов regex до (с повторным парсингом): {before_calls}")
+    print(f"⚡ Вызовов regex после: {after_calls}")
+    print(f"📉 Экономия: {reparse_calls} ({reparse_calls / before_calls * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи в SQLite: строк в секунду при 1, 4 и 16 одновременных производителях
+
+Каждый производитель по одной сохраняет цены AirPods через
+AirPodsService.save_airpods_price (update_or_create одной строки), как
+userbot и бот при потоке коротких сообщений. Сравниваются две схемы:
+- журнал DELETE и synchronous=FULL, каждая запись - отдельный коммит;
+- WAL и synchronous=NORMAL, поток записи объединяет записи в пачки
+  (DB_WRITE_BATCH, окно DB_WRITE_WINDOW_MS).
+
+База - временный файл SQLite, чтобы fsync и блокировки были как в работе бота.
+
+Запуск: python benchmarks/bench_write_coalescer.py [--rows 480]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+from django.conf import settings
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+DATABASE = settings.DATABASES['default']
+DATABASE['NAME'] = str(Path(DATABASE_DIR.name) / 'bench_write_coalescer.sqlite3')
+WAL_INIT_COMMAND = DATABASE['OPTIONS']['init_command']
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, connections
+
+from services.airpods_service import AirPodsService
+from services.db_gateway import DatabaseLane, db_gateway, DB_WRITE_BATCH, DB_WRITE_WINDOW_MS
+
+PRODUCERS = [1, 4, 16]
+MODES = [
+    # (название, init_command, пачка записи, окно мс)
+    ('DELETE, коммит на строку', 'PRAGMA journal_mode=DELETE; PRAGMA synchronous=FULL', 1, 0.0),
+    ('WAL, пачки записи', WAL_INIT_COMMAND, DB_WRITE_BATCH, DB_WRITE_WINDOW_MS),
+]
+
+
+def use_mode(init_command: str, batch_size: int, window_ms: float) -> str:
+    """Переключает журнал базы и очередь записи; возвращает фактический journal_mode"""
+    db_gateway.close()
+    connections.close_all()
+    DATABASE['OPTIONS']['init_command'] = init_command
+    db_gateway.writes = DatabaseLane('write', 1, batch_size=batch_size, window_ms=window_ms)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    connections.close_all()
+    return journal_mode
+
+
+async def produce(service: AirPodsService, producer: int, rows: int, run: str):
+    for index in range(rows):
+        saved = await service.save_airpods_price({
+            'variant': 'AirPods Pro',
+            'generation': '2',
+            'color': 'White',
+            'year': f'{run}-{producer}-{index}',
+            'price': 20000 + index,
+        })
+        assert saved
+
+
+async def write_rows(producers: int, total_rows: int, run: str) -> Dict[str, Any]:
+    service = AirPodsService()
+    rows = total_rows // producers
+    start = time.perf_counter()
+    await asyncio.gather(*[produce(service, producer, rows, run) for producer in range(producers)])
+    elapsed = time.perf_counter() - start
+    metrics = db_gateway.metrics()['write']
+    return {
+        'rows': rows * producers,
+        'elapsed': elapsed,
+        'rows_per_sec': rows * producers / elapsed,
+        'batches': metrics['batches'],
+        'retries': metrics['retries'],
+        'failed': metrics['failed'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Строк в секунду при одновременных записях")
+    parser.add_argument('--rows', type=int, default=480, help="строк на один замер")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    call_command('migrate', verbosity=0)
+
+    print(f"📄 {args.rows} строк на замер, производителей: {', '.join(map(str, PRODUCERS))}")
+    for mode_index, (title, init_command, batch_size, window_ms) in enumerate(MODES):
+        journal_mode = use_mode(init_command, batch_size, window_ms)
+        print(f"\n🔧 {title} (journal_mode={journal_mode}, пачка {batch_size}, окно {window_ms:g} мс)")
+        for producers in PRODUCERS:
+            db_gateway.writes = DatabaseLane('write', 1, batch_size=batch_size, window_ms=window_ms)
+            result = asyncio.run(write_rows(producers, args.rows, f'{mode_index}-{producers}'))
+            db_gateway.writes.close()
+            print(f"   {producers:>2} производителей: {result['rows_per_sec']:7.0f} строк/с "
+                  f"({result['elapsed']:.2f}s, пачек {result['batches']}, "
+                  f"повторов {result['retries']}, ошибок {result['failed']})")
+
+    db_gateway.close()
+
+
+if __name__ == "__main__":
+    main()
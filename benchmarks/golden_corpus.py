@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Эталонный корпус результатов парсинга bot/exampleprices.txt
+
+record записывает для каждой непустой строки прайса устройство и поля
+распознанных объектов (IPhonePriceData, MacBookPrice, iPadData...) или
+"unparsed" в benchmarks/golden/exampleprices.jsonl - одна строка прайса на
+строку файла, чтобы изменения были видны в git diff.
+check разбирает прайс заново и сравнивает с эталоном (без базы и сохранения,
+меньше секунды): любое ускорение парсеров проверяется на одном корпусе.
+
+Строки маршрутизируются так же, как в TemplateParser: классификатор, парсеры
+по приоритету, строка уходит первому распознавшему ее парсеру, парсер
+с контекстом секций получает контекст из всего прайса.
+
+Запуск:
+    python benchmarks/golden_corpus.py check
+    python benchmarks/golden_corpus.py record   # после намеренного изменения результатов
+"""
+import argparse
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from services.hybrid_parser import template_parser
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+GOLDEN_FILE = Path(__file__).parent / "golden" / "exampleprices.jsonl"
+
+UNPARSED = "unparsed"
+# Сколько расхождений печатать при проверке
+MAX_SHOWN_DIFFS = 20
+
+# Строка прайса: (устройство или UNPARSED, поля распознанных объектов)
+LineResult = Tuple[str, List[Dict[str, Any]]]
+
+
+def record_fields(data: Any) -> Dict[str, Any]:
+    """Поля распознанного объекта без исходной строки (она известна по номеру строки)"""
+    fields = dataclasses.asdict(data) if dataclasses.is_dataclass(data) else dict(data)
+    fields.pop('source_line', None)
+    return fields
+
+
+def parse_corpus(lines: List[str]) -> List[LineResult]:
+    """Результат разбора каждой строки прайса (для пустых строк - None)"""
+    routed_lines, _ = template_parser.classifier.classify(lines)
+    results_by_line: Dict[str, LineResult] = {}
+
+    sorted_parsers = sorted(template_parser.device_parsers.items(), key=lambda x: x[1].get('priority', 999))
+    for device_type, parser_info in sorted_parsers:
+        parser = parser_info['parser']
+        device_lines = [line for line in routed_lines[device_type] if line.strip() not in results_by_line]
+        if not device_lines:
+            continue
+
+        contexts = parser.section_contexts(device_lines, lines) if parser_info.get('context') else None
+        for index, line in enumerate(device_lines):
+            if contexts is not None:
+                parsed_data, _ = parser.parse_lines([line], contexts=[contexts[index]])
+            else:
+                parsed_data, _ = parser.parse_lines([line])
+            if parsed_data and line.strip() not in results_by_line:
+                results_by_line[line.strip()] = (device_type, [record_fields(data) for data in parsed_data])
+
+    return [
+        results_by_line.get(line.strip(), (UNPARSED, [])) if line.strip() else None
+        for line in lines
+    ]
+
+
+def source_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def read_source() -> Tuple[str, List[str]]:
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    return text, text.split('\n')
+
+
+def record():
+    text, lines = read_source()
+    results = parse_corpus(lines)
+
+    GOLDEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(GOLDEN_FILE, 'w', encoding='utf-8') as golden:
+        header = {'source': EXAMPLES_FILE.relative_to(ROOT).as_posix(), 'source_hash': source_hash(text)}
+        golden.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for line_number, result in enumerate(results, 1):
+            if result is not None:
+                golden.write(json.dumps([line_number, *result], ensure_ascii=False) + '\n')
+
+    parsed = sum(1 for result in results if result and result[0] != UNPARSED)
+    print(f"💾 Эталон записан: {GOLDEN_FILE.relative_to(ROOT)} (строк: {len(lines)}, распознано: {parsed})")
+
+
+def load_golden() -> Tuple[Dict[str, Any], Dict[int, LineResult]]:
+    with open(GOLDEN_FILE, encoding='utf-8') as golden:
+        header = json.loads(golden.readline())
+        expected = {}
+        for row in golden:
+            line_number, device_type, records = json.loads(row)
+            expected[line_number] = (device_type, records)
+    return header, expected
+
+
+def check() -> List[str]:
+    """Расхождения текущего разбора с эталоном (пустой список - совпадает)"""
+    text, lines = read_source()
+    header, expected = load_golden()
+    if header['source_hash'] != source_hash(text):
+        return [f"{header['source']} изменился после записи эталона: запустите record"]
+
+    diffs = []
+    for line_number, result in enumerate(parse_corpus(lines), 1):
+        # После JSON кортежи становятся списками
+        actual = tuple(json.loads(json.dumps(result, ensure_ascii=False))) if result is not None else None
+        if actual != expected.get(line_number):
+            diffs.append(f"{line_number}: {lines[line_number - 1].strip()!r}\n"
+                         f"      было:  {expected.get(line_number)}\n"
+                         f"      стало: {actual}")
+    return diffs
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Эталонный корпус результатов парсинга")
+    arg_parser.add_argument('command', choices=['check', 'record'])
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.command == 'record':
+        record()
+        return
+
+    start = time.perf_counter()
+    diffs = check()
+    elapsed = time.perf_counter() - start
+    if diffs:
+        print(f"❌ Расхождений с эталоном: {len(diffs)} ({elapsed:.2f}s)")
+        for diff in diffs[:MAX_SHOWN_DIFFS]:
+            print(f"   {diff}")
+        sys.exit(1)
+    print(f"✅ Результаты совпадают с эталоном ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
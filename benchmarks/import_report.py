@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Отчет о времени импорта модулей проекта (как python -X importtime, но только
+пакеты бота) и о времени первой загрузки парсеров и сервисов устройств
+
+Каждый модуль импортируется в отдельном процессе с -X importtime, поэтому
+время - холодный старт, как после quick_restart.sh. Для модулей проекта
+печатается собственное и накопленное время (с импортами зависимостей),
+для остальных - итог по пакетам верхнего уровня (django, aiogram...).
+
+Запуск:
+    python benchmarks/import_report.py
+    python benchmarks/import_report.py services.catalog_service --top 30
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+DEFAULT_MODULES = ['services.hybrid_parser', 'services.parse_jobs', 'services.catalog_service']
+DEFAULT_TOP = 15
+
+# Загрузка всех устройств реестра в свежем процессе: время каждого парсера и сервиса в мс
+HANDLERS_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from services.hybrid_parser import template_parser
+timings = {{'import services.hybrid_parser': (time.perf_counter() - start) * 1000}}
+for device_type, parser_info in template_parser.device_parsers.items():
+    for key in ('parser', 'service'):
+        start = time.perf_counter()
+        parser_info[key]
+        timings[device_type + ' ' + key] = (time.perf_counter() - start) * 1000
+print(json.dumps(timings))
+"""
+
+# Строка -X importtime: (собственное время, накопленное время в мкс, модуль, глубина)
+ImportRecord = Tuple[int, int, str, int]
+
+
+def project_packages() -> set:
+    """Пакеты и модули верхнего уровня из корня репозитория"""
+    names = {path.stem for path in ROOT.glob('*.py')}
+    names |= {path.name for path in ROOT.iterdir() if path.is_dir() and any(path.glob('*.py'))}
+    return names
+
+
+def import_times(module: str) -> List[ImportRecord]:
+    """Импортирует модуль в новом процессе с -X importtime"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился ошибкой:\n{completed.stderr[-2000:]}")
+
+    records = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((int(self_us), int(cumulative_us), name.strip(), depth))
+    return records
+
+
+def print_module_report(module: str, top: int):
+    records = import_times(module)
+    packages = project_packages()
+    total_us = max(cumulative for _, cumulative, _, _ in records)
+
+    project = [record for record in records if record[2].split('.')[0] in packages]
+    external: Dict[str, int] = {}
+    for self_us, _, name, _ in records:
+        top_level = name.split('.')[0]
+        if top_level not in packages:
+            external[top_level] = external.get(top_level, 0) + self_us
+
+    project_self = sum(self_us for self_us, _, _, _ in project)
+    print(f"📦 import {module}: {total_us / 1000:.1f} мс, модулей проекта: {len(project)} "
+          f"(собственное время {project_self / 1000:.1f} мс)")
+    print(f"   {'модуль':<44} {'свое, мс':>9} {'всего, мс':>10}")
+    for self_us, cumulative_us, name, depth in sorted(project, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"   {name:<44} {self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}")
+
+    print(f"   Внешние пакеты (собственное время):")
+    for name, self_us in sorted(external.items(), key=lambda item: item[1], reverse=True)[:5]:
+        print(f"   {name:<44} {self_us / 1000:>9.1f}")
+    print()
+
+
+def print_handlers_report():
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    completed = subprocess.run(
+        [sys.executable, '-c', HANDLERS_SCRIPT.format(root=str(ROOT))],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Загрузка устройств завершилась ошибкой:\n{completed.stderr[-2000:]}")
+
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    print("🚀 Первое обращение к устройствам (в порядке загрузки)")
+    for name, elapsed_ms in timings.items():
+        print(f"   {name:<44} {elapsed_ms:>9.1f} мс")
+    print(f"   {'всего':<44} {sum(timings.values()):>9.1f} мс")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Время импорта модулей проекта")
+    arg_parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    arg_parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="сколько модулей проекта показать")
+    args = arg_parser.parse_args()
+
+    for module in args.modules:
+        print_module_report(module, args.top)
+    print_handlers_report()
+
+
+if __name__ == "__main__":
+    main()
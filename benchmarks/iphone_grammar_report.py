@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Отчет по грамматике IPhoneParser: время лексера и грамматики, нераспознанные строки
+
+Прогоняет bot/exampleprices.txt (или файл из аргумента) через iphone_parser
+и печатает время парсинга, время на строку и нераспознанные строки iPhone
+вместе с их токенами - по ним видно, какого поля или типа токена не хватает.
+
+Запуск: python benchmarks/iphone_grammar_report.py [файл]
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+from parsers.iphone_parser import iphone_parser
+from parsers.line_lexer import tokenize
+
+EXAMPLES_FILE = ROOT / "bot" / "exampleprices.txt"
+
+# Сколько нераспознанных строк показывать
+MAX_UNPARSED = 30
+
+
+def main():
+    logging.disable(logging.WARNING)
+
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else EXAMPLES_FILE
+    lines = path.read_text(encoding='utf-8').split('\n')
+
+    start = time.perf_counter()
+    parsed, unparsed = iphone_parser.parse_lines(lines)
+    elapsed = time.perf_counter() - start
+
+    iphone_lines = [line.strip() for line in lines if line.strip() and iphone_parser._is_iphone_line(line.strip())]
+    start = time.perf_counter()
+    tokens = [tokenize(line) for line in iphone_lines]
+    lexer_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for line, line_tokens in zip(iphone_lines, tokens):
+        iphone_parser.grammar.parse(line, line_tokens)
+    grammar_elapsed = time.perf_counter() - start
+
+    per_line = 1_000_000 / max(len(iphone_lines), 1)
+    print(f"📄 {path.name}: {len(lines)} строк, строк iPhone: {len(iphone_lines)}")
+    print(f"✅ Распознано: {len(parsed)}, ❌ не распознано: {len(unparsed)}, ⏱️ {elapsed:.3f}s")
+    print(f"🔤 Лексер: {lexer_elapsed * per_line:.1f} мкс/строку, "
+          f"🧩 грамматика: {grammar_elapsed * per_line:.1f} мкс/строку")
+    print()
+
+    print(f"❌ Нераспознанные строки (первые {MAX_UNPARSED}):")
+    for line in unparsed[:MAX_UNPARSED]:
+        kinds = ' '.join(token.kind for token in tokenize(line))
+        print(f"   {line}\n      {kinds}")
+
+
+if __name__ == "__main__":
+    main()
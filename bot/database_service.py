@@ -1,14 +1,12 @@
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
 from asgiref.sync import sync_to_async
 
 # Настройка Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import (
     Brand, ProductCategory, ProductModel, ProductVariant, 
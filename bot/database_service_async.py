@@ -4,16 +4,17 @@
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
 
 # Настройка Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import Product, Markup, MacBook
+from services.catalog_version import catalog_version
+from services.line_dedup import line_dedup
+from services.price_history import price_history_service
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +70,7 @@ class DatabaseService:
         logger.info(f"Обработано {saved_count} прайсов из {len(parsed_prices)}")
         return saved_count
 
-    @sync_to_async
+    @db_write
     def _save_product(self, product_data: Dict[str, Any], source: str) -> bool:
         """Сохраняет универсальный продукт"""
         try:
@@ -108,7 +109,7 @@ class DatabaseService:
             logger.error(f"Ошибка сохранения продукта: {e}")
             return False
 
-    @sync_to_async
+    @db_write
     def clear_database(self) -> int:
         """Очищает базу данных"""
         try:
@@ -127,6 +128,9 @@ class DatabaseService:
             iPad.objects.all().delete()
             AppleWatch.objects.all().delete()
             Product.objects.all().delete()
+            price_history_service.clear_latest_sync(['IPhone', 'MacBook', 'iPad', 'AppleWatch'])
+            catalog_version.bump("очистка базы данных")
+            line_dedup.invalidate_sync("очистка базы данных")
             
             total_count = count_iphone + count_macbook + count_ipad + count_apple_watch + count_product
             logger.info(f"Очищена база данных: удалено {total_count} товаров (iPhone: {count_iphone}, MacBook: {count_macbook}, iPad: {count_ipad}, Apple Watch: {count_apple_watch}, Product: {count_product})")
@@ -135,16 +139,18 @@ class DatabaseService:
             logger.error(f"Ошибка очистки базы данных: {e}")
             return 0
 
-    @sync_to_async
+    @db_read
     def get_current_markup(self) -> float:
         """Получает текущую наценку"""
         try:
+            # Наценку мог сменить другой процесс: проверка версии сбросит кэш
+            catalog_version.current_sync()
             return float(Markup.get_current_markup())
         except Exception as e:
             logger.error(f"Ошибка получения наценки: {e}")
             return 0.0
 
-    @sync_to_async
+    @db_write
     def set_markup(self, amount: float) -> bool:
         """Устанавливает новую наценку"""
         try:
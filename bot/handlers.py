@@ -1,5 +1,7 @@
 import logging
+import os
 import re
+import tempfile
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.filters import Command
@@ -15,10 +17,16 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from services.hybrid_parser import template_parser
-from services.catalog_service import catalog_service, CatalogService
+from services.catalog_service import catalog_service
+from services.catalog_view import catalog_views
+from services.parse_jobs import parse_jobs
+from services.document_reader import is_supported
 
 logger = logging.getLogger(__name__)
 
+# Bot API отдает боту файлы не больше 20 МБ
+MAX_DOCUMENT_SIZE = 20 * 1024 * 1024
+
 # Создаем роутер
 router = Router()
 
@@ -30,9 +38,11 @@ class CatalogStates(StatesGroup):
     """Состояния для каталога"""
     waiting_for_brand = State()
 
-# Глобальные переменные для хранения данных каталога
-catalog_data = {}
-current_catalog_message = None
+def get_chat_id(message_or_callback) -> int:
+    """Чат, в котором открыт каталог (для Message и CallbackQuery)"""
+    if hasattr(message_or_callback, 'message'):  # CallbackQuery
+        return message_or_callback.message.chat.id
+    return message_or_callback.chat.id
 
 # Создаем reply клавиатуру
 def get_main_keyboard():
@@ -86,7 +96,7 @@ async def cmd_help(message: Message):
 🤖 <b>Бот для парсинга прайсов</b>
 
 <b>Как использовать:</b>
-1. Отправь мне текст с прайсами
+1. Отправь мне текст с прайсами или файл прайса (.txt, .csv, .xlsx)
 2. Я автоматически распарсю их с помощью шаблонов
 3. Сохраню в базу данных только лучшие цены
 
@@ -188,30 +198,29 @@ async def handle_manual_markup_input(message: Message, state: FSMContext):
         await message.answer("❌ Ошибка установки наценки", reply_markup=get_main_keyboard())
         await state.clear()
 
+def get_cancel_job_keyboard(job_id: int):
+    """Создает inline клавиатуру для отмены разбора прайса"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="❌ Отменить", callback_data=f"cancel_job_{job_id}")]
+    ])
+
 @router.message(F.text)
 async def handle_text_message(message: Message):
     """Обработчик текстовых сообщений с прайсами - только шаблоны"""
     try:
         # Показываем, что бот обрабатывает сообщение
         processing_msg = await message.answer("🔄 Анализирую прайсы с помощью шаблонов...")
-
-        # Используем парсер только на шаблонах
-        results = await template_parser.parse_message(message.text, f"Пользователь {message.from_user.id}")
-
-        if results['total_saved'] > 0:
-            # Формируем детальный отчет
-            report = f"🎉 **Результат парсинга!**\n\n{results['summary']}\n\n"
-            report += "Данные сохранены в базу. Используйте кнопку '📋 Каталог' для просмотра."
-            
-            await processing_msg.edit_text(report, parse_mode="Markdown")
-            await message.answer("Используйте кнопки ниже для навигации:", reply_markup=get_main_keyboard())
-        else:
-            # Показываем детальный отчет даже если ничего не сохранилось
-            report = f"⚠️ **Результат парсинга**\n\n{results['summary']}\n\n"
-            report += "Проверьте формат прайсов и попробуйте еще раз."
-            
-            await processing_msg.edit_text(report, parse_mode="Markdown")
-            await message.answer("Используйте кнопки ниже для навигации:", reply_markup=get_main_keyboard())
+        show_progress, show_result = get_parse_job_callbacks(message, processing_msg)
+
+        # Разбор идет в фоне: апдейт не ждет парсинга и сохранения в базу
+        job = await parse_jobs.submit(
+            message.text,
+            f"Пользователь {message.from_user.id}",
+            chat_id=message.chat.id,
+            on_progress=show_progress,
+            on_done=show_result
+        )
+        await processing_msg.edit_text(job.progress_text(), reply_markup=get_cancel_job_keyboard(job.id))
 
     except Exception as e:
         logger.error(f"Ошибка обработки сообщения: {e}")
@@ -220,13 +229,107 @@ async def handle_text_message(message: Message):
             reply_markup=get_main_keyboard()
         )
 
+@router.message(F.document)
+async def handle_document(message: Message):
+    """Обработчик файлов с прайсами (.txt, .csv, .xlsx) - разбор частями в одной задаче"""
+    document = message.document
+    if not is_supported(document.file_name or ''):
+        await message.answer("❌ Поддерживаются прайсы в файлах .txt, .csv и .xlsx", reply_markup=get_main_keyboard())
+        return
+    if document.file_size and document.file_size > MAX_DOCUMENT_SIZE:
+        await message.answer("❌ Файл больше 20 МБ, разделите прайс на несколько файлов", reply_markup=get_main_keyboard())
+        return
+
+    path = None
+    try:
+        processing_msg = await message.answer(f"📥 Загружаю файл {document.file_name}...")
+
+        # Файл скачивается на диск и читается построчно, а не целиком в память
+        fd, path = tempfile.mkstemp(suffix=Path(document.file_name).suffix.lower())
+        os.close(fd)
+        await message.bot.download(document, destination=path)
+
+        show_progress, show_result = get_parse_job_callbacks(message, processing_msg)
+        job = await parse_jobs.submit_document(
+            path,
+            f"Пользователь {message.from_user.id}",
+            chat_id=message.chat.id,
+            on_progress=show_progress,
+            on_done=show_result
+        )
+        # Файл теперь удалит задача разбора
+        path = None
+        await processing_msg.edit_text(job.progress_text(), reply_markup=get_cancel_job_keyboard(job.id))
+
+    except Exception as e:
+        logger.error(f"Ошибка обработки файла: {e}")
+        if path:
+            os.remove(path)
+        await message.answer(
+            "❌ Произошла ошибка при обработке файла. Попробуйте позже.",
+            reply_markup=get_main_keyboard()
+        )
+
+def get_parse_job_callbacks(message: Message, processing_msg: Message):
+    """Обработчики хода и итога фоновой задачи разбора для сообщения о разборе"""
+    async def show_progress(job):
+        try:
+            await processing_msg.edit_text(job.progress_text(), reply_markup=get_cancel_job_keyboard(job.id))
+        except Exception as e:
+            logger.error(f"Ошибка обновления хода разбора: {e}")
+
+    async def show_result(job):
+        await send_parse_report(message, processing_msg, job)
+
+    return show_progress, show_result
+
+async def send_parse_report(message: Message, processing_msg: Message, job):
+    """Показывает итог фоновой задачи разбора вместо сообщения о ходе разбора"""
+    if job.status == 'cancelled':
+        await processing_msg.edit_text("⛔ Разбор прайса отменен.")
+        await message.answer("Используйте кнопки ниже для навигации:", reply_markup=get_main_keyboard())
+        return
+
+    if job.status == 'failed':
+        await processing_msg.edit_text("❌ Произошла ошибка при обработке прайсов. Попробуйте позже.")
+        await message.answer("Используйте кнопки ниже для навигации:", reply_markup=get_main_keyboard())
+        return
+
+    results = job.results
+    if results['total_saved'] > 0:
+        # Формируем детальный отчет
+        report = f"🎉 **Результат парсинга!**\n\n{results['summary']}\n\n"
+        report += "Данные сохранены в базу. Используйте кнопку '📋 Каталог' для просмотра."
+    else:
+        # Показываем детальный отчет даже если ничего не сохранилось
+        report = f"⚠️ **Результат парсинга**\n\n{results['summary']}\n\n"
+        report += "Проверьте формат прайсов и попробуйте еще раз."
+
+    await processing_msg.edit_text(report, parse_mode="Markdown")
+    await message.answer("Используйте кнопки ниже для навигации:", reply_markup=get_main_keyboard())
+
+@router.callback_query(F.data.startswith("cancel_job_"))
+async def cancel_parse_job(callback: CallbackQuery):
+    """Отменяет фоновый разбор прайса"""
+    try:
+        job = parse_jobs.get(int(callback.data.replace("cancel_job_", "")))
+        # Отменить разбор можно только из того чата, где он запущен
+        if job is None or job.chat_id != get_chat_id(callback) or not parse_jobs.cancel(job.id):
+            await callback.answer("Разбор уже завершен")
+            return
+        await callback.answer("Отменяю разбор...")
+    except Exception as e:
+        logger.error(f"Ошибка отмены разбора: {e}")
+        await callback.answer("❌ Ошибка отмены разбора")
+
 async def show_catalog(message_or_callback, state: FSMContext):
     """Показывает каталог - выбор бренда"""
     try:
-        global catalog_data, current_catalog_message
+        chat_id = get_chat_id(message_or_callback)
 
-        # ПРИНУДИТЕЛЬНО получаем свежие данные каталога (без кеша)
-        catalog_data = await catalog_service.get_catalog_data()
+        # Открываем в чате актуальный снимок каталога (перестраивается только после изменения данных)
+        view = await catalog_views.open(chat_id)
+        catalog_data = view.catalog_data
 
         if not catalog_data:
             text = "📋 Каталог пуст.\n\nОтправьте прайсы для заполнения каталога."
@@ -257,10 +360,8 @@ async def show_catalog(message_or_callback, state: FSMContext):
 
         if hasattr(message_or_callback, 'message'):  # CallbackQuery
             await message_or_callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-            current_catalog_message = message_or_callback.message
         else:  # Message
-            msg = await message_or_callback.answer(text, reply_markup=keyboard, parse_mode="HTML")
-            current_catalog_message = msg
+            await message_or_callback.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
         await state.set_state(CatalogStates.waiting_for_brand)
 
@@ -281,6 +382,7 @@ async def show_categories(callback: CallbackQuery, state: FSMContext):
     """Показывает категории выбранного бренда"""
     try:
         brand = callback.data.replace("brand_", "")
+        catalog_data = (await catalog_views.get(get_chat_id(callback))).catalog_data
         
         if not catalog_data or brand not in catalog_data:
             await callback.answer("❌ Бренд не найден")
@@ -338,6 +440,8 @@ async def show_category_items(callback: CallbackQuery, state: FSMContext):
             return
             
         brand, category = parts
+        view = await catalog_views.get(get_chat_id(callback))
+        catalog_data = view.catalog_data
         
         if not catalog_data or brand not in catalog_data or category not in catalog_data[brand]:
             await callback.answer("❌ Категория не найдена")
@@ -347,13 +451,13 @@ async def show_category_items(callback: CallbackQuery, state: FSMContext):
         
         # Если это iPhone - показываем поколения
         if category == "iPhone":
-            await show_iphone_generations(callback, brand, category_data)
+            await show_iphone_generations(callback, brand, view)
         elif category == "MacBook":
-            await show_macbook_categories(callback, brand, category_data)
+            await show_macbook_categories(callback, brand, view)
         elif category == "iPad":
-            await show_ipad_categories(callback, brand, category_data)
+            await show_ipad_categories(callback, brand, view)
         elif category == "Apple Watch":
-            await show_apple_watch_categories(callback, brand, category_data)
+            await show_apple_watch_categories(callback, brand, view)
         else:
             # For other categories - show items directly
             await show_category_products(callback, brand, category, category_data)
@@ -362,53 +466,22 @@ async def show_category_items(callback: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка показа товаров категории: {e}")
         await callback.answer("❌ Ошибка загрузки товаров")
 
-async def show_iphone_generations(callback, brand, iphone_list):
+async def show_iphone_generations(callback, brand, view):
     """Показывает поколения iPhone"""
     try:
-        # Группируем по поколениям
-        generations = {}
-        for phone in iphone_list:
-            name = phone['name']
-            if 'iPhone 17' in name:
-                generation = '17'
-            elif 'iPhone 16E' in name or name.endswith('16Е'):
-                generation = '16E'
-            elif 'iPhone 16Pro Max' in name:
-                generation = '16'
-            elif 'iPhone 16Pro' in name:
-                generation = '16'
-            elif 'iPhone 16Plus' in name:
-                generation = '16'
-            elif 'iPhone 16' in name:
-                generation = '16'
-            elif 'iPhone 15' in name:
-                generation = '15'
-            elif 'iPhone 14' in name:
-                generation = '14'
-            elif 'iPhone 13' in name:
-                generation = '13'
-            else:
-                generation = 'Другие'
-            
-            if generation not in generations:
-                generations[generation] = []
-            generations[generation].append(phone)
-        
         # Создаем клавиатуру с поколениями (сортировка по убыванию)
         keyboard_buttons = []
-        generation_order = ['17', '16E', '16', '15', '14', '13']
-        for generation in generation_order:
-            if generation in generations:
+        for generation in view.iphone_generations():
+            if generation == 'Другие':
+                keyboard_buttons.append([InlineKeyboardButton(
+                    text=f"📱 Другие iPhone", 
+                    callback_data=f"generation_Другие"
+                )])
+            else:
                 keyboard_buttons.append([InlineKeyboardButton(
                     text=f"📱 iPhone {generation}", 
                     callback_data=f"generation_{generation}"
                 )])
-        
-        if 'Другие' in generations:
-            keyboard_buttons.append([InlineKeyboardButton(
-                text=f"📱 Другие iPhone", 
-                callback_data=f"generation_Другие"
-            )])
 
         keyboard_buttons.append([InlineKeyboardButton(text="🔙 Назад к категориям", callback_data=f"brand_{brand}")])
 
@@ -421,35 +494,25 @@ async def show_iphone_generations(callback, brand, iphone_list):
         logger.error(f"Ошибка показа поколений iPhone: {e}")
         await callback.answer("❌ Ошибка загрузки поколений")
 
-async def show_macbook_categories(callback, brand, macbook_data):
+async def show_macbook_categories(callback, brand, view):
     """Показывает категории MacBook (Air, Pro, iMac)"""
     try:
         keyboard_buttons = []
         
-        # Группируем по вариантам (Air, Pro, iMac)
-        variants = {}
-        for macbook in macbook_data:
-            variant = macbook.get('variant', 'Air')
-            if variant not in variants:
-                variants[variant] = []
-            variants[variant].append(macbook)
-        
-        # Сортируем варианты в нужном порядке
-        variant_order = ['Air', 'Pro', 'iMac']
-        for variant_name in variant_order:
-            if variant_name in variants:
+        # Варианты в нужном порядке
+        for variant_name in view.macbook_variants():
+            emoji = "💻"
+            if variant_name == "Air":
                 emoji = "💻"
-                if variant_name == "Air":
-                    emoji = "💻"
-                elif variant_name == "Pro":
-                    emoji = "💻"
-                elif variant_name == "iMac":
-                    emoji = "🖥️"
-                
-                keyboard_buttons.append([InlineKeyboardButton(
-                    text=f"{emoji} MacBook {variant_name}",
-                    callback_data=f"macbook_{variant_name}"
-                )])
+            elif variant_name == "Pro":
+                emoji = "💻"
+            elif variant_name == "iMac":
+                emoji = "🖥️"
+            
+            keyboard_buttons.append([InlineKeyboardButton(
+                text=f"{emoji} MacBook {variant_name}",
+                callback_data=f"macbook_{variant_name}"
+            )])
         
         keyboard_buttons.append([InlineKeyboardButton(text="🔙 Назад к категориям", callback_data=f"brand_{brand}")])
         keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
@@ -506,65 +569,19 @@ async def show_generation_phones(callback: CallbackQuery, state: FSMContext):
     """Показывает iPhone выбранного поколения"""
     try:
         generation = callback.data.replace("generation_", "")
+        view = await catalog_views.get(get_chat_id(callback))
         
-        if not catalog_data or 'Apple' not in catalog_data or 'iPhone' not in catalog_data['Apple']:
-            await callback.answer("❌ Каталог не найден")
-            return
-        
-        # iPhone каталог - это список, фильтруем по поколению
-        iphone_list = catalog_data['Apple']['iPhone']
-        
-        # Фильтруем iPhone по поколению
-        phones = []
-        for phone in iphone_list:
-            name = phone['name']
-            phone_generation = None
-            
-            if generation == '16E' and ('iPhone 16E' in name or name.endswith('16Е')):
-                phone_generation = '16E'
-            elif generation == '16':
-                if ('iPhone 16' in name and 'iPhone 16E' not in name) or 'iPhone 16Pro' in name or 'iPhone 16Plus' in name:
-                    phone_generation = '16'
-            elif f'iPhone {generation}' in name:
-                phone_generation = generation
-            elif generation == 'Другие':
-                # Все остальные iPhone
-                if not any(f'iPhone {g}' in name for g in ['13', '14', '15', '16']) and 'iPhone 16E' not in name:
-                    phone_generation = 'Другие'
-            
-            if phone_generation == generation:
-                phones.append(phone)
-        
-        if not phones:
+        # Готовая группировка поколения: вариант -> память -> iPhone
+        variants = view.iphone.get(generation)
+        if not variants:
             await callback.answer("❌ Товары не найдены")
             return
         
         # Формируем сообщение с прайсами
         message_text = f"📱 <b>iPhone {generation}</b>\n\n"
         
-        # Группируем по типам (обычный, Pro, Plus, Pro Max)
-        variants = {}
-        for phone in phones:
-            name = phone['name']
-            
-            # Определяем тип
-            if 'Pro Max' in name:
-                variant = 'Pro Max'
-            elif 'Pro' in name:
-                variant = 'Pro'
-            elif 'Plus' in name:
-                variant = 'Plus'
-            elif generation == '16E':
-                variant = 'E'
-            else:
-                variant = 'обычный'
-            
-            if variant not in variants:
-                variants[variant] = []
-            variants[variant].append(phone)
-        
-        # Выводим по вариантам
-        for variant_name, variant_phones in variants.items():
+        # Выводим по вариантам (обычный, Pro, Plus, Pro Max)
+        for variant_name, memory_groups in variants:
             if variant_name == "обычный":
                 message_text += f"<b>iPhone {generation}:</b>\n"
             elif variant_name == "E":
@@ -572,34 +589,8 @@ async def show_generation_phones(callback: CallbackQuery, state: FSMContext):
             else:
                 message_text += f"<b>iPhone {generation} {variant_name}:</b>\n"
             
-            # Группируем по памяти (только GB, без цвета)
-            memory_groups = {}
-            for phone in variant_phones:
-                config = phone.get('configuration', '')
-                if not config:
-                    # Если конфигурация в названии
-                    clean_name = phone['name'].replace(f'iPhone {generation}', '').replace('iPhone', '').strip()
-                    if variant_name != 'обычный' and variant_name in clean_name:
-                        clean_name = clean_name.replace(variant_name, '').strip()
-                    config = clean_name
-                
-                # Извлекаем только память (128GB, 256GB, 512GB, etc.)
-                import re
-                memory_match = re.search(r'(\d+GB)', config)
-                if memory_match:
-                    memory = memory_match.group(1)
-                else:
-                    memory = config  # Если не нашли GB, используем всю конфигурацию
-                
-                if memory not in memory_groups:
-                    memory_groups[memory] = []
-                memory_groups[memory].append(phone)
-            
-            # Выводим товары по группам памяти
-            for memory, memory_phones in memory_groups.items():
-                # Сортируем по странам внутри группы памяти
-                memory_phones.sort(key=lambda x: x['country'])
-                
+            # Выводим товары по группам памяти (внутри группы отсортированы по странам)
+            for memory, memory_phones in memory_groups:
                 for phone in memory_phones:
                     config = phone.get('configuration', '')
                     # Формируем название iPhone с вариантом
@@ -631,112 +622,25 @@ async def show_macbook_products(callback: CallbackQuery, state: FSMContext):
     """Показывает товары MacBook выбранной категории"""
     try:
         variant = callback.data.replace("macbook_", "")
-        if not catalog_data or 'Apple' not in catalog_data or 'MacBook' not in catalog_data['Apple']:
-            await callback.answer("❌ Каталог не найден")
-            return
-        
-        macbook_list = catalog_data['Apple']['MacBook']
-        products = []
-        for macbook in macbook_list:
-            macbook_variant = macbook.get('variant', 'Air')
-            if macbook_variant == variant:
-                products.append(macbook)
+        view = await catalog_views.get(get_chat_id(callback))
         
-        if not products:
+        # Готовая группировка варианта: размер и чип -> память -> диск -> MacBook
+        sorted_groups = view.macbook.get(variant)
+        if not sorted_groups:
             await callback.answer("❌ Товары не найдены")
             return
         
-        # Группируем по размеру экрана и чипу (13 M1, 13 M2, 15 M4, etc.)
-        size_chip_groups = {}
-        for product in products:
-            generation = product.get('generation', '')
-            size = product.get('size', '')
-            
-            # Извлекаем чип из поколения (M1, M2, M3, M4)
-            import re
-            chip_match = re.search(r'(M\d+)', generation)
-            if chip_match:
-                chip = chip_match.group(1)
-            else:
-                chip = generation
-            
-            # Создаем ключ для группировки: размер + чип
-            group_key = f"{size} {chip}" if size else chip
-            
-            if group_key not in size_chip_groups:
-                size_chip_groups[group_key] = []
-            size_chip_groups[group_key].append(product)
-        
         message_text = f"💻 <b>MacBook {variant}</b>\n\n"
         
-        # Сортируем группы по размеру и чипу
-        def sort_key(item):
-            key = item[0]
-            # Извлекаем размер и чип для сортировки
-            size_match = re.search(r'(\d+)', key)
-            chip_match = re.search(r'(M\d+)', key)
-            
-            size = int(size_match.group(1)) if size_match else 0
-            chip_num = int(chip_match.group(1)[1:]) if chip_match else 0
-            
-            return (size, chip_num)
-        
-        sorted_groups = sorted(size_chip_groups.items(), key=sort_key)
-        
-        # Выводим товары по группам
-        for group_key, group_products in sorted_groups:
-            # Группируем по памяти внутри группы
-            memory_groups = {}
-            for product in group_products:
-                memory = product.get('memory', '')
-                if not memory:
-                    # Если память не указана, извлекаем из конфигурации
-                    config = product.get('configuration', '')
-                    memory_match = re.search(r'(\d+GB)', config)
-                    memory = memory_match.group(1) if memory_match else '8GB'
-                
-                if memory not in memory_groups:
-                    memory_groups[memory] = []
-                memory_groups[memory].append(product)
-            
+        # Выводим товары по группам (13 M1, 13 M2, 15 M4, etc.)
+        for group_key, sorted_memory_groups in sorted_groups:
             # Выводим группу
             message_text += f"<b>MacBook {variant} {group_key}</b>\n"
             
-            # Сортируем группы памяти по значению
-            sorted_memory_groups = sorted(memory_groups.items(), key=lambda item: int(re.search(r'(\d+)', item[0]).group(1)) if re.search(r'(\d+)', item[0]) else 0)
-            
             # Выводим товары по группам памяти
-            for memory, memory_products in sorted_memory_groups:
-                # Группируем по размеру диска внутри группы памяти
-                storage_groups = {}
-                for product in memory_products:
-                    storage = product.get('storage', '')
-                    if not storage:
-                        # Если размер диска не указан, извлекаем из конфигурации
-                        config = product.get('configuration', '')
-                        storage_match = re.search(r'(\d+GB)', config)
-                        if storage_match:
-                            storage = storage_match.group(1)
-                        else:
-                            # Ищем второй GB в конфигурации (первый - память, второй - диск)
-                            gb_matches = re.findall(r'(\d+GB)', config)
-                            if len(gb_matches) > 1:
-                                storage = gb_matches[1]
-                            else:
-                                storage = '256GB'  # По умолчанию
-                    
-                    if storage not in storage_groups:
-                        storage_groups[storage] = []
-                    storage_groups[storage].append(product)
-                
-                # Сортируем группы диска по значению
-                sorted_storage_groups = sorted(storage_groups.items(), key=lambda item: int(re.search(r'(\d+)', item[0]).group(1)) if re.search(r'(\d+)', item[0]) else 0)
-                
-                # Выводим товары по группам диска
+            for memory, sorted_storage_groups in sorted_memory_groups:
+                # Выводим товары по группам диска (внутри группы отсортированы по странам)
                 for storage, storage_products in sorted_storage_groups:
-                    # Сортируем по странам внутри группы диска
-                    storage_products.sort(key=lambda x: x['country'] or '')
-                    
                     for product in storage_products:
                         config = product.get('configuration', '')
                         product_code = product.get('product_code', '')
@@ -745,7 +649,6 @@ async def show_macbook_products(callback: CallbackQuery, state: FSMContext):
                         
                         # Убираем дублирование памяти из конфигурации
                         # Если конфигурация содержит дублированную память (например "16GB 16GB 256GB"), исправляем
-                        import re
                         config_cleaned = re.sub(r'(\d+GB)\s+\1\s+', r'\1 ', config)
                         
                         # Формируем строку: флаг + код + конфигурация
@@ -776,40 +679,16 @@ async def show_macbook_products(callback: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка показа товаров MacBook: {e}")
         await callback.answer("❌ Ошибка загрузки данных")
 
-async def show_ipad_categories(callback, brand, ipad_data):
+async def show_ipad_categories(callback, brand, view):
     """Показывает категории iPad"""
     try:
-        if not ipad_data:
+        if not view.ipad:
             await callback.answer("❌ Нет данных iPad")
             return
         
-        # Группируем по типам iPad
-        categories = {}
-        for ipad in ipad_data:
-            variant = ipad.get('variant', '')
-            generation = ipad.get('generation', '')
-            
-            # Определяем категорию на основе variant и generation
-            if variant == 'Mini':
-                category = 'Mini'
-            elif variant == 'Air':
-                category = 'Air'
-            elif variant == 'Pro':
-                category = 'Pro'
-            elif generation and generation.isdigit():
-                # Если generation - это число (9, 10, 11), то это обычный iPad
-                category = 'iPad'
-            else:
-                # По умолчанию обычный iPad
-                category = 'iPad'
-            
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(ipad)
-        
         # Создаем кнопки для категорий
         buttons = []
-        for category, products in categories.items():
+        for category in view.ipad:
             if category == 'iPad':
                 display_name = 'iPad'
             else:
@@ -838,90 +717,25 @@ async def show_ipad_products(callback: CallbackQuery, state: FSMContext):
     """Показывает товары iPad выбранной категории"""
     try:
         variant = callback.data.replace("ipad_", "")
-        if not catalog_data or 'Apple' not in catalog_data or 'iPad' not in catalog_data['Apple']:
-            await callback.answer("❌ Каталог не найден")
-            return
+        view = await catalog_views.get(get_chat_id(callback))
         
-        ipad_list = catalog_data['Apple']['iPad']
-        products = []
-        for ipad in ipad_list:
-            ipad_variant = ipad.get('variant', '')
-            ipad_generation = ipad.get('generation', '')
-            
-            # Определяем категорию iPad
-            if ipad_variant == 'Mini':
-                ipad_category = 'Mini'
-            elif ipad_variant == 'Air':
-                ipad_category = 'Air'
-            elif ipad_variant == 'Pro':
-                ipad_category = 'Pro'
-            elif ipad_generation and ipad_generation.isdigit():
-                ipad_category = 'iPad'
-            else:
-                ipad_category = 'iPad'
-            
-            # Если категория совпадает с выбранной
-            if ipad_category == variant:
-                products.append(ipad)
-        
-        if not products:
+        # Готовая группировка категории: размер/поколение -> объем -> iPad
+        sorted_groups = view.ipad.get(variant)
+        if not sorted_groups:
             await callback.answer("❌ Товары не найдены")
             return
         
-        # Группируем по размеру и поколению
-        groups = {}
-        for product in products:
-            size = product.get('size', '')
-            generation = product.get('generation', '')
-            variant_name = product.get('variant', '')
-            
-            # Формируем название группы
-            if variant_name == 'Mini':
-                group_key = f"iPad Mini {size}"
-            elif variant_name == 'Air':
-                group_key = f"iPad Air {size}"
-            elif variant_name == 'Pro':
-                group_key = f"iPad Pro {size}"
-            elif generation and generation.isdigit():
-                group_key = f"iPad {generation}"
-            else:
-                group_key = f"iPad {size}" if size else "iPad"
-            
-            if group_key not in groups:
-                groups[group_key] = []
-            groups[group_key].append(product)
-        
-        # Сортируем группы
-        sorted_groups = sorted(groups.items(), key=lambda x: x[0])
-        
         # Формируем заголовок
         if variant == 'iPad':
             message_text = "📱 iPad\n\n"
         else:
             message_text = f"📱 iPad {variant}\n\n"
         
-        for group_name, group_products in sorted_groups:
+        for group_name, sorted_memory_groups in sorted_groups:
             message_text += f"<b>{group_name}</b>\n"
             
-            # Группируем по объему памяти внутри группы
-            memory_groups = {}
-            for product in group_products:
-                storage = product.get('storage', '')
-                if not storage:
-                    storage = '128GB'  # По умолчанию
-                
-                if storage not in memory_groups:
-                    memory_groups[storage] = []
-                memory_groups[storage].append(product)
-            
-            # Сортируем группы памяти по значению
-            sorted_memory_groups = sorted(memory_groups.items(), key=lambda item: int(re.search(r'(\d+)', item[0]).group(1)) if re.search(r'(\d+)', item[0]) else 0)
-            
-            # Выводим товары по группам памяти
+            # Выводим товары по группам памяти (внутри группы отсортированы по странам)
             for storage, storage_products in sorted_memory_groups:
-                # Сортируем по странам внутри группы памяти
-                storage_products.sort(key=lambda x: x['country'] or '')
-                
                 for product in storage_products:
                     config = product.get('configuration', '')
                     product_code = product.get('product_code', '')
@@ -1042,27 +856,16 @@ async def handle_markup_callback(callback: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка обработки callback наценки: {e}")
         await callback.answer("❌ Ошибка установки наценки")
 
-async def show_apple_watch_categories(callback, brand, apple_watch_data):
+async def show_apple_watch_categories(callback, brand, view):
     """Показывает категории Apple Watch"""
     try:
-        # Группируем по сериям
-        categories = {}
-        for watch in apple_watch_data:
-            series = watch.get('series', '')
-            if not series:
-                continue
-                
-            if series not in categories:
-                categories[series] = []
-            categories[series].append(watch)
-        
-        if not categories:
+        if not view.apple_watch:
             await callback.message.edit_text("❌ Apple Watch не найдены")
             return
         
         # Создаем кнопки для категорий
         buttons = []
-        for series, products in categories.items():
+        for series in view.apple_watch:
             display_name = f'Apple Watch {series}'
             buttons.append([InlineKeyboardButton(
                 text=f"⌚ {display_name}",
@@ -1091,47 +894,22 @@ async def show_apple_watch_products(callback: CallbackQuery, state: FSMContext):
     """Показывает товары Apple Watch выбранной серии"""
     try:
         series = callback.data.replace("apple_watch_", "")
+        view = await catalog_views.get(get_chat_id(callback))
         
-        # Получаем данные каталога
-        catalog_service = CatalogService()
-        catalog_data = await catalog_service.get_catalog_data()
-        
-        if 'Apple' not in catalog_data or 'Apple Watch' not in catalog_data['Apple']:
-            await callback.answer("❌ Apple Watch не найдены")
-            return
-        
-        apple_watch_list = catalog_data['Apple']['Apple Watch']
-        products = []
-        
-        for watch in apple_watch_list:
-            watch_series = watch.get('series', '')
-            
-            # Если серия совпадает с выбранной
-            if watch_series == series:
-                products.append(watch)
-        
-        if not products:
+        # Готовая группировка серии: размер -> Apple Watch
+        size_groups = view.apple_watch.get(series)
+        if not size_groups:
             await callback.answer("❌ Товары не найдены")
             return
         
-        # Группируем по размерам
-        size_groups = {}
-        for product in products:
-            size = product.get('size', '')
-            if size not in size_groups:
-                size_groups[size] = []
-            size_groups[size].append(product)
-        
         # Формируем сообщение
         message_text = f"⌚ <b>Apple Watch {series}</b>\n\n"
         
-        for size, size_products in sorted(size_groups.items()):
+        for size, size_products in size_groups:
             if size:
                 message_text += f"<b>📏 {size}mm</b>\n"
             
-            # Сортируем по цвету корпуса
-            size_products.sort(key=lambda x: x.get('case_color', ''))
-            
+            # Внутри размера товары отсортированы по цвету корпуса
             for product in size_products:
                 country = product.get('country', '')
                 product_code = product.get('product_code', '')
@@ -14,6 +14,9 @@ from aiogram.fsm.storage.memory import MemoryStorage
 
 from handlers import router
 from config import BOT_TOKEN
+from services.best_price import best_price_index
+from services.hybrid_parser import template_parser
+from services.db_gateway import db_gateway
 
 # Настройка логирования
 logging.basicConfig(
@@ -39,6 +42,12 @@ async def main():
     
     # Callback handlers уже включены в router
     
+    # Парсеры устройств загружаются в фоне, пока бот уже принимает сообщения
+    preload = asyncio.create_task(template_parser.preload())
+    
+    # Лучшие цены, которые никто не подтверждает, заменяются свежими
+    expiry = asyncio.create_task(best_price_index.expire_periodically())
+    
     try:
         # Запускаем бота
         logger.info("Бот запускается...")
@@ -46,8 +55,12 @@ async def main():
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
+        preload.cancel()
+        expiry.cancel()
         # Закрываем сессию бота
         await bot.session.close()
+        # Дожидаемся записей в очереди и закрываем соединения шлюза
+        db_gateway.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
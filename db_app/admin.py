@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import IPhone, Product, Markup
 
 @admin.register(IPhone)
@@ -8,6 +9,23 @@ class IPhoneAdmin(admin.ModelAdmin):
     search_fields = ['generation', 'variant', 'color']
     ordering = ['-created_at']
 
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, IPhone.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Вместе с записями удаляются их предложения, лучшие цены переходят к следующим"""
+        from services.catalog_version import catalog_version
+        from services.line_dedup import line_dedup
+        from services.price_history import price_history_service
+
+        with transaction.atomic():
+            sku_ids = list(queryset.values_list('pk', flat=True))
+            queryset.delete()
+            price_history_service.remove_latest_sync('IPhone', sku_ids)
+            catalog_version.bump("удаление iPhone в админке")
+            # Повтор строки удаленной записи должен создать ее снова
+            line_dedup.invalidate_sync("удаление iPhone в админке")
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'brand', 'category', 'price', 'display_price', 'country', 'created_at']
@@ -0,0 +1,20 @@
+"""
+Однократная настройка Django для бота, сервисов и скриптов
+"""
+import os
+
+import django
+from django.apps import apps
+
+
+def setup_django():
+    """
+    Настраивает Django, если это еще не сделано в процессе
+
+    Каждый сервис вызывает ее при импорте; повторный django.setup() заново
+    настраивает логирование, поэтому после первого вызова функция ничего не делает.
+    """
+    if apps.ready:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+    django.setup()
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_app', '0006_add_apple_pencil_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Источник цен',
+                'verbose_name_plural': 'Источники цен',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LatestPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device', models.SmallIntegerField()),
+                ('sku_id', models.IntegerField()),
+                ('source_id', models.IntegerField()),
+                ('price', models.IntegerField()),
+                ('observed_at', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Последняя цена',
+                'verbose_name_plural': 'Последние цены',
+                'indexes': [models.Index(fields=['device', 'sku_id'], name='latest_price_sku_idx')],
+                'unique_together': {('device', 'source_id', 'sku_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device', models.SmallIntegerField()),
+                ('sku_id', models.IntegerField()),
+                ('source_id', models.IntegerField()),
+                ('price', models.IntegerField()),
+                ('observed_at', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Наблюдение цены',
+                'verbose_name_plural': 'История цен',
+                'indexes': [models.Index(fields=['device', 'sku_id', 'observed_at', 'source_id', 'price'], name='price_history_sku_idx')],
+            },
+        ),
+    ]
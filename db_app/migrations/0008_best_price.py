@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+# Коды устройств как в services.price_history.PRICE_HISTORY_DEVICES и поля
+# конфигурации - unique_together модели без country (services.best_price.config_key)
+DEVICES = {
+    1: ('IPhone', ['generation', 'variant', 'storage', 'color', 'country_code']),
+    2: ('MacBook', ['generation', 'variant', 'size', 'memory', 'storage', 'color']),
+    3: ('iPad', ['generation', 'variant', 'size', 'storage', 'color', 'connectivity']),
+    4: ('AppleWatch', ['series', 'size', 'case_color', 'band_type', 'band_color', 'band_size', 'connectivity']),
+    5: ('iMac', ['model', 'chip', 'size', 'memory', 'storage', 'color']),
+    6: ('AirPods', ['model', 'generation', 'features', 'color', 'year']),
+    7: ('ApplePencil', ['model', 'generation', 'connector']),
+}
+
+
+def fill_best_prices(apps, schema_editor):
+    """Проставляет конфигурации уже сохраненным последним ценам и строит лучшие цены"""
+    LatestPrice = apps.get_model('db_app', 'LatestPrice')
+    PriceConfig = apps.get_model('db_app', 'PriceConfig')
+    BestPrice = apps.get_model('db_app', 'BestPrice')
+
+    for device, (model_name, key_fields) in DEVICES.items():
+        model = apps.get_model('db_app', model_name)
+        keys = {
+            row[0]: '|'.join('' if value is None else str(value) for value in row[1:])
+            for row in model.objects.values_list('pk', *key_fields)
+        }
+        offers = list(LatestPrice.objects.filter(device=device, sku_id__in=list(keys)))
+        config_ids = {}
+        for key in sorted({keys[offer.sku_id] for offer in offers}):
+            config_ids[key] = PriceConfig.objects.create(device=device, key=key[:200]).pk
+
+        bests = {}
+        for offer in offers:
+            offer.config_id = config_ids[keys[offer.sku_id]]
+            best = bests.get(offer.config_id)
+            if best is None or (offer.price, -offer.observed_at) < (best.price, -best.observed_at):
+                bests[offer.config_id] = offer
+        LatestPrice.objects.bulk_update(offers, ['config_id'], batch_size=500)
+        BestPrice.objects.bulk_create([
+            BestPrice(device=device, config_id=config_id, sku_id=offer.sku_id, source_id=offer.source_id,
+                      price=offer.price, observed_at=offer.observed_at)
+            for config_id, offer in bests.items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_app', '0007_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device', models.SmallIntegerField()),
+                ('config_id', models.IntegerField()),
+                ('sku_id', models.IntegerField()),
+                ('source_id', models.IntegerField()),
+                ('price', models.IntegerField()),
+                ('observed_at', models.IntegerField()),
+                ('stale', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Лучшая цена',
+                'verbose_name_plural': 'Лучшие цены',
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device', models.SmallIntegerField()),
+                ('key', models.CharField(max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Конфигурация',
+                'verbose_name_plural': 'Конфигурации',
+            },
+        ),
+        migrations.AddField(
+            model_name='latestprice',
+            name='config_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='latestprice',
+            index=models.Index(fields=['device', 'config_id', 'price', 'observed_at'], name='latest_price_config_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bestprice',
+            index=models.Index(fields=['device', 'sku_id'], name='best_price_sku_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bestprice',
+            index=models.Index(fields=['observed_at'], name='best_price_observed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bestprice',
+            unique_together={('device', 'config_id')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='priceconfig',
+            unique_together={('device', 'key')},
+        ),
+        migrations.RunPython(fill_best_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,264 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Поле записи устройства -> вид измерения (как Model.DIMENSIONS на момент миграции)
+DIMENSIONS = {
+    'IPhone': {'generation': 'generation', 'variant': 'variant', 'storage': 'storage', 'color': 'color',
+               'country': 'country'},
+    'MacBook': {'generation': 'generation', 'variant': 'variant', 'memory': 'storage', 'storage': 'storage',
+                'color': 'color', 'country': 'country'},
+    'iPad': {'generation': 'generation', 'variant': 'variant', 'storage': 'storage', 'color': 'color',
+             'country': 'country'},
+    'AppleWatch': {'series': 'generation', 'case_color': 'color', 'band_color': 'color', 'country': 'country'},
+    'iMac': {'chip': 'generation', 'memory': 'storage', 'storage': 'storage', 'color': 'color', 'country': 'country'},
+    'AirPods': {'generation': 'generation', 'color': 'color', 'country': 'country'},
+    'ApplePencil': {'generation': 'generation', 'country': 'country'},
+}
+
+
+def fill_dimensions(apps, schema_editor):
+    """
+    Интернирует значения уже сохраненных записей и проставляет им id измерений.
+
+    Ранги сортировки расставляет services.dimensions.DimensionCache при загрузке.
+    """
+    Dimension = apps.get_model('db_app', 'Dimension')
+    for model_name, dimensions in DIMENSIONS.items():
+        model = apps.get_model('db_app', model_name)
+        for field, kind in dimensions.items():
+            for value in model.objects.exclude(**{f'{field}__isnull': True}).values_list(field, flat=True).distinct():
+                dimension, _ = Dimension.objects.get_or_create(kind=kind, value=value)
+                model.objects.filter(**{field: value}).update(**{f'{field}_dim': dimension})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_app', '0008_best_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('rank', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Значение измерения',
+                'verbose_name_plural': 'Значения измерений',
+                'unique_together': {('kind', 'value')},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='airpods',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='applepencil',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='applewatch',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imac',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ipad',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='iphone',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='macbook',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='airpods',
+            name='color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='airpods',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='airpods',
+            name='generation_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applepencil',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applepencil',
+            name='generation_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applewatch',
+            name='band_color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applewatch',
+            name='case_color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applewatch',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='applewatch',
+            name='series_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='imac',
+            name='chip_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='imac',
+            name='color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='imac',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='imac',
+            name='memory_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='imac',
+            name='storage_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='ipad',
+            name='color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='ipad',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='ipad',
+            name='generation_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='ipad',
+            name='storage_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='ipad',
+            name='variant_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='iphone',
+            name='color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='iphone',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='iphone',
+            name='generation_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='iphone',
+            name='storage_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='iphone',
+            name='variant_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='color_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='country_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='generation_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='memory_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='storage_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.AddField(
+            model_name='macbook',
+            name='variant_dim',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='db_app.dimension'),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='airpods',
+            unique_together={('model', 'generation_dim', 'features', 'color_dim', 'year', 'country_dim')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='applepencil',
+            unique_together={('model', 'generation_dim', 'connector', 'country_dim')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='applewatch',
+            unique_together={('series_dim', 'size', 'case_color_dim', 'band_type', 'band_color_dim', 'band_size', 'connectivity', 'country_dim')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='imac',
+            unique_together={('model', 'chip_dim', 'size', 'memory_dim', 'storage_dim', 'color_dim', 'country_dim')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='ipad',
+            unique_together={('generation_dim', 'variant_dim', 'size', 'storage_dim', 'color_dim', 'connectivity', 'country_dim')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='iphone',
+            unique_together={('generation_dim', 'variant_dim', 'storage_dim', 'color_dim', 'country_dim', 'country_code')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='macbook',
+            unique_together={('generation_dim', 'variant_dim', 'size', 'memory_dim', 'storage_dim', 'color_dim', 'country_dim')},
+        ),
+    ]
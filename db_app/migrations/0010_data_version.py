@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+def create_catalog_version(apps, schema_editor):
+    """Строка версии каталога (services.catalog_version.CATALOG_VERSION_NAME)"""
+    DataVersion = apps.get_model('db_app', 'DataVersion')
+    DataVersion.objects.get_or_create(name='catalog')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db_app', '0009_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
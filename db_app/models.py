@@ -2,8 +2,53 @@
 Django модели для работы с базой данных товаров и цен
 """
 from django.db import models
+from django.db.models import F, Q, Exists, Subquery, OuterRef, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
 from django.utils import timezone
 
+
+class PriceQuerySet(models.QuerySet):
+    """QuerySet моделей с ценой: наценка считается в SQL одним запросом"""
+
+    def with_display_price(self):
+        """
+        Добавляет поле markup_price (цена + текущая наценка).
+
+        display_price берет значение из аннотации, поэтому при обходе
+        такого QuerySet не выполняется отдельный запрос наценки на каждую строку.
+        """
+        current_markup = Markup.objects.order_by('-updated_at').values('amount')[:1]
+        return self.annotate(
+            markup_price=F('price') + Coalesce(
+                Subquery(current_markup),
+                Value(0),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+
+    def with_best_offer(self, device: int):
+        """
+        Оставляет по одной записи на конфигурацию - лучшее предложение из BestPrice.
+
+        Добавляет best_price (копейки) и best_source_id. Записи, которых нет в
+        LatestPrice (сохраненные в обход истории цен), остаются со своей ценой
+        и best_price = None. device - код модели (PRICE_HISTORY_DEVICES).
+        """
+        best = BestPrice.objects.filter(device=device, sku_id=OuterRef('pk'))
+        return self.annotate(
+            best_price=Subquery(best.values('price')[:1]),
+            best_source_id=Subquery(best.values('source_id')[:1]),
+            indexed=Exists(LatestPrice.objects.filter(device=device, sku_id=OuterRef('pk'))),
+        ).filter(Q(best_price__isnull=False) | Q(indexed=False))
+
+
+def dimension_field():
+    """Ссылка на интернированное значение (Dimension): в ключе уникальности целый id вместо строки"""
+    return models.ForeignKey('Dimension', on_delete=models.PROTECT, null=True, blank=True, editable=False,
+                             related_name='+', db_index=False)
+
+
 class IPhone(models.Model):
     """Модель для iPhone"""
     
@@ -15,6 +60,16 @@ class IPhone(models.Model):
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     country_code = models.CharField(max_length=10, blank=True, null=True)  # 2SIM, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    generation_dim = dimension_field()
+    variant_dim = dimension_field()
+    storage_dim = dimension_field()
+    color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'generation': 'generation', 'variant': 'variant', 'storage': 'storage', 'color': 'color',
+                  'country': 'country'}
+    
     # Цена
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
@@ -23,11 +78,13 @@ class IPhone(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "iPhone"
         verbose_name_plural = "iPhone"
         # Уникальность по основным полям
-        unique_together = ['generation', 'variant', 'storage', 'color', 'country', 'country_code']
+        unique_together = ['generation_dim', 'variant_dim', 'storage_dim', 'color_dim', 'country_dim', 'country_code']
         ordering = ['generation', 'variant', 'storage', 'color']
     
     def __str__(self):
@@ -53,6 +110,9 @@ class IPhone(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -83,6 +143,17 @@ class MacBook(models.Model):
     color = models.CharField(max_length=30)  # Space Gray, Silver, Midnight, Starlight, Sky Blue, etc.
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    generation_dim = dimension_field()
+    variant_dim = dimension_field()
+    memory_dim = dimension_field()
+    storage_dim = dimension_field()
+    color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'generation': 'generation', 'variant': 'variant', 'memory': 'storage', 'storage': 'storage',
+                  'color': 'color', 'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)  # MGN63, MC7X4, etc.
@@ -92,11 +163,13 @@ class MacBook(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "MacBook"
         verbose_name_plural = "MacBook"
         # Уникальность по основным полям
-        unique_together = ['generation', 'variant', 'size', 'memory', 'storage', 'color', 'country']
+        unique_together = ['generation_dim', 'variant_dim', 'size', 'memory_dim', 'storage_dim', 'color_dim', 'country_dim']
         ordering = ['generation', 'variant', 'size', 'memory', 'storage', 'color']
     
     def __str__(self):
@@ -121,6 +194,9 @@ class MacBook(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -151,6 +227,16 @@ class iPad(models.Model):
     connectivity = models.CharField(max_length=20, blank=True, null=True)  # Wi-Fi, LTE
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    generation_dim = dimension_field()
+    variant_dim = dimension_field()
+    storage_dim = dimension_field()
+    color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'generation': 'generation', 'variant': 'variant', 'storage': 'storage', 'color': 'color',
+                  'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)  # MD4J4, MXND3, etc.
@@ -160,11 +246,13 @@ class iPad(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "iPad"
         verbose_name_plural = "iPad"
         # Уникальность по основным полям
-        unique_together = ['generation', 'variant', 'size', 'storage', 'color', 'connectivity', 'country']
+        unique_together = ['generation_dim', 'variant_dim', 'size', 'storage_dim', 'color_dim', 'connectivity', 'country_dim']
         ordering = ['generation', 'variant', 'size', 'storage', 'color']
     
     def __str__(self):
@@ -197,6 +285,9 @@ class iPad(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -229,6 +320,14 @@ class AppleWatch(models.Model):
     connectivity = models.CharField(max_length=20, blank=True, null=True)  # GPS, Cellular, GPS+Cellular
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    series_dim = dimension_field()
+    case_color_dim = dimension_field()
+    band_color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'series': 'generation', 'case_color': 'color', 'band_color': 'color', 'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)  # MXEC3, MWWH3, etc.
@@ -238,11 +337,14 @@ class AppleWatch(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Apple Watch"
         verbose_name_plural = "Apple Watch"
         # Уникальность по основным полям
-        unique_together = ['series', 'size', 'case_color', 'band_type', 'band_color', 'band_size', 'connectivity', 'country']
+        unique_together = ['series_dim', 'size', 'case_color_dim', 'band_type', 'band_color_dim', 'band_size', 'connectivity',
+                           'country_dim']
         ordering = ['series', 'size', 'case_color', 'band_type']
     
     def __str__(self):
@@ -280,6 +382,9 @@ class AppleWatch(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -308,6 +413,15 @@ class iMac(models.Model):
     color = models.CharField(max_length=30)  # Blue, Silver, Green, Pink, Yellow, Orange, Purple
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    chip_dim = dimension_field()
+    memory_dim = dimension_field()
+    storage_dim = dimension_field()
+    color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'chip': 'generation', 'memory': 'storage', 'storage': 'storage', 'color': 'color', 'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)  # MWUF3, MNH73, etc.
@@ -317,11 +431,13 @@ class iMac(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "iMac"
         verbose_name_plural = "iMac"
         # Уникальность по основным полям
-        unique_together = ['model', 'chip', 'size', 'memory', 'storage', 'color', 'country']
+        unique_together = ['model', 'chip_dim', 'size', 'memory_dim', 'storage_dim', 'color_dim', 'country_dim']
         ordering = ['model', 'chip', 'size', 'memory', 'storage', 'color']
     
     def __str__(self):
@@ -346,6 +462,9 @@ class iMac(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -368,6 +487,13 @@ class AirPods(models.Model):
     year = models.CharField(max_length=10, blank=True, null=True)  # 2024, 2023, etc.
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    generation_dim = dimension_field()
+    color_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'generation': 'generation', 'color': 'color', 'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)  # MPNY3, MTJV3, etc.
@@ -377,11 +503,13 @@ class AirPods(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "AirPods"
         verbose_name_plural = "AirPods"
         # Уникальность по основным полям
-        unique_together = ['model', 'generation', 'features', 'color', 'year', 'country']
+        unique_together = ['model', 'generation_dim', 'features', 'color_dim', 'year', 'country_dim']
         ordering = ['model', 'generation', 'features', 'color']
     
     def __str__(self):
@@ -412,6 +540,9 @@ class AirPods(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -434,6 +565,12 @@ class ApplePencil(models.Model):
     connector = models.CharField(max_length=20)  # Lightning, USB-C
     country = models.CharField(max_length=10)  # 🇺🇸, 🇯🇵, 🇮🇳, etc.
     
+    # Интернированные значения (services/dimensions.py): уникальный ключ - по целым id,
+    # строковые поля остаются для отображения и фильтров
+    generation_dim = dimension_field()
+    country_dim = dimension_field()
+    DIMENSIONS = {'generation': 'generation', 'country': 'country'}
+    
     # Цена и код продукта
     price = models.DecimalField(max_digits=10, decimal_places=2)
     product_code = models.CharField(max_length=50, blank=True, null=True)
@@ -443,11 +580,13 @@ class ApplePencil(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Apple Pencil"
         verbose_name_plural = "Apple Pencil"
         # Уникальность по основным полям
-        unique_together = ['model', 'generation', 'connector', 'country']
+        unique_together = ['model', 'generation_dim', 'connector', 'country_dim']
         ordering = ['generation', 'connector']
     
     def __str__(self):
@@ -472,6 +611,9 @@ class ApplePencil(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -497,6 +639,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PriceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
@@ -509,6 +653,9 @@ class Product(models.Model):
     @property
     def display_price(self):
         """Цена с наценкой для отображения"""
+        markup_price = self.__dict__.get('markup_price')
+        if markup_price is not None:
+            return int(markup_price)
         try:
             markup = Markup.get_current_markup()
             return int(self.price + markup)
@@ -530,14 +677,174 @@ class Markup(models.Model):
     def __str__(self):
         return f"Наценка: {self.amount}₽"
 
+    # Текущая наценка, закэшированная в процессе (None - не загружена).
+    # Изменение из другого процесса сбрасывает кэш при проверке общей версии
+    # данных (services.catalog_version.CatalogVersion.current_sync)
+    _cached_amount = None
+
     @classmethod
     def get_current_markup(cls):
-        """Получает текущую наценку"""
-        markup = cls.objects.first()
-        return markup.amount if markup else 0
+        """Получает текущую наценку (запрос к базе только после ее изменения)"""
+        if cls._cached_amount is None:
+            markup = cls.objects.first()
+            cls._cached_amount = markup.amount if markup else 0
+        return cls._cached_amount
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Сбрасывает закэшированную наценку"""
+        cls._cached_amount = None
 
     @classmethod
     def set_markup(cls, amount):
         """Устанавливает новую наценку"""
         cls.objects.all().delete()  # Удаляем старые записи
-        cls.objects.create(amount=amount)
\ No newline at end of file
+        cls.objects.create(amount=amount)
+        cls.invalidate_cache()
+
+
+def _invalidate_markup_cache(sender, **kwargs):
+    """Изменение наценки в обход set_markup (например, через админку) тоже сбрасывает кэш"""
+    Markup.invalidate_cache()
+
+
+post_save.connect(_invalidate_markup_cache, sender=Markup, dispatch_uid='markup_cache_post_save')
+post_delete.connect(_invalidate_markup_cache, sender=Markup, dispatch_uid='markup_cache_post_delete')
+
+class PriceSource(models.Model):
+    """Источник цен (канал или чат); в истории цен хранится его числовой id"""
+    name = models.CharField(max_length=200, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Источник цен"
+        verbose_name_plural = "Источники цен"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class PriceObservation(models.Model):
+    """
+    История цен: строки только добавляются, все поля - целые числа.
+
+    Строка пишется, когда цена SKU у источника изменилась (или появилась);
+    время последнего подтверждения цены хранится в LatestPrice.
+    device - код модели устройства (services.price_history.PRICE_HISTORY_DEVICES),
+    sku_id - pk строки этой модели, price - в копейках, observed_at - unix-время.
+    """
+    device = models.SmallIntegerField()
+    sku_id = models.IntegerField()
+    source_id = models.IntegerField()
+    price = models.IntegerField()
+    observed_at = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Наблюдение цены"
+        verbose_name_plural = "История цен"
+        # Индекс покрывающий: история SKU читается из индекса без обращения к таблице
+        indexes = [
+            models.Index(fields=['device', 'sku_id', 'observed_at', 'source_id', 'price'],
+                         name='price_history_sku_idx'),
+        ]
+
+
+class PriceConfig(models.Model):
+    """Конфигурация устройства без страны (ключ записи модели без country) и ее числовой id"""
+    device = models.SmallIntegerField()
+    key = models.CharField(max_length=200)
+
+    class Meta:
+        verbose_name = "Конфигурация"
+        verbose_name_plural = "Конфигурации"
+        unique_together = ['device', 'key']
+
+    def __str__(self):
+        return self.key
+
+
+class LatestPrice(models.Model):
+    """Последняя цена SKU у каждого источника: каталогу не нужно читать историю"""
+    device = models.SmallIntegerField()
+    sku_id = models.IntegerField()
+    source_id = models.IntegerField()
+    config_id = models.IntegerField(default=0)
+    price = models.IntegerField()
+    observed_at = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Последняя цена"
+        verbose_name_plural = "Последние цены"
+        # Ключ начинается с источника: при сохранении прайса читаются цены одного источника
+        unique_together = ['device', 'source_id', 'sku_id']
+        indexes = [
+            models.Index(fields=['device', 'sku_id'], name='latest_price_sku_idx'),
+            # Следующее по цене предложение конфигурации - поиск по индексу, без перебора
+            models.Index(fields=['device', 'config_id', 'price', 'observed_at'], name='latest_price_config_idx'),
+        ]
+
+
+class BestPrice(models.Model):
+    """
+    Лучшее предложение конфигурации среди всех источников и стран.
+
+    Поддерживается services.best_price.BestPriceIndex при каждом сохранении
+    прайса. stale - свежих предложений нет, показывается самое дешевое из старых.
+    """
+    device = models.SmallIntegerField()
+    config_id = models.IntegerField()
+    sku_id = models.IntegerField()
+    source_id = models.IntegerField()
+    price = models.IntegerField()
+    observed_at = models.IntegerField()
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Лучшая цена"
+        verbose_name_plural = "Лучшие цены"
+        unique_together = ['device', 'config_id']
+        indexes = [
+            models.Index(fields=['device', 'sku_id'], name='best_price_sku_idx'),
+            models.Index(fields=['observed_at'], name='best_price_observed_idx'),
+        ]
+
+
+class Dimension(models.Model):
+    """
+    Интернированное значение измерения устройства: цвет, страна, память, поколение, вариант.
+
+    Записи устройств ссылаются на значение целым id (поля *_dim), ключ
+    уникальности строится из этих id. rank - порядок значения внутри вида
+    для сортировки каталога (128GB < 256GB < 1TB). Кэш - services.dimensions.
+    """
+    kind = models.CharField(max_length=20)
+    value = models.CharField(max_length=50)
+    rank = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Значение измерения"
+        verbose_name_plural = "Значения измерений"
+        unique_together = ['kind', 'value']
+
+    def __str__(self):
+        return f"{self.kind}: {self.value}"
+
+
+class DataVersion(models.Model):
+    """
+    Счетчик версии данных, общий для всех процессов (бот, userbot).
+
+    Увеличивается в той же транзакции, что и изменение данных, поэтому
+    процесс, прочитавший новую версию, увидит и сами изменения.
+    Поддерживается services.catalog_version.CatalogVersion.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
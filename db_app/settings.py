@@ -62,6 +62,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: чтения не ждут записи, а при synchronous=NORMAL fsync
+            # делается на контрольной точке, а не на каждый коммит
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            # Транзакция сразу берет блокировку записи, поэтому не падает с
+            # "database is locked" при повышении блокировки посреди транзакции
+            'transaction_mode': 'IMMEDIATE',
+            # Сколько секунд ждать, пока база занята другим процессом
+            'timeout': 5,
+        },
     }
 }
 
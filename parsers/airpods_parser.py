@@ -6,6 +6,8 @@ import logging
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import get_line_features
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -272,10 +274,10 @@ class AirPodsParser:
 
     def _is_airpods_line(self, line: str) -> bool:
         """Проверяет, является ли строка описанием AirPods"""
-        line_lower = line.lower()
+        features = get_line_features(line)
         
         # Проверяем наличие ключевых слов
-        has_airpods = 'airpods' in line_lower or '🎧' in line
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+        has_airpods = 'airpods' in features.lower or '🎧' in line
+        has_price = features.has_price
         
         return has_airpods and has_price
@@ -6,6 +6,8 @@ import logging
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import get_line_features
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -154,10 +156,11 @@ class ApplePencilParser:
 
     def _is_apple_pencil_line(self, line: str) -> bool:
         """Проверяет, является ли строка описанием Apple Pencil"""
-        line_lower = line.lower()
+        features = get_line_features(line)
+        line_lower = features.lower
         
         # Проверяем наличие ключевых слов
         has_pencil = 'pencil' in line_lower and 'vacuum' not in line_lower  # исключаем пылесос
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+        has_price = features.has_price
         
         return has_pencil and has_price
@@ -6,6 +6,8 @@ import logging
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import get_line_features
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -47,40 +49,40 @@ class AppleWatchParser:
     def __init__(self):
         self.patterns = [
             # SE 2024 40mm Silver S/M - 16000
-            r'SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+([SM]/[ML])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # SE 2024 40mm Silver M/L - 16000
-            r'SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+([ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # 10 46mm Rose Gold M/L - 29000
-            r'(\d{1,2})\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'(\d{1,2})\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # Ultra 2 49mm Black Trail Loop M/L - 60000
-            r'Ultra\s+(\d+)\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+([A-Za-z\s]+?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'Ultra\s+(\d+)\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # Ultra 2 49mm Black Ti Dark Green Alpine Loop M - 59500
-            r'Ultra\s+(\d+)\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+Ti\s+([A-Za-z\s]+?)\s+([A-Za-z\s]+?)\s+([SML])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'Ultra\s+(\d+)\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+Ti\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SML])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # Apple Watch SE 40 Midnight S/M 2024 16300
-            r'Apple\s+Watch\s+SE\s+(\d{2})\s+([A-Za-z\s]+?)\s+([SM]/[ML]|[ML]/[LM])\s+(\d{4})\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'Apple\s+Watch\s+SE\s+(\d{2})\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML]|[ML]/[LM])\s+(\d{4})\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # Apple Watch S10 42 Rose Gold Al LB S/M GPS MWWH3 28000
-            r'Apple\s+Watch\s+S(\d{1,2})\s+(\d{2})\s+([A-Za-z\s]+?)\s+Al\s+([A-Za-z\s]*?)\s+([SM]/[ML]|[ML]/[LM])\s+GPS\s+([A-Z0-9]+)\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'Apple\s+Watch\s+S(\d{1,2})\s+(\d{2})\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+Al\s+((?:[A-Za-z]+(?:\s+[A-Za-z]+)*?)??)\s+([SM]/[ML]|[ML]/[LM])\s+GPS\s+([A-Z0-9]+)\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # Apple Watch Ultra 2 49 Blue\Black (S\M) 56200
             r'Apple\s+Watch\s+Ultra\s+(\d+)\s+(\d{2})\s+([A-Za-z\\]+?)\s*\(([SM]\\[ML]|[ML]\\[LM])\)\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # AW SE 2024 40mm Midnight SB Midnight S/M - 16500
-            r'AW\s+SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z\s]+?)\s+SB\s+([A-Za-z\s]+?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
+            r'AW\s+SE\s+(\d{4})\s+(\d{2})mm\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+SB\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML]|[ML]/[LM])\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]*)',
             
             # AW 10 46 Rose Gold M/L 29900🇺🇸
-            r'AW\s+(\d{1,2})\s+(\d{2})\s+([A-Za-z\s]+?)\s+([SM]/[ML]|[ML]/[LM])\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
+            r'AW\s+(\d{1,2})\s+(\d{2})\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s+([SM]/[ML]|[ML]/[LM])\s+(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
             
             # S10 42 Rose Gold - 28500🇺🇸
-            r'S(\d{1,2})\s+(\d{2})\s+([A-Za-z\s]+?)\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
+            r'S(\d{1,2})\s+(\d{2})\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
             
             # SE2 40 Midnight - 16300🇺🇸
-            r'SE(\d+)\s+(\d{2})\s+([A-Za-z\s]+?)\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
+            r'SE(\d+)\s+(\d{2})\s+([A-Za-z]+(?:\s+[A-Za-z]+)*?)\s*-\s*(\d+[.,]\d+|\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇤🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
         ]
         
         # Цвета Apple Watch
@@ -260,11 +262,12 @@ class AppleWatchParser:
 
     def _is_apple_watch_line(self, line: str) -> bool:
         """Проверяет, является ли строка описанием Apple Watch"""
-        line_lower = line.lower()
+        features = get_line_features(line)
+        line_lower = features.lower
         
         # Проверяем наличие ключевых слов
         has_watch = 'watch' in line_lower or 'se' in line_lower or 'ultra' in line_lower
-        has_size = bool(re.search(r'\d{2}mm|\d{2}\s', line))
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+        has_size = features.has_size
+        has_price = features.has_price
         
         return has_watch and has_size and has_price
\ No newline at end of file
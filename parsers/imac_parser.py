@@ -6,6 +6,8 @@ import logging
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import get_line_features
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -162,11 +164,12 @@ class iMacParser:
 
     def _is_imac_line(self, line: str) -> bool:
         """Проверяет, является ли строка описанием iMac"""
-        line_lower = line.lower()
+        features = get_line_features(line)
+        line_lower = features.lower
         
         # Проверяем наличие ключевых слов
         has_imac = 'imac' in line_lower or 'mac mini' in line_lower
-        has_chip = bool(re.search(r'm[1-4]', line_lower))
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+        has_chip = features.has_chip
+        has_price = features.has_price
         
         return has_imac and (has_chip or has_price)
@@ -1,13 +1,48 @@
 """
-Гибкий парсер для iPhone с шаблонами
+Парсер для iPhone: строки разбираются грамматикой по токенам лексера
 """
 import re
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import get_line_features
+from parsers.line_lexer import LineGrammar, Field
+
 logger = logging.getLogger(__name__)
 
+# Признаки строки iPhone для _is_iphone_line
+GENERATION_RE = re.compile(r'(11|12|13|14|15|16|16e|17)')
+APPLE_IPHONE_RE = re.compile(r'apple\s+iphone')
+HEADER_RE = re.compile(r'^📲\s*iPhone\s*\d+[A-Z]?\s*(Air|Pro|Pro Max)?\s*$', re.IGNORECASE)
+EXCLUDE_WORDS = ['ipad', 'macbook', 'airpods', 'watch', 'adapter', 'гарантия', 'активаций', 'aw ', 'ultra 2', 'mini 7', 'pro 11']
+
+GENERATION_TEXT_RE = re.compile(r'1[1-7][eе]?', re.IGNORECASE)
+STORAGE_TEXT_RE = re.compile(r'\d+(?:gb|tb)?', re.IGNORECASE)
+
+# Грамматика строки iPhone: "поколение [вариант] память цвет", затем цена, флаг
+# и 2Sim (eSim, DUAL) в любом порядке; флаг может стоять и перед поколением
+IPHONE_GRAMMAR = LineGrammar(
+    head=[
+        Field('generation', ('GENERATION',), check=GENERATION_TEXT_RE.fullmatch),
+        Field('variant', ('VARIANT',), optional=True),
+        # 64 и 16 лексер считает поколением, 8 - просто числом
+        Field('storage', ('STORAGE', 'GENERATION', 'NUMBER'), check=STORAGE_TEXT_RE.fullmatch),
+        Field('color', ('WORD',), repeat=True),
+    ],
+    tail=[
+        Field('price', ('PRICE',)),
+        Field('country', ('FLAG',)),
+        Field('sim_code', ('SIM',), optional=True),
+    ],
+    # Флаг повторяется до и после цены: 🇨🇳16Pro 128 Black - 80500🇨🇳2Sim
+    tail_skip=('DASH', 'OTHER', 'FLAG')
+)
+
+# Вариант из токена лексера (кириллические "о" и "х" заменяются латинскими)
+VARIANTS = {'pro max': 'Pro Max', 'pro': 'Pro', 'plus': 'Plus', 'air': 'Air'}
+CYRILLIC_LOOKALIKES = str.maketrans('ох', 'ox')
+
 @dataclass
 class IPhonePriceData:
     """Структура данных для цены iPhone"""
@@ -21,198 +56,13 @@ class IPhonePriceData:
     source_line: str  # Исходная строка для отладки
 
 class IPhoneParser:
-    """Парсер для iPhone с гибкими шаблонами"""
+    """Парсер для iPhone по грамматике IPHONE_GRAMMAR"""
     
     def __init__(self):
-        self.patterns = self._create_patterns()
+        self.grammar = IPHONE_GRAMMAR
         self.colors = self._get_color_mappings()
         self.countries = self._get_country_mappings()
         
-    def _create_patterns(self) -> List[Dict]:
-        """Создает шаблоны для разных форматов iPhone"""
-        return [
-            # Формат: 🇺🇸16 128 White - 58900
-            {
-                'pattern': r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)',
-                'groups': ['country', 'generation', 'storage', 'color', 'price'],
-                'variant': ''
-            },
-            # Формат: 13 128 Midnight - 38000🇮🇳
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат: 16 128 White 🇮🇳 58900
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'storage', 'color', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат: 15Pro 128 Blue - 78500🇦🇪
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country'],
-                'variant': 'from_match'
-            },
-            # Формат с кириллицей: 16 Prо 128 White 88100🇯🇵
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Prо Max|Prо|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country'],
-                'variant': 'from_match'
-            },
-            # Формат с кириллицей и 2Sim: 16 Prо 128 White 79300🇨🇳2Sim
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Prо Max|Prо|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)(2Sim|2SIM)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country', 'sim_code'],
-                'variant': 'from_match'
-            },
-            # Формат с кириллицей Maх: 16 Prо Maх 512 White 115600🇯🇵
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Prо Maх|Prо Max|Prо|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country'],
-                'variant': 'from_match'
-            },
-            # Формат с кириллицей Maх и 2Sim: 16 Prо Maх 1TB Black 136000🇯🇵
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Prо Maх|Prо Max|Prо|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)(2Sim|2SIM)?',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country', 'sim_code'],
-                'variant': 'from_match'
-            },
-            # Формат: 16 Pro 128 Black 87300🇯🇵 (с пробелом, флаг в конце)
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)(?:[A-Za-z0-9]*)?',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country'],
-                'variant': 'from_match'
-            },
-            # Формат: 16 Plus 128 Teal 🇮🇳 60200
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'country', 'price'],
-                'variant': 'from_match'
-            },
-            # Формат: 🇦🇪15 Pro 128 Blue - 76000
-            {
-                'pattern': r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)',
-                'groups': ['country', 'generation', 'variant', 'storage', 'color', 'price'],
-                'variant': 'from_match'
-            },
-            # Формат: 16E 128 Black 🇮🇳 42800
-            {
-                'pattern': r'(\d{1,2}[A-Z]+)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'storage', 'color', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат: 🇨🇳16 Pro 128 Black - 79500
-            {
-                'pattern': r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)',
-                'groups': ['country', 'generation', 'variant', 'storage', 'color', 'price'],
-                'variant': 'from_match'
-            },
-            # Формат с 2SIM: 🇨🇳16Pro 128 Black - 80500🇨🇳2Sim
-            {
-                'pattern': r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)(\d{1,2}[A-Z]?)(Plus|Pro Max|Pro)?\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)?(2Sim|2SIM)?',
-                'groups': ['country', 'generation', 'variant', 'storage', 'color', 'price', 'country2', 'sim_code'],
-                'variant': 'from_match'
-            },
-            # Формат с GB в памяти: 14 128GB Midnight 2Sim 🇨🇳 43200
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)?\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат без пробела перед флагом: 13 128 Midnight 38500🇮🇳
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат Apple iPhone: Apple iPhone 11 64GB Black 27100🇷🇺
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат Apple iPhone с вариантом: Apple iPhone 16 Pro 128GB Black 2SIM 80000🇨🇳
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)?\s*(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'sim_code', 'price', 'country'],
-                'variant': 'from_match'
-            },
-            # Формат с тире и эмодзи: 14 128 Black 2 Sim 🇨🇳 - 43.300🚘
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(2\s*Sim|2Sim|2SIM)?\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s*-\s*(\d+[.,]\d+|\d+)[🚘🚚]?',
-                'groups': ['generation', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат с 2Sim в конце: 16 Pro 128GB Black 2Sim 🇨🇳 81000
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': 'from_match'
-            },
-            # Формат с 2Sim в конце без варианта: 14 128GB Midnight 2Sim 🇨🇳 43200
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)',
-                'groups': ['generation', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат без пробела между флагом и 2Sim: 16 128 Black 58800 🇨🇳2Sim
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)\s+([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)(2Sim|2SIM)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country', 'sim_code'],
-                'variant': ''
-            },
-            # Формат с кириллицей без пробела: 16 Prо 128 White 79300🇨🇳2Sim
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Prо Max|Prо|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇦🇺]+)(2Sim|2SIM)',
-                'groups': ['generation', 'variant', 'storage', 'color', 'price', 'country', 'sim_code'],
-                'variant': 'from_match'
-            },
-            # Формат с эмодзи в конце: 16 Pro 128GB Black 2Sim 🇨🇳 81000 🚚
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(Plus|Pro Max|Pro)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s+(\d+)\s*[🚘🚚]?',
-                'groups': ['generation', 'variant', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': 'from_match'
-            },
-            # Формат Apple iPhone с пробелами: Apple iPhone 11 64GB Black  27100🇷🇺
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат Apple iPhone с 2SIM: Apple iPhone 14 128GB Starlight 2SIM  42000🇨🇳
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(2Sim|2SIM)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'sim_code', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат Apple iPhone с пробелами: Apple iPhone 11 64GB Black  27100🇷🇺
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB))\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат Apple iPhone с пробелами (без GB): Apple iPhone 11 64 Black  27100🇷🇺
-            {
-                'pattern': r'Apple iPhone\s+(\d{1,2}[A-Z]?)\s+(\d+)\s+([A-Za-z\s]+?)\s+(\d+)([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)',
-                'groups': ['generation', 'storage', 'color', 'price', 'country'],
-                'variant': ''
-            },
-            # Формат с тире и эмодзи: 14 128 Black 2 Sim 🇨🇳 - 43.300🚘
-            {
-                'pattern': r'(\d{1,2}[A-Z]?)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s+(2\s*Sim|2Sim|2SIM)\s*([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+)\s*-\s*(\d+[.,]\d+|\d+)[🚘🚚]?',
-                'groups': ['generation', 'storage', 'color', 'sim_code', 'country', 'price'],
-                'variant': ''
-            },
-            # Формат iPhone 17 Air: 🇯🇵17 Air 256 Space Black - 107000 🛩 Выдача в 15:00
-            {
-                'pattern': r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳🇬🇧🇸🇬]+)(\d{1,2}[A-Z]?)\s+(Air|Plus|Pro Max|Pro)\s+(\d+(?:GB|TB)?)\s+([A-Za-z\s]+?)\s*-\s*(\d+)(?:\s*[🛩🚚🚘]?\s*[А-Яа-я\s]*)?',
-                'groups': ['country', 'generation', 'variant', 'storage', 'color', 'price'],
-                'variant': 'from_match'
-            }
-        ]
-    
     def _get_color_mappings(self) -> Dict[str, str]:
         """Маппинг цветов для нормализации"""
         return {
@@ -299,23 +149,23 @@ class IPhoneParser:
     
     def _is_iphone_line(self, line: str) -> bool:
         """Проверяет, что строка содержит информацию об iPhone"""
-        line_lower = line.lower()
+        features = get_line_features(line)
+        line_lower = features.lower
         
         # Должен содержать признаки iPhone цены
-        has_generation = bool(re.search(r'(11|12|13|14|15|16|16e|17)', line_lower))
-        has_storage = bool(re.search(r'(128|256|512|1tb|\b\d+\s*(gb|tb))', line_lower))  # Добавили конкретные объемы
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))  # Добавили поддержку цен с точкой/запятой
-        has_flag = bool(re.search(r'[🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]', line))
+        has_generation = bool(GENERATION_RE.search(line_lower))
+        has_storage = features.has_storage  # Добавили конкретные объемы
+        has_price = features.has_price  # Добавили поддержку цен с точкой/запятой
+        has_flag = features.has_flag
         
         # Дополнительная проверка для Apple iPhone строк
-        has_apple_iphone = bool(re.search(r'apple\s+iphone', line_lower))
+        has_apple_iphone = bool(APPLE_IPHONE_RE.search(line_lower))
         
         # Исключаем очевидно не iPhone строки
-        exclude_words = ['ipad', 'macbook', 'airpods', 'watch', 'adapter', 'гарантия', 'активаций', 'aw ', 'ultra 2', 'mini 7', 'pro 11']
-        has_exclude = any(word in line_lower for word in exclude_words)
+        has_exclude = any(word in line_lower for word in EXCLUDE_WORDS)
         
         # Исключаем заголовки разделов (только эмодзи + iPhone + поколение + вариант)
-        is_header = bool(re.search(r'^📲\s*iPhone\s*\d+[A-Z]?\s*(Air|Pro|Pro Max)?\s*$', line.strip(), re.IGNORECASE))
+        is_header = bool(HEADER_RE.search(line.strip()))
         
         # Исключаем заголовки разделов
         if is_header:
@@ -330,49 +180,22 @@ class IPhoneParser:
     
     def _parse_single_line(self, line: str) -> Optional[IPhonePriceData]:
         """Парсит одну строку"""
-        for pattern_info in self.patterns:
-            match = re.search(pattern_info['pattern'], line, re.IGNORECASE)
-            if match:
-                try:
-                    return self._extract_data_from_match(match, pattern_info, line)
-                except Exception as e:
-                    logger.warning(f"Ошибка извлечения данных из строки '{line}': {e}")
-                    continue
-        
-        return None
+        record = self.grammar.parse(line)
+        if record is None:
+            return None
+        return self._extract_data_from_record(record, line)
     
-    def _extract_data_from_match(self, match, pattern_info: Dict, line: str) -> IPhonePriceData:
-        """Извлекает данные из regex match"""
-        groups = pattern_info['groups']
-        data = {}
-        
-        # Извлекаем данные по группам
-        for i, group_name in enumerate(groups, 1):
-            if i <= len(match.groups()):
-                data[group_name] = match.group(i)
-        
-        # Нормализуем данные
-        generation = self._normalize_generation(data.get('generation', ''))
-        variant = self._normalize_variant(data.get('variant', ''), pattern_info.get('variant', ''))
-        storage = self._normalize_storage(data.get('storage', ''))
-        color = self._normalize_color(data.get('color', ''))
-        country_flag = data.get('country', data.get('country2', '🇺🇸'))
-        country_code = data.get('sim_code', '')
-        
-        # Обрабатываем цену с запятыми/точками как разделителями тысяч
-        price_str = data.get('price', '0')
-        if ',' in price_str or '.' in price_str:
-            price_str = price_str.replace(',', '').replace('.', '')
-        price = int(price_str)
-        
+    def _extract_data_from_record(self, record: Dict[str, str], line: str) -> IPhonePriceData:
+        """Собирает данные из полей, разобранных грамматикой"""
+        variant = ' '.join(record.get('variant', '').lower().split()).translate(CYRILLIC_LOOKALIKES)
         return IPhonePriceData(
-            generation=generation,
-            variant=variant,
-            storage=storage,
-            color=color,
-            country_flag=country_flag,
-            country_code=country_code,
-            price=price,
+            generation=self._normalize_generation(record['generation']),
+            variant=VARIANTS.get(variant, ''),
+            storage=self._normalize_storage(record['storage']),
+            color=self._normalize_color(record['color']),
+            country_flag=record['country'],
+            country_code=record.get('sim_code', ''),
+            price=int(record['price'].replace(',', '').replace('.', '')),
             source_line=line
         )
     
@@ -383,23 +206,6 @@ class IPhoneParser:
             return '16E'
         return gen
     
-    def _normalize_variant(self, variant: str, variant_type: str) -> str:
-        """Нормализует вариант iPhone"""
-        if variant_type == 'from_match' and variant:
-            variant = variant.strip()
-            # Нормализуем кириллические символы
-            variant = variant.replace('Prо', 'Pro').replace('Maх', 'Max')
-            
-            if variant.lower() == 'pro max':
-                return 'Pro Max'
-            elif variant.lower() == 'pro':
-                return 'Pro'
-            elif variant.lower() == 'plus':
-                return 'Plus'
-            elif variant.lower() == 'air':
-                return 'Air'
-        return ''
-    
     def _normalize_storage(self, storage: str) -> str:
         """Нормализует объем памяти"""
         storage = storage.strip().upper()
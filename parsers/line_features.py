@@ -0,0 +1,75 @@
+"""
+Общие предкомпилированные регулярные выражения и признаки строк прайса
+"""
+import re
+from functools import cached_property, lru_cache
+
+# Флаги стран в прайсах
+FLAG_CHARS = '🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳'
+FLAG_RE = re.compile(f'[{FLAG_CHARS}]')
+
+# Цена: 4-6 цифр или число с точкой/запятой (43.300, 124,800)
+PRICE_RE = re.compile(r'\d{4,6}|\d+[.,]\d+')
+# Цена только из цифр (для первичной фильтрации строк)
+PRICE_DIGITS_RE = re.compile(r'\d{4,6}')
+
+# Объем памяти iPhone (ищется в строке в нижнем регистре)
+STORAGE_RE = re.compile(r'(128|256|512|1tb|\b\d+\s*(gb|tb))')
+
+# Чип Apple Silicon (ищется в строке в нижнем регистре)
+CHIP_RE = re.compile(r'm[1-4]')
+
+# Размер корпуса Apple Watch: 40mm или "44 "
+SIZE_RE = re.compile(r'\d{2}mm|\d{2}\s')
+
+
+class LineFeatures:
+    """
+    Признаки одной строки прайса.
+
+    Каждый признак вычисляется при первом обращении и запоминается, а сами
+    объекты кэшируются по тексту строки в get_line_features, поэтому
+    классификатор и все парсеры используют один результат.
+    """
+
+    def __init__(self, line: str):
+        self.line = line
+
+    @cached_property
+    def lower(self) -> str:
+        return self.line.lower()
+
+    @cached_property
+    def has_price(self) -> bool:
+        return bool(PRICE_RE.search(self.line))
+
+    @cached_property
+    def has_price_digits(self) -> bool:
+        return bool(PRICE_DIGITS_RE.search(self.line))
+
+    @cached_property
+    def has_flag(self) -> bool:
+        return bool(FLAG_RE.search(self.line))
+
+    @cached_property
+    def has_storage(self) -> bool:
+        return bool(STORAGE_RE.search(self.lower))
+
+    @cached_property
+    def has_config(self) -> bool:
+        """Есть объем памяти в GB/TB"""
+        return 'gb' in self.lower or 'tb' in self.lower
+
+    @cached_property
+    def has_chip(self) -> bool:
+        return bool(CHIP_RE.search(self.lower))
+
+    @cached_property
+    def has_size(self) -> bool:
+        return bool(SIZE_RE.search(self.line))
+
+
+@lru_cache(maxsize=8192)
+def get_line_features(line: str) -> LineFeatures:
+    """Возвращает признаки строки (один объект на одинаковый текст строки)"""
+    return LineFeatures(line)
@@ -0,0 +1,156 @@
+"""
+Лексер строк прайса: строка за один проход превращается в типизированные токены,
+а грамматики устройств собирают из токенов запись вместо перебора регулярных выражений
+
+Грамматикой разбираются строки iPhone. Парсеры MacBook, iPad, Apple Watch и
+AirPods пока перебирают свои регулярные выражения: у каждого свои поправки
+полей по номеру шаблона, поэтому их перевод на LineGrammar меняет результаты
+и идет отдельной задачей с перезаписью эталона (benchmarks/golden_corpus.py).
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Callable, NamedTuple
+
+# Флаг страны - пара regional indicator символов, несколько флагов подряд - один токен
+FLAG_PATTERN = r'(?:[\U0001F1E6-\U0001F1FF]{2})+'
+
+# Одно регулярное выражение на все типы токенов: пробелы перед токеном
+# поглощаются им же, а альтернативы, начинающиеся с цифры, стоят за (?=\d),
+# чтобы на буквах и эмодзи движок не перебирал их по очереди
+TOKEN_RE = re.compile(
+    r'\s*(?:'
+    rf'(?P<FLAG>{FLAG_PATTERN})'
+    r'|(?P<SIM>(?:2\s*|e)sim(?![a-z])|dual(?![a-z]))'
+    r'|(?=\d)(?:'
+    r'(?P<MEM_STORAGE>\d+/\d+(?:gb|tb)?(?![a-z0-9]))'
+    r'|(?P<STORAGE>\d+(?:gb|tb)(?![a-z0-9])|\d{3}(?![\d.,a-z]))'
+    r'|(?P<PRICE>\d{1,3}(?:[.,]\d{3})+(?![\d.,])|\d{4,}(?![\d.,]))'
+    r'|(?P<GENERATION>\d{1,2}(?:[a-zе](?![a-z]))?(?!\d))'
+    r'|(?P<NUMBER>\d+))'
+    # Вариант модели с кириллическими "о" и "х" (Prо, Maх), Pro Max - один токен
+    r'|(?P<VARIANT>(?:pr[oо]\s+ma[xх]|pr[oо]|plus|air)(?![a-zа-я]))'
+    r'|(?P<PRODUCT_CODE>(?-i:[A-Z][A-Z0-9]*\d[A-Z0-9]*)(?![a-z0-9]))'
+    r'|(?P<DASH>-)'
+    r'|(?P<WORD>[a-z]+)'
+    # Слово не латиницей (русский текст) - один токен, остальное по символу
+    r'|(?P<OTHER>[^\W\d_]+|\S))',
+    re.IGNORECASE
+)
+
+
+class Token(NamedTuple):
+    """Токен строки: тип, текст и позиция в строке"""
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+def tokenize(line: str) -> List[Token]:
+    """Токены строки слева направо (пробелы пропускаются)"""
+    tokens = []
+    for match in TOKEN_RE.finditer(line):
+        kind = match.lastgroup
+        start, end = match.span(kind)
+        tokens.append(Token(kind, line[start:end], start, end))
+    return tokens
+
+
+@dataclass
+class Field:
+    """
+    Поле записи в грамматике.
+
+    kinds - типы токенов, из которых берется значение; check - дополнительная
+    проверка текста токена; repeat - поле из нескольких токенов подряд через
+    пробел (цвет из нескольких слов); tight - токен должен идти сразу за
+    предыдущим, без пробела.
+    """
+    name: str
+    kinds: Tuple[str, ...]
+    optional: bool = False
+    repeat: bool = False
+    tight: bool = False
+    check: Optional[Callable[[str], bool]] = None
+
+    def accepts(self, token: Token) -> bool:
+        return token.kind in self.kinds and (self.check is None or self.check(token.text))
+
+
+class LineGrammar:
+    """
+    Грамматика строки устройства: голова в фиксированном порядке и хвост в любом.
+
+    Голова (например, поколение, вариант, память, цвет) ищется с первого
+    подходящего токена - все, что стоит перед ней (флаг, "Apple iPhone",
+    эмодзи), пропускается, а поля хвоста из этого префикса засчитываются.
+    Поля хвоста (цена, флаг, 2Sim) собираются после головы в любом порядке
+    до первого токена, которого нет в tail_skip. Перед головой допускаются
+    только токены из prefix (артикул или 8/256 перед ней - строка другого
+    устройства). Новый формат строки - это новый тип токена или поле в таблице,
+    а не еще одно регулярное выражение.
+    """
+
+    def __init__(self, head: List[Field], tail: List[Field], tail_skip: Tuple[str, ...] = (),
+                 prefix: Tuple[str, ...] = ('FLAG', 'WORD', 'OTHER')):
+        self.head = head
+        self.tail = tail
+        self.tail_skip = tail_skip
+        self.prefix = prefix
+
+    def parse(self, line: str, tokens: Optional[List[Token]] = None) -> Optional[Dict[str, str]]:
+        """Поля записи или None, если строка не подходит под грамматику"""
+        tokens = tokenize(line) if tokens is None else tokens
+        for start, token in enumerate(tokens):
+            if self.head[0].accepts(token):
+                record = self._parse_from(line, tokens, start)
+                if record is not None:
+                    return record
+            if token.kind not in self.prefix:
+                break
+        return None
+
+    def _parse_from(self, line: str, tokens: List[Token], start: int) -> Optional[Dict[str, str]]:
+        record = {}
+        position = start
+        for field in self.head:
+            taken = self._take(line, tokens, position, field)
+            if taken is None:
+                if not field.optional:
+                    return None
+                continue
+            record[field.name], position = taken
+
+        # Поля хвоста из префикса (флаг перед поколением), затем из хвоста
+        for token in tokens[:start]:
+            self._fill_tail(record, token)
+        for token in tokens[position:]:
+            if not self._fill_tail(record, token) and token.kind not in self.tail_skip:
+                break
+
+        if all(field.optional or field.name in record for field in self.tail):
+            return record
+        return None
+
+    def _take(self, line: str, tokens: List[Token], position: int, field: Field) -> Optional[Tuple[str, int]]:
+        """Значение поля головы с позиции position и позиция после него"""
+        if position >= len(tokens) or not field.accepts(tokens[position]):
+            return None
+        if field.tight and position > 0 and tokens[position - 1].end != tokens[position].start:
+            return None
+
+        end = position + 1
+        if field.repeat:
+            # Следующие токены того же поля, отделенные от предыдущего только пробелами
+            while (end < len(tokens) and field.accepts(tokens[end])
+                   and line[tokens[end - 1].end:tokens[end].start].isspace()):
+                end += 1
+        return line[tokens[position].start:tokens[end - 1].end], end
+
+    def _fill_tail(self, record: Dict[str, str], token: Token) -> bool:
+        """Записывает токен в первое незаполненное поле хвоста, которое его принимает"""
+        for field in self.tail:
+            if field.name not in record and field.accepts(token):
+                record[field.name] = token.text
+                return True
+        return False
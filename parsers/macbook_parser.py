@@ -6,8 +6,15 @@ import logging
 from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from parsers.line_features import FLAG_CHARS, get_line_features
+from parsers.section_context import macbook_context_tracker
+
 logger = logging.getLogger(__name__)
 
+# Новый формат: 🇺🇸 MGND3 - 8/256 Gold — 62.000₽
+FLAG_FORMAT_RE = re.compile(f'[{FLAG_CHARS}]+\\s+[A-Z0-9]+\\s*-\\s*\\d+/\\d+')
+COUNTRY_RE = re.compile(f'([{FLAG_CHARS}])')
+
 @dataclass
 class MacBookPrice:
     """Структура для цены MacBook"""
@@ -168,20 +175,24 @@ class MacBookParser:
             'Black': 'Space Black',
             'Space': 'Space Gray'
         }
+        
+        # Модель, размер и чип из заголовков секций для строк без них ("🇺🇸 MGND3 - 8/256 Gold")
+        self.section_tracker = macbook_context_tracker()
 
     def _is_macbook_line(self, line: str) -> bool:
         """Проверяет, является ли строка MacBook"""
-        line_lower = line.lower()
+        features = get_line_features(line)
+        line_lower = features.lower
         
         # Проверяем наличие MacBook или чипов
-        has_macbook = 'macbook' in line_lower or bool(re.search(r'm[1-4]', line_lower))
+        has_macbook = 'macbook' in line_lower or features.has_chip
         
         # Проверяем наличие цены (4-6 цифр или с точками/запятыми)
-        has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+        has_price = features.has_price
         
         # Проверяем наличие конфигурации (GB/TB) или новый формат с флагом
-        has_config = 'gb' in line_lower or 'tb' in line_lower
-        has_flag_format = bool(re.search(r'[🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]+\s+[A-Z0-9]+\s*-\s*\d+/\d+', line))
+        has_config = features.has_config
+        has_flag_format = features.has_flag and bool(FLAG_FORMAT_RE.search(line))
         
         # Исключаем ненужные строки
         exclude_keywords = ['гарантия', 'активаций', 'adapter', 'от 10 шт', 'mouse', 'trackpad', 'pencil']
@@ -200,7 +211,7 @@ class MacBookParser:
 
     def _extract_country(self, line: str) -> str:
         """Извлекает страну из строки"""
-        country_match = re.search(r'([🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳])', line)
+        country_match = COUNTRY_RE.search(line)
         return country_match.group(1) if country_match else ''
 
     def _normalize_color(self, color: str) -> str:
@@ -219,43 +230,31 @@ class MacBookParser:
         else:
             return f"{storage}GB"
     
-    def _extract_context_from_previous_lines(self, lines: List[str], current_index: int) -> Dict[str, str]:
-        """Извлекает контекст из предыдущих строк для определения модели, чипа и размера"""
-        context = {'model': 'Air', 'chip': 'M1', 'size': '13'}
-        
-        # Ищем в предыдущих 5 строках
-        start_index = max(0, current_index - 5)
-        for i in range(start_index, current_index):
-            if i < len(lines):
-                line = lines[i].strip()
-                line_lower = line.lower()
-                
-                # Ищем модель
-                if 'macbook air' in line_lower:
-                    context['model'] = 'Air'
-                    # Ищем размер
-                    size_match = re.search(r'air\s+(\d+)', line_lower)
-                    if size_match:
-                        context['size'] = size_match.group(1)
-                elif 'macbook pro' in line_lower:
-                    context['model'] = 'Pro'
-                    # Ищем размер
-                    size_match = re.search(r'pro\s+(\d+)', line_lower)
-                    if size_match:
-                        context['size'] = size_match.group(1)
-                
-                # Ищем чип
-                chip_match = re.search(r'm(\d+)', line_lower)
-                if chip_match:
-                    context['chip'] = f"M{chip_match.group(1)}"
-        
-        return context
+    def section_contexts(self, lines: List[str], section_lines: List[str] = None,
+                         section_start: Dict[str, str] = None) -> List[Dict[str, str]]:
+        """Контекст секции (модель, чип, размер) для каждой строки из lines"""
+        if section_lines is None:
+            return self.section_tracker.contexts(lines, section_start)
+        return self.section_tracker.contexts_for(lines, section_lines, section_start)
 
-    def parse_lines(self, lines: List[str]) -> Tuple[List[MacBookPrice], List[str]]:
-        """Парсит строки с MacBook"""
+    def parse_lines(self, lines: List[str], section_lines: List[str] = None,
+                    section_start: Dict[str, str] = None,
+                    contexts: List[Dict[str, str]] = None) -> Tuple[List[MacBookPrice], List[str]]:
+        """
+        Парсит строки с MacBook
+        
+        Args:
+            section_lines: все строки сообщения, если lines - только строки MacBook из него
+                (тогда заголовки секций без цен тоже задают контекст)
+            section_start: контекст секции после предыдущей части файла, если он читается частями
+            contexts: уже посчитанный контекст секции для каждой строки из lines
+        """
         parsed_prices = []
         unparsed_lines = []
         
+        if contexts is None:
+            contexts = self.section_contexts(lines, section_lines, section_start)
+        
         for i, line in enumerate(lines):
             line = line.strip()
             if not line or not self._is_macbook_line(line):
@@ -263,7 +262,7 @@ class MacBookParser:
                 continue
                 
             try:
-                price = self._parse_single_line(line, lines, i)
+                price = self._parse_single_line(line, context=contexts[i])
                 if price:
                     parsed_prices.append(price)
                 else:
@@ -274,8 +273,12 @@ class MacBookParser:
         
         return parsed_prices, unparsed_lines
 
-    def _parse_single_line(self, line: str, lines: List[str] = None, current_index: int = 0) -> MacBookPrice:
-        """Парсит одну строку MacBook"""
+    def _parse_single_line(self, line: str, lines: List[str] = None, current_index: int = 0,
+                           context: Dict[str, str] = None) -> MacBookPrice:
+        """Парсит одну строку MacBook (контекст секции - из context или из lines до current_index)"""
+        if context is None:
+            context = self.section_tracker.context_before(lines or [], current_index)
+        
         for i, pattern in enumerate(self.patterns):
             match = re.search(pattern, line, re.IGNORECASE)
             if match:
@@ -298,12 +301,10 @@ class MacBookParser:
                     # Обрабатываем каждый паттерн
                     if i == 0:  # Новый формат: 🇺🇸 MGND3 - 8/256 Gold — 62.000₽
                         country, product_code, memory, storage, color, price = groups
-                        # Извлекаем контекст из предыдущих строк
-                        if lines and current_index is not None:
-                            context = self._extract_context_from_previous_lines(lines, current_index)
-                            model = context['model']
-                            chip = context['chip']
-                            size = context['size']
+                        # Модель, чип и размер из контекста секции
+                        model = context['model']
+                        chip = context['chip']
+                        size = context['size']
                         # Нормализуем цену (убираем точки и запятые)
                         price = price.replace('.', '').replace(',', '')
                         # Добавляем GB к storage если его нет
@@ -530,16 +531,10 @@ class MacBookParser:
                             
                     elif i == 26:  # Новый формат: 🇺🇸 MGND3 - 8/256 Gold — 62.000₽
                         country, product_code, memory, storage, color, price = groups
-                        # Извлекаем контекст из предыдущих строк
-                        if lines and current_index is not None:
-                            context = self._extract_context_from_previous_lines(lines, current_index)
-                            model = context['model']
-                            chip = context['chip']
-                            size = context['size']
-                        else:
-                            model = 'Air'
-                            chip = 'M1'
-                            size = '13'
+                        # Модель, чип и размер из контекста секции
+                        model = context['model']
+                        chip = context['chip']
+                        size = context['size']
                         delivery = ''
                         # Нормализуем цену (убираем точки и запятые)
                         price = price.replace('.', '').replace(',', '')
@@ -0,0 +1,122 @@
+"""
+Однопроходное отслеживание контекста секций прайса (заголовки вида "MacBook Air 13 M2")
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Pattern
+
+
+@dataclass
+class HeaderRule:
+    """
+    Правило обновления контекста по строке.
+
+    Именованные группы pattern записываются в одноименные поля контекста
+    (через format, если он задан), values - фиксированные значения полей.
+    """
+    pattern: Pattern
+    values: Dict[str, str] = field(default_factory=dict)
+    formats: Dict[str, str] = field(default_factory=dict)
+
+
+class SectionContextTracker:
+    """
+    Контекст секции для каждой строки за один проход по сообщению.
+
+    Строки идут по порядку; строка, подходящая под правило, обновляет поля
+    контекста для всех следующих строк, строка другой секции (reset_pattern)
+    возвращает значения по умолчанию. Каждая строка получает контекст,
+    сложившийся до нее, за O(1) без повторного просмотра предыдущих строк.
+    Правила передаются при создании, поэтому трекер подходит любому парсеру.
+    """
+
+    def __init__(self, rules: List[HeaderRule], defaults: Dict[str, str],
+                 reset_pattern: Optional[Pattern] = None):
+        self.rules = rules
+        self.defaults = dict(defaults)
+        self.reset_pattern = reset_pattern
+
+    def contexts(self, lines: List[str], start: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """
+        Контекст перед каждой строкой (строка сама на свой контекст не влияет)
+
+        start - контекст после предыдущей части текста, если он читается частями
+        """
+        result = []
+        context = dict(start or self.defaults)
+        for line in lines:
+            result.append(context)
+            context = self._apply(context, line)
+        return result
+
+    def context_before(self, lines: List[str], index: int) -> Dict[str, str]:
+        """Контекст перед строкой с номером index"""
+        context = dict(self.defaults)
+        for line in lines[:index]:
+            context = self._apply(context, line)
+        return context
+
+    def advance(self, lines: List[str], start: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Контекст после всех строк (начальный для следующей части текста)"""
+        context = dict(start or self.defaults)
+        for line in lines:
+            context = self._apply(context, line)
+        return context
+
+    def contexts_for(self, lines: List[str], section_lines: List[str],
+                     start: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """
+        Контекст для строк lines, взятых по порядку из section_lines.
+
+        Позволяет парсеру получить только свои строки, а заголовки секций
+        (без цены, поэтому не попавшие в lines) учитывать из всего сообщения.
+        """
+        section_contexts = self.contexts(section_lines, start)
+        result = []
+        position = 0
+        for line in lines:
+            while position < len(section_lines) and section_lines[position] != line:
+                position += 1
+            if position < len(section_lines):
+                result.append(section_contexts[position])
+                position += 1
+            else:
+                result.append(dict(self.defaults))
+        return result
+
+    def _apply(self, context: Dict[str, str], line: str) -> Dict[str, str]:
+        """Новый контекст после строки (исходный не изменяется - он уже выдан строкам)"""
+        line_lower = line.strip().lower()
+        if not line_lower:
+            return context
+
+        if self.reset_pattern and self.reset_pattern.search(line_lower):
+            return dict(self.defaults)
+
+        updated = None
+        for rule in self.rules:
+            match = rule.pattern.search(line_lower)
+            if not match:
+                continue
+            if updated is None:
+                updated = dict(context)
+            updated.update(rule.values)
+            for name, value in match.groupdict().items():
+                if value:
+                    updated[name] = rule.formats.get(name, '{}').format(value)
+        return updated if updated is not None else context
+
+
+def macbook_context_tracker() -> SectionContextTracker:
+    """Трекер модели, размера и чипа MacBook"""
+    return SectionContextTracker(
+        rules=[
+            HeaderRule(re.compile(r'macbook\s+air(?:\s+(?P<size>\d+))?'), values={'model': 'Air'}),
+            HeaderRule(re.compile(r'macbook\s+pro(?:\s+(?P<size>\d+))?'), values={'model': 'Pro'}),
+            # Латинская и кириллическая М (в прайсах встречается "М4")
+            HeaderRule(re.compile(r'\b[mм](?P<chip>\d+)\b'), formats={'chip': 'M{}'}),
+        ],
+        defaults={'model': 'Air', 'chip': 'M1', 'size': '13'},
+        # Начало секции другого устройства сбрасывает контекст MacBook
+        reset_pattern=re.compile(r'iphone|ipad|airpods|apple watch|imac|mac mini'),
+    )
@@ -4,33 +4,56 @@
 import logging
 from typing import List, Dict, Any
 from django.utils import timezone
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
+
+from services.bulk_upsert import bulk_upsert_service, build_rows
+from parsers.airpods_parser import AirPodsData
 
 logger = logging.getLogger(__name__)
 
 class AirPodsService:
     """Сервис для сохранения данных AirPods"""
     
-    @sync_to_async
+    async def save_parsed_prices(self, items: List[AirPodsData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены AirPods одной пачкой"""
+        from db_app.models import AirPods
+        
+        rows = build_rows(items, lambda item: self._build_airpods_row(self._item_to_dict(item, source)))
+        counts = await bulk_upsert_service.upsert(AirPods, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
+    
+    def _item_to_dict(self, item, source: str) -> Dict[str, Any]:
+        """Конвертирует распарсенный объект в формат save_airpods_price"""
+        data = item.to_dict()
+        data['source'] = source
+        return data
+    
+    def _build_airpods_row(self, airpods_data: Dict[str, Any]) -> tuple:
+        """Возвращает (ключ, значения) записи AirPods для update_or_create/upsert"""
+        lookup = {
+            'model': airpods_data.get('variant', 'AirPods'),
+            'generation': airpods_data.get('generation', '4'),
+            'features': airpods_data.get('features', ''),
+            'color': airpods_data.get('color', 'White'),
+            'year': airpods_data.get('year', ''),
+            'country': airpods_data.get('country', '🇺🇸')
+        }
+        defaults = {
+            'price': airpods_data.get('price', 0),
+            'product_code': airpods_data.get('product_code', ''),
+            'source': f"Parsed at {timezone.now()}"
+        }
+        return lookup, defaults
+    
+    @db_write
     def save_airpods_price(self, airpods_data: Dict[str, Any]) -> bool:
         """Сохраняет цену AirPods в базу данных"""
         try:
             from db_app.models import AirPods
             
             # Создаем или обновляем запись
-            airpods, created = AirPods.objects.update_or_create(
-                model=airpods_data.get('variant', 'AirPods'),
-                generation=airpods_data.get('generation', '4'),
-                features=airpods_data.get('features', ''),
-                color=airpods_data.get('color', 'White'),
-                year=airpods_data.get('year', ''),
-                country=airpods_data.get('country', '🇺🇸'),
-                defaults={
-                    'price': airpods_data.get('price', 0),
-                    'product_code': airpods_data.get('product_code', ''),
-                    'source': f"Parsed at {timezone.now()}",
-                }
-            )
+            lookup, defaults = self._build_airpods_row(airpods_data)
+            airpods, created = AirPods.objects.update_or_create(**lookup, defaults=defaults)
             
             action = "создана" if created else "обновлена"
             logger.info(f"AirPods запись {action}: {airpods}")
@@ -40,13 +63,13 @@ class AirPodsService:
             logger.error(f"Ошибка сохранения AirPods: {e}")
             return False
     
-    @sync_to_async
+    @db_read
     def get_all_airpods(self) -> List[Dict[str, Any]]:
         """Получает все AirPods из базы данных"""
         try:
             from db_app.models import AirPods
             
-            airpods = AirPods.objects.all().order_by('model', 'generation', 'features')
+            airpods = AirPods.objects.with_display_price().order_by('model', 'generation', 'features')
             
             return [
                 {
@@ -69,13 +92,13 @@ class AirPodsService:
             logger.error(f"Ошибка получения AirPods: {e}")
             return []
     
-    @sync_to_async
+    @db_read
     def get_airpods_by_model(self, model: str) -> List[Dict[str, Any]]:
         """Получает AirPods по модели"""
         try:
             from db_app.models import AirPods
             
-            airpods = AirPods.objects.filter(model__icontains=model).order_by('generation', 'features')
+            airpods = AirPods.objects.with_display_price().filter(model__icontains=model).order_by('generation', 'features')
             
             return [
                 {
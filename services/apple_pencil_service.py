@@ -4,7 +4,10 @@
 import logging
 from typing import List, Dict, Any
 from django.utils import timezone
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
+
+from services.bulk_upsert import bulk_upsert_service, build_rows
+from parsers.apple_pencil_parser import ApplePencilData
 
 logger = logging.getLogger(__name__)
 
@@ -21,42 +24,56 @@ class ApplePencilService:
         parser = ApplePencilParser()
         parsed_items, unparsed = parser.parse_lines(lines)
         
-        saved_count = 0
-        for item in parsed_items:
-            # Конвертируем в формат для save_apple_pencil_price
-            data = {
-                'device': 'Apple Pencil',
-                'generation': item.generation,
-                'connector': item.connector,
-                'country': item.country_flag,
-                'price': str(item.price),
-                'product_code': item.product_code,
-                'source': source
-            }
-            
-            if await self.save_apple_pencil_price(data):
-                saved_count += 1
+        save_result = await self.save_parsed_prices(parsed_items, source)
+        
+        return parsed_items, save_result['total_saved']
+    
+    async def save_parsed_prices(self, items: List[ApplePencilData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены Apple Pencil одной пачкой"""
+        from db_app.models import ApplePencil
         
-        return parsed_items, saved_count
+        rows = build_rows(items, lambda item: self._build_apple_pencil_row(self._item_to_dict(item, source)))
+        counts = await bulk_upsert_service.upsert(ApplePencil, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
     
-    @sync_to_async
+    def _item_to_dict(self, item, source: str) -> Dict[str, Any]:
+        """Конвертирует распарсенный объект в формат save_apple_pencil_price"""
+        # Конвертируем в формат для save_apple_pencil_price
+        data = {
+            'device': 'Apple Pencil',
+            'generation': item.generation,
+            'connector': item.connector,
+            'country': item.country_flag,
+            'price': str(item.price),
+            'product_code': item.product_code,
+            'source': source
+        }
+        return data
+    
+    def _build_apple_pencil_row(self, pencil_data: Dict[str, Any]) -> tuple:
+        """Возвращает (ключ, значения) записи Apple Pencil для update_or_create/upsert"""
+        lookup = {
+            'model': pencil_data.get('variant', 'Apple Pencil'),
+            'generation': pencil_data.get('generation', '2'),
+            'connector': pencil_data.get('connector', 'Lightning'),
+            'country': pencil_data.get('country', '🇺🇸')
+        }
+        defaults = {
+            'price': pencil_data.get('price', 0),
+            'product_code': pencil_data.get('product_code', ''),
+            'source': f"Parsed at {timezone.now()}"
+        }
+        return lookup, defaults
+    
+    @db_write
     def save_apple_pencil_price(self, pencil_data: Dict[str, Any]) -> bool:
         """Сохраняет цену Apple Pencil в базу данных"""
         try:
             from db_app.models import ApplePencil
             
             # Создаем или обновляем запись
-            pencil, created = ApplePencil.objects.update_or_create(
-                model=pencil_data.get('variant', 'Apple Pencil'),
-                generation=pencil_data.get('generation', '2'),
-                connector=pencil_data.get('connector', 'Lightning'),
-                country=pencil_data.get('country', '🇺🇸'),
-                defaults={
-                    'price': pencil_data.get('price', 0),
-                    'product_code': pencil_data.get('product_code', ''),
-                    'source': f"Parsed at {timezone.now()}",
-                }
-            )
+            lookup, defaults = self._build_apple_pencil_row(pencil_data)
+            pencil, created = ApplePencil.objects.update_or_create(**lookup, defaults=defaults)
             
             action = "создана" if created else "обновлена"
             logger.info(f"Apple Pencil запись {action}: {pencil}")
@@ -66,13 +83,13 @@ class ApplePencilService:
             logger.error(f"Ошибка сохранения Apple Pencil: {e}")
             return False
     
-    @sync_to_async
+    @db_read
     def get_all_apple_pencils(self) -> List[Dict[str, Any]]:
         """Получает все Apple Pencil из базы данных"""
         try:
             from db_app.models import ApplePencil
             
-            pencils = ApplePencil.objects.all().order_by('generation', 'connector')
+            pencils = ApplePencil.objects.with_display_price().order_by('generation', 'connector')
             
             return [
                 {
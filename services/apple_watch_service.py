@@ -4,36 +4,71 @@
 import logging
 from typing import List, Dict, Any
 from django.utils import timezone
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
+
+from services.bulk_upsert import bulk_upsert_service, build_rows
+from parsers.apple_watch_parser import AppleWatchData
 
 logger = logging.getLogger(__name__)
 
 class AppleWatchService:
     """Сервис для сохранения данных Apple Watch"""
     
-    @sync_to_async
+    async def save_parsed_prices(self, items: List[AppleWatchData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены Apple Watch одной пачкой"""
+        from db_app.models import AppleWatch
+        
+        rows = build_rows(items, lambda item: self._build_apple_watch_row(self._item_to_dict(item, source)))
+        counts = await bulk_upsert_service.upsert(AppleWatch, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
+    
+    def _item_to_dict(self, item, source: str) -> Dict[str, Any]:
+        """Конвертирует распарсенный объект в формат save_apple_watch_price"""
+        # Серия в базе: SE, S10, Ultra 2 (у Ultra поколение хранится целиком)
+        series = item.generation if item.model == 'Ultra' else item.model
+        data = {
+            'variant': series,
+            'size': item.size,
+            'color': item.color,
+            'band_type': item.band_type,
+            'band_size': item.band_size,
+            'connectivity': item.connectivity,
+            'country': item.country_flag,
+            'price': item.price,
+            'product_code': item.product_code,
+            'source': source
+        }
+        return data
+    
+    def _build_apple_watch_row(self, watch_data: Dict[str, Any]) -> tuple:
+        """Возвращает (ключ, значения) записи Apple Watch для update_or_create/upsert"""
+        lookup = {
+            'series': watch_data.get('variant', 'SE'),
+            'size': watch_data.get('size', '40'),
+            'case_color': watch_data.get('color', 'Midnight'),
+            'band_type': watch_data.get('band_type', 'Sport Band'),
+            'band_color': watch_data.get('band_color', ''),
+            'band_size': watch_data.get('band_size', 'M/L'),
+            'connectivity': watch_data.get('connectivity', 'GPS'),
+            'country': watch_data.get('country', '🇺🇸')
+        }
+        defaults = {
+            'case_material': watch_data.get('case_material', 'Aluminum'),
+            'price': watch_data.get('price', 0),
+            'product_code': watch_data.get('product_code', ''),
+            'source': f"Parsed at {timezone.now()}"
+        }
+        return lookup, defaults
+    
+    @db_write
     def save_apple_watch_price(self, watch_data: Dict[str, Any]) -> bool:
         """Сохраняет цену Apple Watch в базу данных"""
         try:
             from db_app.models import AppleWatch
             
             # Создаем или обновляем запись
-            watch, created = AppleWatch.objects.update_or_create(
-                series=watch_data.get('variant', 'SE'),
-                size=watch_data.get('size', '40'),
-                case_color=watch_data.get('color', 'Midnight'),
-                band_type=watch_data.get('band_type', 'Sport Band'),
-                band_color=watch_data.get('band_color', ''),
-                band_size=watch_data.get('band_size', 'M/L'),
-                connectivity=watch_data.get('connectivity', 'GPS'),
-                country=watch_data.get('country', '🇺🇸'),
-                defaults={
-                    'case_material': watch_data.get('case_material', 'Aluminum'),
-                    'price': watch_data.get('price', 0),
-                    'product_code': watch_data.get('product_code', ''),
-                    'source': f"Parsed at {timezone.now()}",
-                }
-            )
+            lookup, defaults = self._build_apple_watch_row(watch_data)
+            watch, created = AppleWatch.objects.update_or_create(**lookup, defaults=defaults)
             
             action = "создана" if created else "обновлена"
             logger.info(f"Apple Watch запись {action}: {watch}")
@@ -43,13 +78,13 @@ class AppleWatchService:
             logger.error(f"Ошибка сохранения Apple Watch: {e}")
             return False
     
-    @sync_to_async
+    @db_read
     def get_all_apple_watches(self) -> List[Dict[str, Any]]:
         """Получает все Apple Watch из базы данных"""
         try:
             from db_app.models import AppleWatch
             
-            watches = AppleWatch.objects.all().order_by('series', 'size', 'case_color')
+            watches = AppleWatch.objects.with_display_price().order_by('series', 'size', 'case_color')
             
             return [
                 {
@@ -76,13 +111,13 @@ class AppleWatchService:
             logger.error(f"Ошибка получения Apple Watch: {e}")
             return []
     
-    @sync_to_async
+    @db_read
     def get_watches_by_series(self, series: str) -> List[Dict[str, Any]]:
         """Получает Apple Watch по серии"""
         try:
             from db_app.models import AppleWatch
             
-            watches = AppleWatch.objects.filter(series=series).order_by('size', 'case_color')
+            watches = AppleWatch.objects.with_display_price().filter(series=series).order_by('size', 'case_color')
             
             return [
                 {
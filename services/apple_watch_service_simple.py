@@ -1,6 +1,6 @@
 import logging
 from typing import Dict, Any, Optional
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_write
 from db_app.models import AppleWatch
 
 logger = logging.getLogger(__name__)
@@ -37,7 +37,7 @@ class AppleWatchServiceSimple:
             'unparsed_lines': unparsed_lines
         }
     
-    @sync_to_async
+    @db_write
     def save_apple_watch_price(self, price_data: Dict[str, Any]) -> Optional[AppleWatch]:
         """Сохраняет цену Apple Watch в базу данных"""
         try:
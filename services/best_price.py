@@ -0,0 +1,211 @@
+"""
+Индекс лучших цен: самое дешевое свежее предложение каждой конфигурации по всем источникам и странам
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from services.db_gateway import db_read, db_write
+
+logger = logging.getLogger(__name__)
+
+# Через сколько дней без подтверждения предложение уступает лучшее место более свежему
+BEST_PRICE_MAX_AGE_DAYS = int(os.getenv("BEST_PRICE_MAX_AGE_DAYS", "7"))
+
+# Как часто лучшие предложения, которые никто не подтверждает, заменяются свежими (секунды)
+BEST_PRICE_EXPIRE_INTERVAL = int(os.getenv("BEST_PRICE_EXPIRE_INTERVAL", "3600"))
+
+# Поля уникального ключа устройства, не входящие в конфигурацию:
+# лучшая цена конфигурации ищется среди всех стран
+BEST_PRICE_IGNORED_FIELDS = ('country',)
+
+DAY = 24 * 3600
+
+
+def config_key(key_fields: List[str], key: tuple) -> str:
+    """Ключ конфигурации по уникальному ключу записи устройства (без страны)"""
+    return '|'.join(
+        '' if value is None else str(value)
+        for field, value in zip(key_fields, key)
+        if field not in BEST_PRICE_IGNORED_FIELDS
+    )
+
+
+class BestPriceIndex:
+    """
+    Поддерживает BestPrice - лучшее предложение каждой конфигурации.
+
+    Предложение - строка LatestPrice (SKU + источник). При сохранении прайса
+    для каждой цены сравнивается только текущее лучшее ее конфигурации:
+    более дешевое предложение занимает его место сразу. Если подорожало или
+    устарело само лучшее предложение, следующее берется запросом по индексу
+    LatestPrice (device, config_id, price, observed_at) - первая свежая строка, без
+    перебора всех предложений. Устаревшим считается предложение, не
+    подтвержденное BEST_PRICE_MAX_AGE_DAYS дней; если свежих нет, лучшим
+    остается самое дешевое из старых с пометкой stale.
+
+    Конфигурации из сохраняемого прайса проверяются на устаревание сразу
+    (update_sync), остальные - периодической задачей бота (expire_periodically).
+    """
+
+    def __init__(self, max_age_days: int = BEST_PRICE_MAX_AGE_DAYS):
+        self.max_age = max_age_days * DAY
+
+    def update_sync(self, device: int, source_id: int, observed_at: int,
+                    offers: Dict[int, Tuple[int, int]]) -> int:
+        """
+        Учитывает предложения источника {sku_id: (config_id, цена)}, уже записанные в LatestPrice.
+
+        Возвращает число конфигураций, у которых сменилось лучшее предложение или цена.
+        """
+        from db_app.models import BestPrice
+
+        cutoff = observed_at - self.max_age
+        bests = {
+            best.config_id: best
+            for best in BestPrice.objects.filter(device=device, config_id__in={config for config, _ in offers.values()})
+        }
+        new_bests: Dict[int, Any] = {}
+        to_promote = set()
+
+        for sku_id, (config_id, price) in offers.items():
+            best = new_bests.get(config_id) or bests.get(config_id)
+            is_current = best is not None and best.sku_id == sku_id and best.source_id == source_id
+            # stale: свежих предложений не было, иначе одно из них уже заняло бы место лучшего
+            if best is None or best.stale or price < best.price or (is_current and price <= best.price):
+                new_bests[config_id] = BestPrice(device=device, config_id=config_id, sku_id=sku_id,
+                                                 source_id=source_id, price=price, observed_at=observed_at)
+            elif best.observed_at < cutoff or is_current:
+                # Лучшее устарело или подорожало: место займет самое дешевое свежее, не обязательно это
+                to_promote.add(config_id)
+
+        for config_id in to_promote:
+            new_bests[config_id] = self._next_best(device, config_id, cutoff)
+
+        return self._save(device, bests, new_bests)
+
+    def remove_sync(self, device: int, sku_ids: Iterable[int], source_id: Optional[int] = None) -> int:
+        """Удаляет предложения SKU (одного источника или всех) и продвигает следующие лучшие"""
+        from db_app.models import BestPrice, LatestPrice
+
+        sku_ids = list(sku_ids)
+        offers = LatestPrice.objects.filter(device=device, sku_id__in=sku_ids)
+        bests = BestPrice.objects.filter(device=device, sku_id__in=sku_ids)
+        if source_id is not None:
+            offers = offers.filter(source_id=source_id)
+            bests = bests.filter(source_id=source_id)
+        bests = {best.config_id: best for best in bests}
+        offers.delete()
+
+        cutoff = int(time.time()) - self.max_age
+        return self._save(device, bests, {config_id: self._next_best(device, config_id, cutoff) for config_id in bests})
+
+    def expire_stale_sync(self, now: Optional[int] = None) -> int:
+        """Заменяет лучшие предложения, не подтвержденные BEST_PRICE_MAX_AGE_DAYS дней, свежими"""
+        from db_app.models import BestPrice
+
+        cutoff = (now or int(time.time())) - self.max_age
+        changed = 0
+        stale = BestPrice.objects.filter(observed_at__lt=cutoff, stale=False)
+        for device in sorted(set(stale.values_list('device', flat=True))):
+            bests = {best.config_id: best for best in stale.filter(device=device)}
+            changed += self._save(device, bests, {
+                config_id: self._next_best(device, config_id, cutoff) for config_id in bests
+            })
+        return changed
+
+    @db_write
+    def expire_stale(self) -> Optional[int]:
+        """Заменяет устаревшие лучшие предложения (None - ошибка)"""
+        try:
+            changed = self.expire_stale_sync()
+            if changed:
+                from services.catalog_version import catalog_version
+                catalog_version.bump("устаревание лучших цен")
+            return changed
+
+        except Exception as e:
+            logger.error(f"Ошибка замены устаревших лучших цен: {e}")
+            return None
+
+    async def expire_periodically(self, interval: int = BEST_PRICE_EXPIRE_INTERVAL):
+        """Фоновая задача: проверяет устаревание лучших предложений каждые interval секунд"""
+        while True:
+            changed = await self.expire_stale()
+            if changed:
+                logger.info(f"⏳ Заменено устаревших лучших цен: {changed}")
+            await asyncio.sleep(interval)
+
+    def clear_sync(self, devices: Iterable[int]):
+        """Удаляет предложения и лучшие цены устройств (при очистке таблиц устройств)"""
+        from db_app.models import BestPrice, LatestPrice
+
+        devices = list(devices)
+        LatestPrice.objects.filter(device__in=devices).delete()
+        BestPrice.objects.filter(device__in=devices).delete()
+
+    @db_read
+    def get_best_prices(self, model_name: str) -> List[Dict[str, Any]]:
+        """Лучшие предложения всех конфигураций модели устройства"""
+        try:
+            from db_app.models import BestPrice, PriceConfig, PriceSource
+            from services.price_history import PRICE_HISTORY_DEVICES, decode_price
+
+            device = PRICE_HISTORY_DEVICES[model_name]
+            configs = dict(PriceConfig.objects.filter(device=device).values_list('pk', 'key'))
+            sources = dict(PriceSource.objects.values_list('pk', 'name'))
+            return [
+                {
+                    'config': configs.get(best.config_id, ''),
+                    'sku_id': best.sku_id,
+                    'source': sources.get(best.source_id, ''),
+                    'price': decode_price(best.price),
+                    'observed_at': best.observed_at,
+                    'stale': best.stale,
+                }
+                for best in BestPrice.objects.filter(device=device).order_by('config_id')
+            ]
+
+        except Exception as e:
+            logger.error(f"Ошибка получения лучших цен {model_name}: {e}")
+            return []
+
+    def _next_best(self, device: int, config_id: int, cutoff: int):
+        """Самое дешевое свежее предложение конфигурации (или самое дешевое старое) из LatestPrice"""
+        from db_app.models import BestPrice, LatestPrice
+
+        offers = LatestPrice.objects.filter(device=device, config_id=config_id).order_by('price', '-observed_at')
+        offer = offers.filter(observed_at__gte=cutoff).first()
+        stale = offer is None
+        if stale:
+            offer = offers.first()
+        if offer is None:
+            return None
+        return BestPrice(device=device, config_id=config_id, sku_id=offer.sku_id, source_id=offer.source_id,
+                         price=offer.price, observed_at=offer.observed_at, stale=stale)
+
+    def _save(self, device: int, bests: Dict[int, Any], new_bests: Dict[int, Any]) -> int:
+        """Записывает новые лучшие предложения, удаляет конфигурации без предложений"""
+        from db_app.models import BestPrice
+
+        changed = sum(
+            1 for config_id, best in new_bests.items()
+            if config_id not in bests or best is None
+            or (best.sku_id, best.source_id, best.price) != (
+                bests[config_id].sku_id, bests[config_id].source_id, bests[config_id].price)
+        )
+        removed = [config_id for config_id, best in new_bests.items() if best is None]
+        if removed:
+            BestPrice.objects.filter(device=device, config_id__in=removed).delete()
+        BestPrice.objects.bulk_create(
+            [best for best in new_bests.values() if best is not None],
+            batch_size=500, update_conflicts=True, unique_fields=['device', 'config_id'],
+            update_fields=['sku_id', 'source_id', 'price', 'observed_at', 'stale'],
+        )
+        return changed
+
+
+# Создаем глобальный экземпляр
+best_price_index = BestPriceIndex()
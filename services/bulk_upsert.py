@@ -0,0 +1,248 @@
+"""
+Пакетное сохранение цен устройств одной транзакцией
+"""
+import logging
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from services.db_gateway import db_write
+
+from services.best_price import config_key
+from services.catalog_version import catalog_version
+from services.dimensions import dimension_cache, value_key_fields
+from services.price_history import PRICE_HISTORY_DEVICES, price_history_service
+
+logger = logging.getLogger(__name__)
+
+# Строка для сохранения: (поля уникального ключа, остальные поля) - как в update_or_create
+UpsertRow = Tuple[Dict[str, Any], Dict[str, Any]]
+
+# Поля, изменение которых не считается изменением цены
+IGNORED_CHANGE_FIELDS = ('source',)
+
+
+class SourceRows(list):
+    """Строки для upsert вместе со строками прайса, из которых они получены (lines)"""
+
+    def __init__(self, rows: Iterable[UpsertRow] = (), lines: Iterable[str] = ()):
+        super().__init__(rows)
+        self.lines = list(lines)
+
+
+class BulkUpsertService:
+    """
+    Сохраняет строки прайса пачкой вместо update_or_create на каждую строку.
+
+    Для каждой модели выполняется один SELECT существующих записей и
+    bulk_create(update_conflicts=True) по ключу unique_together внутри
+    одной транзакции. Измерения ключа (цвет, страна, память...) заменяются
+    id из кэша services/dimensions.py без запросов к базе. Записи без
+    изменений не перезаписываются. Если указан источник, в той же транзакции
+    цены всех строк попадают в историю цен и индекс лучших цен.
+
+    Для строк из build_rows результат содержит и offers - предложения
+    {строка прайса: [(код устройства, pk)]}: по ним TemplateParser
+    подтверждает предложения строк, пропущенных как неизмененные.
+    """
+
+    @db_write
+    def upsert(self, model, rows: List[UpsertRow], source: Optional[str] = None) -> Dict[str, int]:
+        """Сохраняет строки модели, возвращает количество created/updated/unchanged"""
+        return self.upsert_sync(model, rows, source)
+
+    def upsert_sync(self, model, rows: List[UpsertRow], source: Optional[str] = None) -> Dict[str, int]:
+        """Синхронная версия upsert для вызова из кода без event loop"""
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        if not rows:
+            return counts
+
+        lines = getattr(rows, 'lines', None)
+        try:
+            # Ключ - по столбцам (generation_dim_id), чтобы сравнивать id без обращения к Dimension
+            key_fields = [model._meta.get_field(field).attname for field in model._meta.unique_together[0]]
+            rows = [self._normalize_row(model, lookup, defaults) for lookup, defaults in rows]
+            lookups = dimension_cache.with_ids_sync(model, [lookup for lookup, _ in rows])
+            rows = [(lookup, defaults) for lookup, (_, defaults) in zip(lookups, rows)]
+            update_fields = sorted({field for _, defaults in rows for field in defaults})
+
+            existing = self._load_existing(model, key_fields, update_fields, rows)
+
+            # Проходим строки по порядку, как последовательные update_or_create:
+            # повтор ключа в одном сообщении сравнивается с предыдущей строкой
+            current_values: Dict[tuple, Dict[str, Any]] = {
+                key: {field: getattr(obj, field) for field in update_fields}
+                for key, obj in existing.items()
+            }
+            pending: Dict[tuple, UpsertRow] = {}
+            seen_keys: Dict[tuple, Dict[str, Any]] = {}
+            for lookup, defaults in rows:
+                key = tuple(lookup[field] for field in key_fields)
+                seen_keys[key] = lookup
+                current = current_values.get(key)
+                if current is None:
+                    counts['created'] += 1
+                    pending[key] = (lookup, defaults)
+                    current_values[key] = dict(defaults)
+                    continue
+
+                changed = any(
+                    current.get(field) != value
+                    for field, value in defaults.items()
+                    if field not in IGNORED_CHANGE_FIELDS
+                )
+                if changed:
+                    counts['updated'] += 1
+                    pending[key] = (lookup, defaults)
+                else:
+                    counts['unchanged'] += 1
+                current.update(defaults)
+
+            best_changed = 0
+            with transaction.atomic():
+                written = self._write(model, key_fields, update_fields, pending, existing) if pending else {}
+                if source is not None:
+                    # Цена каждого SKU сообщения (при повторе ключа - последняя)
+                    pks = {key: obj.pk for key, obj in existing.items()}
+                    pks.update(written)
+                    prices = {pks[key]: current_values[key]['price'] for key in seen_keys}
+                    value_fields = value_key_fields(model)
+                    configs = {
+                        pks[key]: config_key(value_fields, tuple(lookup[field] for field in value_fields))
+                        for key, lookup in seen_keys.items()
+                    }
+                    best_changed = price_history_service.record_sync(model, source, prices, configs)['best']
+                    device = PRICE_HISTORY_DEVICES.get(model.__name__)
+                    if lines is not None and device is not None:
+                        counts['offers'] = self._line_offers(device, key_fields, rows, lines, pks)
+            # Каталог показывает лучшие цены: их смена тоже меняет каталог
+            if pending or best_changed:
+                catalog_version.bump(f"пакетное сохранение {model.__name__}")
+
+            logger.info(
+                f"{model.__name__}: пакетно сохранено {len(rows)} строк "
+                f"(новых: {counts['created']}, обновлено: {counts['updated']}, "
+                f"без изменений: {counts['unchanged']})"
+            )
+            return counts
+
+        except Exception as e:
+            logger.error(f"Ошибка пакетного сохранения {model.__name__}: {e}")
+            return {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': len(rows)}
+
+    def _line_offers(self, device: int, key_fields: List[str], rows: List[UpsertRow], lines: List[str],
+                     pks: Dict[tuple, int]) -> Dict[str, List[Tuple[int, int]]]:
+        """{строка прайса: [(код устройства, pk)]} для сохраненных строк"""
+        offers: Dict[str, List[Tuple[int, int]]] = {}
+        for (lookup, _), line in zip(rows, lines):
+            offer = (device, pks[tuple(lookup[field] for field in key_fields)])
+            line_offers = offers.setdefault(line.strip(), [])
+            if offer not in line_offers:
+                line_offers.append(offer)
+        return offers
+
+    def _normalize_row(self, model, lookup: Dict[str, Any], defaults: Dict[str, Any]) -> UpsertRow:
+        """Приводит значения к python-типам полей, чтобы сравнение с базой было корректным"""
+        def normalize(values: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                field: model._meta.get_field(field).to_python(value)
+                for field, value in values.items()
+            }
+        return normalize(lookup), normalize(defaults)
+
+    def _load_existing(self, model, key_fields: List[str], update_fields: List[str],
+                       rows: List[UpsertRow], **filters) -> Dict[tuple, Any]:
+        """Загружает существующие записи одним запросом по первому полю ключа (и filters)"""
+        first_field = key_fields[0]
+        values = {lookup[first_field] for lookup, _ in rows}
+
+        condition = Q(**{f'{first_field}__in': [value for value in values if value is not None]})
+        if None in values:
+            condition |= Q(**{f'{first_field}__isnull': True})
+
+        existing = {}
+        for obj in model.objects.filter(condition, **filters).only('pk', *key_fields, *update_fields):
+            existing[tuple(getattr(obj, field) for field in key_fields)] = obj
+        return existing
+
+    def _write(self, model, key_fields: List[str], update_fields: List[str],
+               pending: Dict[tuple, UpsertRow], existing: Dict[tuple, Any]) -> Dict[tuple, int]:
+        """Записывает новые и измененные строки (в транзакции upsert_sync), возвращает их pk по ключу"""
+        now = timezone.now()
+        write_fields = update_fields + ['updated_at']
+        to_upsert = {}
+        to_insert = {}
+        to_update = {}
+
+        for key, (lookup, defaults) in pending.items():
+            obj = model(**lookup, **defaults)
+            obj.updated_at = now
+            # NULL в уникальном ключе не дает конфликта в индексе: такие существующие
+            # записи обновляем по pk, а новые добавляем без ON CONFLICT
+            if any(value is None for value in key):
+                if key in existing:
+                    obj.pk = existing[key].pk
+                    to_update[key] = obj
+                else:
+                    to_insert[key] = obj
+            else:
+                to_upsert[key] = obj
+
+        if to_upsert:
+            model.objects.bulk_create(
+                list(to_upsert.values()),
+                update_conflicts=True,
+                unique_fields=key_fields,
+                update_fields=write_fields,
+            )
+        if to_insert:
+            model.objects.bulk_create(list(to_insert.values()))
+        # pk после bulk_create есть, только если база вернула строки (RETURNING, SQLite 3.35+):
+        # иначе читаем их по полному ключу среди строк, записанных сейчас (auto_now ставит
+        # updated_at не раньше now), - прежние дубли ключа с NULL под фильтр не попадают
+        created = {**to_upsert, **to_insert}
+        missing = [key for key, obj in created.items() if obj.pk is None]
+        if missing:
+            written = self._load_existing(model, key_fields, [], [pending[key] for key in missing],
+                                          updated_at__gte=now)
+            for key in missing:
+                created[key].pk = written[key].pk
+        if to_update:
+            model.objects.bulk_update(list(to_update.values()), write_fields)
+        return {key: obj.pk for key, obj in {**created, **to_update}.items()}
+
+    def save_result(self, parsed_count: int, counts: Dict[str, int]) -> Dict[str, Any]:
+        """Формирует результат сохранения в формате отчета TemplateParser"""
+        saved_count = counts['created'] + counts['updated'] + counts['unchanged']
+        return {
+            'parsed_count': parsed_count,
+            'template_saved': saved_count,
+            'total_saved': saved_count,
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'unchanged': counts['unchanged'],
+            'failed': counts.get('failed', 0),
+            'offers': counts.get('offers', {})
+        }
+
+
+def source_line(item: Any) -> str:
+    """Строка прайса, из которой распарсен объект"""
+    if isinstance(item, dict):
+        return item.get('source_line', '')
+    return getattr(item, 'source_line', '')
+
+
+def build_rows(items: Iterable[Any], builder) -> SourceRows:
+    """Строит строки для upsert, пропуская объекты без обязательных данных"""
+    rows = SourceRows()
+    for item in items:
+        row = builder(item)
+        if row:
+            rows.append(row)
+            rows.lines.append(source_line(item))
+    return rows
+
+
+# Создаем глобальный экземпляр
+bulk_upsert_service = BulkUpsertService()
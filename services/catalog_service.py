@@ -1,27 +1,68 @@
 """
 Простой сервис каталога
 """
+import asyncio
 import logging
-import os
-import django
-from django.conf import settings
-from asgiref.sync import sync_to_async
+from db_app.django_setup import setup_django
+from services.db_gateway import db_read
 
 # Настройка Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import IPhone, Product, Markup, MacBook, iPad, AppleWatch, iMac, AirPods, ApplePencil
 from services.macbook_service_simple import macbook_service_simple
+from services.catalog_version import catalog_version
+from services.price_history import PRICE_HISTORY_DEVICES, decode_price
+from services.dimensions import rank_order
 
 logger = logging.getLogger(__name__)
 
 class CatalogService:
     """Простой сервис для каталога"""
     
-    @sync_to_async
-    def get_catalog_data(self):
-        """Получает данные каталога"""
+    def __init__(self):
+        # Снимок каталога и версия данных, по которой он построен
+        self._snapshot = None
+        self._snapshot_version = None
+        self._rebuild_lock = asyncio.Lock()
+    
+    async def get_catalog_data(self):
+        """
+        Получает данные каталога.
+        
+        Снимок перестраивается только после изменения таблиц устройств
+        (см. services/catalog_version.py), иначе возвращается после одного
+        запроса версии - она общая для всех процессов, поэтому цены,
+        сохраненные userbot, тоже попадают в каталог. Снимок общий для всех
+        вызовов - не изменяйте его.
+        """
+        version = await catalog_version.current()
+        if self._snapshot is not None and version is not None and self._snapshot_version == version:
+            return self._snapshot
+        
+        # Одновременные запросы ждут одну перестройку, а не запускают свою
+        async with self._rebuild_lock:
+            version = await catalog_version.current()
+            if self._snapshot is not None and version is not None and self._snapshot_version == version:
+                return self._snapshot
+            
+            catalog = await self._build_catalog_data()
+            if catalog is not None:
+                self._snapshot = catalog
+                # Версия запомнена до чтения: изменение во время перестройки
+                # приведет к еще одной перестройке при следующем запросе
+                self._snapshot_version = version
+                logger.info(f"Снимок каталога перестроен (версия {version})")
+            return catalog if catalog is not None else {}
+    
+    def invalidate(self):
+        """Сбрасывает снимок каталога"""
+        self._snapshot = None
+        self._snapshot_version = None
+    
+    @db_read
+    def _build_catalog_data(self):
+        """Строит данные каталога по всем таблицам устройств"""
         try:
             catalog = {}
             
@@ -83,13 +124,25 @@ class CatalogService:
             return catalog
         except Exception as e:
             logger.error(f"Ошибка получения каталога: {e}")
-            return {}
+            return None
+    
+    def _offer_prices(self, device):
+        """
+        Цена и цена с наценкой товара каталога.
+
+        Устройства в каталоге - лучшие предложения конфигураций (with_best_offer):
+        цена берется из индекса лучших цен, а не последняя сохраненная в строке.
+        """
+        if device.best_price is None:
+            return {'price': int(device.price), 'display_price': device.display_price}
+        price = decode_price(device.best_price)
+        return {'price': int(price), 'display_price': int(price + device.markup_price - device.price)}
     
     def _get_iphone_catalog(self):
         """Получает каталог iPhone как список"""
         try:
             # Получаем все iPhone
-            iphones = IPhone.objects.all().order_by('generation', 'variant', 'storage', 'color', 'country')
+            iphones = IPhone.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['IPhone']).order_by(*rank_order(IPhone, 'generation', 'variant', 'storage', 'color', 'country'))
             
             iphone_list = []
             for iphone in iphones:
@@ -110,8 +163,7 @@ class CatalogService:
                     'id': iphone.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(iphone.price),
-                    'display_price': iphone.display_price,
+                    **self._offer_prices(iphone),
                     'country': iphone.country
                 })
             
@@ -124,7 +176,7 @@ class CatalogService:
         """Получает каталог MacBook"""
         try:
             # Получаем все MacBook из собственной модели
-            macbooks = MacBook.objects.all().order_by('generation', 'variant', 'size', 'memory', 'storage', 'color', 'country')
+            macbooks = MacBook.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['MacBook']).order_by(*rank_order(MacBook, 'generation', 'variant', 'size', 'memory', 'storage', 'color', 'country'))
             
             macbook_list = []
             
@@ -152,8 +204,7 @@ class CatalogService:
                     'id': macbook.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(macbook.price),
-                    'display_price': macbook.display_price,
+                    **self._offer_prices(macbook),
                     'country': macbook.country,
                     'product_code': macbook.product_code or '',
                     'generation': macbook.generation or '',
@@ -173,7 +224,7 @@ class CatalogService:
         """Получает каталог iPad как список"""
         try:
             # Получаем все iPad
-            ipads = iPad.objects.all().order_by('generation', 'variant', 'size', 'storage', 'color', 'country')
+            ipads = iPad.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['iPad']).order_by(*rank_order(iPad, 'generation', 'variant', 'size', 'storage', 'color', 'country'))
             
             ipad_list = []
             for ipad in ipads:
@@ -200,8 +251,7 @@ class CatalogService:
                     'id': ipad.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(ipad.price),
-                    'display_price': ipad.display_price,
+                    **self._offer_prices(ipad),
                     'country': ipad.country,
                     'product_code': ipad.product_code or '',
                     'generation': ipad.generation or '',
@@ -223,7 +273,7 @@ class CatalogService:
             catalog = {}
             
             # Группируем по брендам и категориям, исключая iPhone и MacBook
-            products = Product.objects.exclude(brand='Apple', category__in=['iPhone', 'MacBook']).order_by('brand', 'category', 'name')
+            products = Product.objects.with_display_price().exclude(brand='Apple', category__in=['iPhone', 'MacBook']).order_by('brand', 'category', 'name')
             
             for product in products:
                 brand = product.brand
@@ -253,7 +303,7 @@ class CatalogService:
         """Получает каталог Apple Watch как список"""
         try:
             # Получаем все Apple Watch
-            apple_watches = AppleWatch.objects.all().order_by('series', 'size', 'case_color', 'band_type')
+            apple_watches = AppleWatch.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['AppleWatch']).order_by(*rank_order(AppleWatch, 'series', 'size', 'case_color', 'band_type'))
             
             apple_watch_list = []
             for watch in apple_watches:
@@ -285,8 +335,7 @@ class CatalogService:
                     'id': watch.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(watch.price),
-                    'display_price': watch.display_price,
+                    **self._offer_prices(watch),
                     'country': watch.country,
                     'product_code': watch.product_code or '',
                     'series': watch.series or '',
@@ -306,7 +355,7 @@ class CatalogService:
     def _get_imac_catalog(self):
         """Получает каталог iMac"""
         try:
-            imacs = iMac.objects.all().order_by('model', 'chip', 'size')
+            imacs = iMac.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['iMac']).order_by(*rank_order(iMac, 'model', 'chip', 'size'))
             
             imac_list = []
             for imac in imacs:
@@ -332,8 +381,7 @@ class CatalogService:
                     'id': imac.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(imac.price),
-                    'display_price': imac.display_price,
+                    **self._offer_prices(imac),
                     'country': imac.country,
                     'product_code': imac.product_code or '',
                     'model': imac.model or '',
@@ -352,7 +400,7 @@ class CatalogService:
     def _get_airpods_catalog(self):
         """Получает каталог AirPods"""
         try:
-            airpods = AirPods.objects.all().order_by('model', 'generation', 'features')
+            airpods = AirPods.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['AirPods']).order_by(*rank_order(AirPods, 'model', 'generation', 'features'))
             
             airpods_list = []
             for ap in airpods:
@@ -376,8 +424,7 @@ class CatalogService:
                     'id': ap.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(ap.price),
-                    'display_price': ap.display_price,
+                    **self._offer_prices(ap),
                     'country': ap.country,
                     'product_code': ap.product_code or '',
                     'model': ap.model or '',
@@ -395,7 +442,7 @@ class CatalogService:
     def _get_apple_pencil_catalog(self):
         """Получает каталог Apple Pencil"""
         try:
-            pencils = ApplePencil.objects.all().order_by('generation', 'connector')
+            pencils = ApplePencil.objects.with_display_price().with_best_offer(PRICE_HISTORY_DEVICES['ApplePencil']).order_by(*rank_order(ApplePencil, 'generation', 'connector'))
             
             pencil_list = []
             for pencil in pencils:
@@ -415,8 +462,7 @@ class CatalogService:
                     'id': pencil.id,
                     'name': " ".join(name_parts),
                     'configuration': configuration,
-                    'price': int(pencil.price),
-                    'display_price': pencil.display_price,
+                    **self._offer_prices(pencil),
                     'country': pencil.country,
                     'product_code': pencil.product_code or '',
                     'model': pencil.model or '',
@@ -429,10 +475,12 @@ class CatalogService:
             logger.error(f"Ошибка получения каталога Apple Pencil: {e}")
             return {}
     
-    @sync_to_async
+    @db_read
     def get_current_markup(self):
         """Получает текущую наценку"""
         try:
+            # Наценку мог сменить другой процесс: проверка версии сбросит кэш
+            catalog_version.current_sync()
             return Markup.get_current_markup()
         except Exception as e:
             logger.error(f"Ошибка получения наценки: {e}")
@@ -0,0 +1,107 @@
+"""
+Счетчик версии данных каталога для инвалидации снимка CatalogService
+"""
+import logging
+import threading
+from functools import partial
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+
+from services.db_gateway import db_read
+
+logger = logging.getLogger(__name__)
+
+# Имя строки DataVersion с версией каталога (создается миграцией 0010)
+CATALOG_VERSION_NAME = 'catalog'
+
+# Модели, от которых зависит каталог (наценка входит в display_price)
+CATALOG_MODELS = {
+    'IPhone', 'MacBook', 'iPad', 'AppleWatch', 'iMac',
+    'AirPods', 'ApplePencil', 'Product', 'Markup'
+}
+
+
+class CatalogVersion:
+    """
+    Версия данных каталога, общая для процессов бота и userbot.
+
+    Хранится в строке DataVersion и увеличивается в транзакции изменения
+    таблиц устройств: пакетного сохранения, построчного save (через сигнал
+    post_save), очистки и смены наценки. CatalogService перед выдачей снимка
+    читает версию из базы (current) и перестраивает снимок, только если она
+    изменилась - в том числе после записи из другого процесса.
+    """
+
+    def __init__(self):
+        # Последняя версия, известная процессу
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self, reason: str = ""):
+        """
+        Отмечает изменение данных каталога
+
+        Версия в базе увеличивается в текущей транзакции, поэтому процесс,
+        прочитавший новую версию, видит и новые данные. Известная процессу
+        версия меняется после фиксации: иначе снимок, перестроенный до
+        фиксации, запомнил бы новую версию со старыми данными.
+        """
+        from db_app.models import DataVersion
+
+        versions = DataVersion.objects.filter(name=CATALOG_VERSION_NAME)
+        if not versions.update(value=F('value') + 1):
+            DataVersion.objects.get_or_create(name=CATALOG_VERSION_NAME)
+            versions.update(value=F('value') + 1)
+        value = versions.values_list('value', flat=True).first()
+        transaction.on_commit(partial(self._committed, value, reason))
+
+    def current_sync(self) -> int:
+        """Версия из базы; если ее изменил другой процесс, кэш наценки процесса сбрасывается"""
+        from db_app.models import DataVersion, Markup
+
+        value = DataVersion.objects.filter(name=CATALOG_VERSION_NAME).values_list('value', flat=True).first() or 0
+        with self._lock:
+            if value != self._value:
+                self._value = value
+                Markup.invalidate_cache()
+        return value
+
+    @db_read
+    def current(self) -> Optional[int]:
+        """Версия из базы для проверки снимка каталога (None - прочитать не удалось)"""
+        try:
+            return self.current_sync()
+        except Exception as e:
+            logger.error(f"Ошибка чтения версии каталога: {e}")
+            return None
+
+    def _committed(self, value: int, reason: str) -> int:
+        from db_app.models import Markup
+
+        with self._lock:
+            self._value = value
+            # Между нашими изменениями мог записать другой процесс (в том числе наценку)
+            Markup.invalidate_cache()
+        logger.debug(f"Версия каталога {value}: {reason}")
+        return value
+
+
+def _on_catalog_model_saved(sender, **kwargs):
+    """Построчные сохранения (update_or_create, save) тоже меняют каталог"""
+    if sender._meta.app_label == 'db_app' and sender.__name__ in CATALOG_MODELS:
+        catalog_version.bump(f"сохранение {sender.__name__}")
+
+
+# Создаем глобальный экземпляр
+catalog_version = CatalogVersion()
+
+# bulk_create и удаление QuerySet сигналы post_save не вызывают,
+# для них версия увеличивается явно в bulk_upsert и методах очистки
+post_save.connect(_on_catalog_model_saved, dispatch_uid='catalog_version_post_save')
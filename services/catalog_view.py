@@ -0,0 +1,263 @@
+"""
+Представление каталога для бота: индексы для переходов по меню и состояние по чатам
+"""
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.catalog_service import catalog_service
+
+logger = logging.getLogger(__name__)
+
+# Порядок кнопок поколений iPhone и вариантов MacBook
+IPHONE_GENERATION_ORDER = ['17', '16E', '16', '15', '14', '13']
+MACBOOK_VARIANT_ORDER = ['Air', 'Pro', 'iMac']
+
+GB_RE = re.compile(r'(\d+GB)')
+CHIP_RE = re.compile(r'(M\d+)')
+NUMBER_RE = re.compile(r'(\d+)')
+
+# Сколько последних чатов помнят открытый каталог (остальные при переходе откроют актуальный)
+CATALOG_VIEW_CHATS = int(os.getenv("CATALOG_VIEW_CHATS", "1000"))
+
+# Группа товаров: (ключ группы, товары или вложенные группы)
+Group = Tuple[str, Any]
+
+
+def _number_key(value: str) -> int:
+    """Ключ сортировки по первому числу в строке (128GB, 13 M2)"""
+    match = NUMBER_RE.search(value)
+    return int(match.group(1)) if match else 0
+
+
+def _group(items: List[Dict[str, Any]], key_func) -> Dict[str, List[Dict[str, Any]]]:
+    """Группирует товары по ключу с сохранением порядка первого появления"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault(key_func(item), []).append(item)
+    return groups
+
+
+def iphone_generation(name: str) -> str:
+    """Поколение iPhone для меню по названию товара"""
+    if 'iPhone 17' in name:
+        return '17'
+    if 'iPhone 16E' in name or name.endswith('16Е'):
+        return '16E'
+    if 'iPhone 16' in name:
+        return '16'
+    for generation in ('15', '14', '13'):
+        if f'iPhone {generation}' in name:
+            return generation
+    return 'Другие'
+
+
+def iphone_variant(name: str, generation: str) -> str:
+    """Вариант iPhone (обычный, Pro, Plus, Pro Max) по названию товара"""
+    if 'Pro Max' in name:
+        return 'Pro Max'
+    if 'Pro' in name:
+        return 'Pro'
+    if 'Plus' in name:
+        return 'Plus'
+    if generation == '16E':
+        return 'E'
+    return 'обычный'
+
+
+def ipad_category(ipad: Dict[str, Any]) -> str:
+    """Категория iPad для меню: Mini, Air, Pro или обычный iPad"""
+    variant = ipad.get('variant', '')
+    if variant in ('Mini', 'Air', 'Pro'):
+        return variant
+    return 'iPad'
+
+
+class CatalogView:
+    """
+    Индексы одного снимка каталога для переходов по меню бота.
+
+    Строятся один раз на снимок CatalogService, после чего каждый
+    обработчик callback получает готовую группу товаров по ключу
+    вместо перебора всего списка устройств.
+    """
+
+    def __init__(self, catalog_data: Dict[str, Any]):
+        self.catalog_data = catalog_data
+        apple = catalog_data.get('Apple', {})
+
+        # поколение -> вариант -> память -> iPhone
+        self.iphone: Dict[str, List[Group]] = self._index_iphone(apple.get('iPhone', []))
+        # вариант -> размер и чип -> память -> диск -> MacBook
+        self.macbook: Dict[str, List[Group]] = self._index_macbook(apple.get('MacBook', []))
+        # категория -> группа (размер/поколение) -> объем -> iPad
+        self.ipad: Dict[str, List[Group]] = self._index_ipad(apple.get('iPad', []))
+        # серия -> размер -> Apple Watch
+        self.apple_watch: Dict[str, List[Group]] = self._index_apple_watch(apple.get('Apple Watch', []))
+
+    def iphone_generations(self) -> List[str]:
+        """Поколения iPhone в порядке кнопок меню"""
+        generations = [generation for generation in IPHONE_GENERATION_ORDER if generation in self.iphone]
+        if 'Другие' in self.iphone:
+            generations.append('Другие')
+        return generations
+
+    def macbook_variants(self) -> List[str]:
+        """Варианты MacBook в порядке кнопок меню"""
+        return [variant for variant in MACBOOK_VARIANT_ORDER if variant in self.macbook]
+
+    def _index_iphone(self, iphone_list: List[Dict[str, Any]]) -> Dict[str, List[Group]]:
+        index = {}
+        for generation, phones in _group(iphone_list, lambda phone: iphone_generation(phone['name'])).items():
+            variants = []
+            by_variant = _group(phones, lambda phone: iphone_variant(phone['name'], generation))
+            for variant, variant_phones in by_variant.items():
+                memory_groups = _group(
+                    variant_phones,
+                    lambda phone: self._iphone_memory(phone, generation, variant)
+                )
+                variants.append((variant, [
+                    (memory, sorted(memory_phones, key=lambda x: x['country']))
+                    for memory, memory_phones in memory_groups.items()
+                ]))
+            index[generation] = variants
+        return index
+
+    def _iphone_memory(self, phone: Dict[str, Any], generation: str, variant: str) -> str:
+        """Объем памяти iPhone для группировки (только GB, без цвета)"""
+        config = phone.get('configuration', '')
+        if not config:
+            # Если конфигурация в названии
+            config = phone['name'].replace(f'iPhone {generation}', '').replace('iPhone', '').strip()
+            if variant != 'обычный' and variant in config:
+                config = config.replace(variant, '').strip()
+
+        memory_match = GB_RE.search(config)
+        return memory_match.group(1) if memory_match else config
+
+    def _index_macbook(self, macbook_list: List[Dict[str, Any]]) -> Dict[str, List[Group]]:
+        index = {}
+        for variant, products in _group(macbook_list, lambda macbook: macbook.get('variant', 'Air')).items():
+            size_chip_groups = _group(products, self._macbook_size_chip)
+            groups = []
+            for group_key, group_products in sorted(size_chip_groups.items(), key=self._macbook_group_sort_key):
+                memory_groups = _group(group_products, self._macbook_memory)
+                memory_index = []
+                for memory, memory_products in sorted(memory_groups.items(), key=lambda item: _number_key(item[0])):
+                    storage_groups = _group(memory_products, self._macbook_storage)
+                    memory_index.append((memory, [
+                        (storage, sorted(storage_products, key=lambda x: x['country'] or ''))
+                        for storage, storage_products in sorted(storage_groups.items(), key=lambda item: _number_key(item[0]))
+                    ]))
+                groups.append((group_key, memory_index))
+            index[variant] = groups
+        return index
+
+    def _macbook_size_chip(self, product: Dict[str, Any]) -> str:
+        """Группа MacBook: размер экрана и чип (13 M1, 15 M4)"""
+        generation = product.get('generation', '')
+        size = product.get('size', '')
+        chip_match = CHIP_RE.search(generation)
+        chip = chip_match.group(1) if chip_match else generation
+        return f"{size} {chip}" if size else chip
+
+    def _macbook_group_sort_key(self, item: Group) -> Tuple[int, int]:
+        key = item[0]
+        chip_match = CHIP_RE.search(key)
+        chip_num = int(chip_match.group(1)[1:]) if chip_match else 0
+        return (_number_key(key), chip_num)
+
+    def _macbook_memory(self, product: Dict[str, Any]) -> str:
+        memory = product.get('memory', '')
+        if not memory:
+            # Если память не указана, извлекаем из конфигурации
+            memory_match = GB_RE.search(product.get('configuration', ''))
+            memory = memory_match.group(1) if memory_match else '8GB'
+        return memory
+
+    def _macbook_storage(self, product: Dict[str, Any]) -> str:
+        storage = product.get('storage', '')
+        if not storage:
+            # Если размер диска не указан, извлекаем из конфигурации
+            storage_match = GB_RE.search(product.get('configuration', ''))
+            storage = storage_match.group(1) if storage_match else '256GB'
+        return storage
+
+    def _index_ipad(self, ipad_list: List[Dict[str, Any]]) -> Dict[str, List[Group]]:
+        index = {}
+        for category, products in _group(ipad_list, ipad_category).items():
+            groups = []
+            for group_key, group_products in sorted(_group(products, self._ipad_group).items(), key=lambda x: x[0]):
+                storage_groups = _group(group_products, lambda product: product.get('storage', '') or '128GB')
+                groups.append((group_key, [
+                    (storage, sorted(storage_products, key=lambda x: x['country'] or ''))
+                    for storage, storage_products in sorted(storage_groups.items(), key=lambda item: _number_key(item[0]))
+                ]))
+            index[category] = groups
+        return index
+
+    def _ipad_group(self, product: Dict[str, Any]) -> str:
+        """Группа iPad: вариант и размер либо номер поколения"""
+        size = product.get('size', '')
+        generation = product.get('generation', '')
+        variant = product.get('variant', '')
+
+        if variant in ('Mini', 'Air', 'Pro'):
+            return f"iPad {variant} {size}"
+        if generation and generation.isdigit():
+            return f"iPad {generation}"
+        return f"iPad {size}" if size else "iPad"
+
+    def _index_apple_watch(self, apple_watch_list: List[Dict[str, Any]]) -> Dict[str, List[Group]]:
+        index = {}
+        watches = [watch for watch in apple_watch_list if watch.get('series', '')]
+        for series, products in _group(watches, lambda watch: watch['series']).items():
+            index[series] = [
+                (size, sorted(size_products, key=lambda x: x.get('case_color', '')))
+                for size, size_products in sorted(_group(products, lambda watch: watch.get('size', '')).items())
+            ]
+        return index
+
+
+class CatalogViewStore:
+    """
+    Каталог, открытый в каждом чате.
+
+    Чат работает со снимком, который был актуален при нажатии «Каталог»,
+    поэтому обновление каталога одним менеджером не подменяет данные у
+    остальных посреди навигации. Индексы строятся один раз на снимок и
+    общие для всех чатов. Хранятся только max_chats последних чатов:
+    давно открытый каталог вытесняется, и чат при следующем переходе
+    получает актуальный, как после перезапуска бота.
+    """
+
+    def __init__(self, max_chats: int = CATALOG_VIEW_CHATS):
+        self.max_chats = max_chats
+        self._views: "OrderedDict[int, CatalogView]" = OrderedDict()
+        self._current_view: Optional[CatalogView] = None
+
+    async def open(self, chat_id: int) -> CatalogView:
+        """Открывает в чате актуальный каталог"""
+        catalog_data = await catalog_service.get_catalog_data()
+        if self._current_view is None or self._current_view.catalog_data is not catalog_data:
+            self._current_view = CatalogView(catalog_data)
+            logger.info("Построены индексы каталога для меню")
+        self._views[chat_id] = self._current_view
+        self._views.move_to_end(chat_id)
+        while len(self._views) > self.max_chats:
+            self._views.popitem(last=False)
+        return self._current_view
+
+    async def get(self, chat_id: int) -> CatalogView:
+        """Каталог, открытый в чате (после перезапуска бота или вытеснения открывается актуальный)"""
+        view = self._views.get(chat_id)
+        if view is None:
+            return await self.open(chat_id)
+        self._views.move_to_end(chat_id)
+        return view
+
+
+# Создаем глобальный экземпляр
+catalog_views = CatalogViewStore()
@@ -0,0 +1,275 @@
+"""
+Асинхронный шлюз к базе данных: пул потоков чтения и один поток записи пачками
+"""
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial, wraps
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from django.db import OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Потоков чтения (у каждого свое соединение) и сколько записей из очереди
+# поток записи выполняет одной транзакцией
+DB_READ_THREADS = int(os.getenv("DB_READ_THREADS", "4"))
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "16"))
+# Сколько миллисекунд поток записи ждет следующие записи, прежде чем зафиксировать пачку
+DB_WRITE_WINDOW_MS = float(os.getenv("DB_WRITE_WINDOW_MS", "2"))
+# Повторы пачки, если база занята другим процессом, и начальная пауза (удваивается)
+DB_BUSY_RETRIES = int(os.getenv("DB_BUSY_RETRIES", "5"))
+DB_BUSY_BACKOFF_MS = float(os.getenv("DB_BUSY_BACKOFF_MS", "50"))
+
+
+def is_busy_error(error: Optional[Exception]) -> bool:
+    """Ошибка SQLite "database is locked"/"busy": запись можно повторить"""
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+@dataclass
+class DbJob:
+    """Синхронная функция с ORM, ожидающая выполнения в очереди"""
+    func: Callable[[], Any]
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    queued_at: float
+
+
+class DatabaseLane:
+    """
+    Очередь запросов к базе и обслуживающие ее потоки.
+
+    Потоки запускаются при первом запросе и держат собственные соединения
+    Django до close(). При batch_size > 1 поток забирает из очереди до
+    batch_size функций: накопившиеся сразу, а пока пачка меньше предыдущей -
+    ждет следующие до window_ms (одиночные записи не задерживаются, а при
+    N одновременных производителях пачка не ждет N+1-ю запись), и выполняет их
+    одной транзакцией, каждую в своей точке сохранения: ошибка
+    одной функции откатывает только ее. Если база занята другим процессом,
+    пачка повторяется до busy_retries раз с растущей паузой.
+    """
+
+    def __init__(self, name: str, threads: int, batch_size: int = 1, window_ms: float = 0.0,
+                 busy_retries: int = DB_BUSY_RETRIES, busy_backoff_ms: float = DB_BUSY_BACKOFF_MS):
+        self.name = name
+        self.threads = threads
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff_ms / 1000
+        self._queue: "queue.Queue[Optional[DbJob]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._last_batch = 0
+        self._stats = {'done': 0, 'failed': 0, 'batches': 0, 'retries': 0, 'max_depth': 0,
+                       'wait_ms': 0.0, 'run_ms': 0.0}
+
+    @property
+    def depth(self) -> int:
+        """Сколько функций ждет в очереди"""
+        return self._queue.qsize()
+
+    def submit(self, func: Callable[[], Any]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._start()
+        self._queue.put(DbJob(func, future, loop, time.perf_counter()))
+        with self._lock:
+            self._stats['max_depth'] = max(self._stats['max_depth'], self.depth)
+        return future
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        jobs = stats['done'] + stats['failed']
+        return {
+            'threads': self.threads,
+            'depth': self.depth,
+            'max_depth': stats['max_depth'],
+            'done': stats['done'],
+            'failed': stats['failed'],
+            'batches': stats['batches'],
+            'retries': stats['retries'],
+            'avg_wait_ms': stats['wait_ms'] / jobs if jobs else 0.0,
+            'avg_run_ms': stats['run_ms'] / jobs if jobs else 0.0,
+        }
+
+    def close(self):
+        """Дожидается очереди, закрывает соединения потоков и останавливает их"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    def _start(self):
+        with self._lock:
+            if self._workers:
+                return
+            for index in range(self.threads):
+                worker = threading.Thread(target=self._work, name=f'db-{self.name}-{index}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        try:
+            while True:
+                jobs = self._take_jobs()
+                if not jobs:
+                    break
+                self._run_jobs(jobs)
+        finally:
+            connections.close_all()
+
+    def _take_jobs(self) -> List[DbJob]:
+        """Ждет функцию и добирает следующие до batch_size (пустой список - остановка)"""
+        job = self._queue.get()
+        if job is None:
+            return []
+        jobs = [job]
+        deadline = time.perf_counter() + self.window
+        while len(jobs) < self.batch_size:
+            remaining = deadline - time.perf_counter() if len(jobs) < self._last_batch else 0.0
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Остановка после выполнения уже взятых функций
+                self._queue.put(None)
+                break
+            jobs.append(job)
+        self._last_batch = len(jobs)
+        return jobs
+
+    def _run_jobs(self, jobs: List[DbJob]):
+        started = time.perf_counter()
+        results = self._execute(jobs)
+        retries = 0
+        for attempt in range(self.busy_retries):
+            busy = [index for index, (_, error) in enumerate(results) if is_busy_error(error)]
+            if not busy:
+                break
+            # Случайная добавка к паузе, чтобы процессы не повторяли запись одновременно
+            delay = self.busy_backoff * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"База занята, повтор {len(busy)} записей через {delay * 1000:.0f} мс")
+            time.sleep(delay)
+            retries += len(busy)
+            for index, result in zip(busy, self._execute([jobs[index] for index in busy])):
+                results[index] = result
+        finished = time.perf_counter()
+
+        failed = sum(1 for _, error in results if error is not None)
+        with self._lock:
+            self._stats['done'] += len(jobs) - failed
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['retries'] += retries
+            self._stats['wait_ms'] += sum((started - job.queued_at) * 1000 for job in jobs)
+            self._stats['run_ms'] += (finished - started) * 1000
+
+        for job, (result, error) in zip(jobs, results):
+            try:
+                job.loop.call_soon_threadsafe(_resolve, job.future, result, error)
+            except RuntimeError:
+                # Event loop вызывающего уже закрыт - результат никто не ждет
+                pass
+
+    def _execute(self, jobs: List[DbJob]) -> List[Tuple[Any, Optional[Exception]]]:
+        """Выполняет функции; в очереди с пачками - одной транзакцией с точкой сохранения на каждую"""
+        if self.batch_size == 1:
+            return [self._call(job) for job in jobs]
+        try:
+            with transaction.atomic():
+                results = []
+                for job in jobs:
+                    with transaction.atomic():
+                        result = self._call(job)
+                        if result[1] is not None:
+                            transaction.set_rollback(True)
+                    results.append(result)
+            return results
+        except Exception as e:
+            if not is_busy_error(e):
+                logger.error(f"Ошибка фиксации пачки из {len(jobs)} записей: {e}")
+            return [(None, e) for _ in jobs]
+
+    def _call(self, job: DbJob) -> Tuple[Any, Optional[Exception]]:
+        try:
+            return job.func(), None
+        except Exception as e:
+            return None, e
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[Exception]):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class DatabaseGateway:
+    """
+    Асинхронный доступ к ORM с раздельными очередями чтения и записи.
+
+    Раньше вся работа с базой шла через sync_to_async с thread_sensitive=True,
+    то есть через один общий поток: долгая перестройка каталога задерживала
+    каждое сохранение. Теперь чтения выполняются пулом из DB_READ_THREADS
+    потоков, а записи - одним потоком, который объединяет записи, пришедшие
+    за DB_WRITE_WINDOW_MS, в одну транзакцию (SQLite все равно пишет в один
+    поток, а коммит пачки стоит как коммит одной записи). Глубина очередей,
+    время ожидания и число повторов доступны в metrics().
+    """
+
+    def __init__(self, read_threads: int = DB_READ_THREADS, write_batch: int = DB_WRITE_BATCH,
+                 write_window_ms: float = DB_WRITE_WINDOW_MS):
+        self.reads = DatabaseLane('read', read_threads)
+        self.writes = DatabaseLane('write', 1, batch_size=write_batch, window_ms=write_window_ms)
+
+    async def read(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет синхронную функцию чтения в пуле чтения"""
+        return await self.reads.submit(partial(func, *args, **kwargs))
+
+    async def write(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет синхронную функцию записи в потоке записи"""
+        return await self.writes.submit(partial(func, *args, **kwargs))
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {'read': self.reads.metrics(), 'write': self.writes.metrics()}
+
+    def close(self):
+        """Останавливает потоки и закрывает их соединения (при выключении и в тестах при смене базы)"""
+        self.writes.close()
+        self.reads.close()
+
+
+def db_read(func: Callable) -> Callable:
+    """Декоратор синхронного метода с ORM: вызов выполняется в пуле чтения шлюза"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db_gateway.read(func, *args, **kwargs)
+    return wrapper
+
+
+def db_write(func: Callable) -> Callable:
+    """Декоратор синхронного метода с ORM: вызов выполняется в потоке записи шлюза"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db_gateway.write(func, *args, **kwargs)
+    return wrapper
+
+
+# Создаем глобальный экземпляр
+db_gateway = DatabaseGateway()
@@ -0,0 +1,131 @@
+"""
+Реестр парсеров и сервисов устройств с загрузкой при первом обращении
+"""
+import importlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator
+
+from db_app.django_setup import setup_django
+
+logger = logging.getLogger(__name__)
+
+# Устройства TemplateParser. Парсер и сервис задаются путем "модуль:атрибут"
+# (атрибут - готовый экземпляр или класс, который создается без аргументов)
+DEVICE_HANDLERS: Dict[str, Dict[str, Any]] = {
+    'iphone': {
+        'parser': 'parsers.iphone_parser:iphone_parser',
+        'service': 'services.iphone_service_simple:iphone_service_simple',
+        'keywords': ['iphone', '16e', '16', '15', '14', '13', 'pro', 'plus', 'max'],
+        'priority': 1
+    },
+    'macbook': {
+        'parser': 'parsers.macbook_parser:macbook_parser',
+        'service': 'services.macbook_service_simple:macbook_service_simple',
+        'keywords': ['macbook', 'air', 'pro', 'm1 ', 'm2 ', 'm3 ', 'm4 '],
+        'priority': 2,
+        # Модель и чип берутся из заголовков секций, поэтому блок парсится целиком
+        'context': True
+    },
+    'ipad': {
+        'parser': 'parsers.ipad_parser:iPadParser',
+        'service': 'services.ipad_service_simple:ipad_service_simple',
+        'keywords': ['ipad', 'mini', 'air', 'pro', 'wifi', 'lte', 'wi-fi'],
+        'priority': 3
+    },
+    'apple_watch': {
+        'parser': 'parsers.apple_watch_parser:AppleWatchParser',
+        'service': 'services.apple_watch_service:AppleWatchService',
+        'keywords': ['apple watch', 'aw ', 'watch', 'se', 'ultra', 'series', 's10'],
+        'priority': 4
+    },
+    'imac': {
+        'parser': 'parsers.imac_parser:iMacParser',
+        'service': 'services.imac_service:iMacService',
+        'keywords': ['imac', 'mac mini', 'mini m2', 'mini m4'],
+        'priority': 5
+    },
+    'airpods': {
+        'parser': 'parsers.airpods_parser:AirPodsParser',
+        'service': 'services.airpods_service:AirPodsService',
+        'keywords': ['airpods', '🎧', 'max', 'pro', 'anc', 'lightning', 'usb-c'],
+        'priority': 6
+    },
+    'apple_pencil': {
+        'parser': 'parsers.apple_pencil_parser:ApplePencilParser',
+        'service': 'services.apple_pencil_service:ApplePencilService',
+        'keywords': ['pencil', '✒️', 'apple pencil'],
+        'priority': 7
+    }
+}
+
+# Ключи описания устройства, которые загружаются при первом обращении
+LAZY_KEYS = ('parser', 'service')
+
+
+def load_object(path: str) -> Any:
+    """Импортирует "модуль:атрибут"; класс создается без аргументов"""
+    module_name, attribute = path.split(':')
+    value = getattr(importlib.import_module(module_name), attribute)
+    return value() if isinstance(value, type) else value
+
+
+class DeviceHandler(dict):
+    """
+    Описание устройства для TemplateParser.
+
+    Ключевые слова, приоритет и признак контекста доступны сразу, а parser
+    и service импортируются при первом handler['parser'] / handler['service'].
+    Так классификатор строится без импорта парсеров, а парсер устройства,
+    строк которого нет в сообщении, не загружается вовсе. Загрузка идет под
+    блокировкой: потоки парсинга могут обратиться к устройству одновременно.
+    """
+
+    def __init__(self, device_type: str, declaration: Dict[str, Any]):
+        super().__init__({key: value for key, value in declaration.items() if key not in LAZY_KEYS})
+        self.device_type = device_type
+        self.paths = {key: declaration[key] for key in LAZY_KEYS}
+        self._lock = threading.Lock()
+
+    def __missing__(self, key: str) -> Any:
+        if key not in self.paths:
+            raise KeyError(key)
+        with self._lock:
+            if not dict.__contains__(self, key):
+                start = time.perf_counter()
+                if key == 'service':
+                    # Сервисы сохраняют в базу и импортируют модели внутри методов
+                    setup_django()
+                self[key] = load_object(self.paths[key])
+                logger.info(f"📦 {self.device_type}: {key} {self.paths[key]} загружен "
+                            f"за {(time.perf_counter() - start) * 1000:.0f} мс")
+        return dict.__getitem__(self, key)
+
+    def load(self):
+        """Загружает парсер и сервис заранее (например, перед запуском пула процессов)"""
+        for key in LAZY_KEYS:
+            self[key]
+
+
+class LazyParsers(Mapping):
+    """Парсеры устройств по типу, загружаемые при обращении (для ParallelLineParser)"""
+
+    def __init__(self, handlers: Dict[str, DeviceHandler]):
+        self.handlers = handlers
+
+    def __getitem__(self, device_type: str) -> Any:
+        return self.handlers[device_type]['parser']
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.handlers)
+
+    def __len__(self) -> int:
+        return len(self.handlers)
+
+
+def build_device_handlers(declarations: Dict[str, Dict[str, Any]] = None) -> Dict[str, DeviceHandler]:
+    """Описания устройств из DEVICE_HANDLERS без загрузки парсеров и сервисов"""
+    declarations = declarations if declarations is not None else DEVICE_HANDLERS
+    return {device_type: DeviceHandler(device_type, declaration) for device_type, declaration in declarations.items()}
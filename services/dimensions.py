@@ -0,0 +1,198 @@
+"""
+Интернирование измерений устройств: цвета, страны, память, поколения и варианты хранятся целыми id
+"""
+import logging
+import re
+import threading
+from functools import partial
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+from django.db import connection, transaction
+from django.db.models.signals import pre_save
+
+from services.db_gateway import db_write
+
+logger = logging.getLogger(__name__)
+
+# Варианты в порядке линейки (пустой - обычная модель); остальные - после них
+VARIANT_ORDER = ['', 'se', 'mini', 'air', 'plus', 'pro', 'max', 'pro max', 'ultra']
+
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)')
+_CAPACITY = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(GB|TB|ГБ|ТБ)\s*$', re.IGNORECASE)
+
+
+def natural_key(value: str) -> list:
+    """Ключ сортировки с числами по значению: 9 < 10 < Air 11, S9 < S10"""
+    return [float(part) if index % 2 else part.lower() for index, part in enumerate(_NUMBER.split(value))]
+
+
+def rank_key(kind: str, value: str) -> tuple:
+    """Ключ сортировки значения внутри вида измерения"""
+    if kind == 'storage':
+        match = _CAPACITY.match(value)
+        if match:
+            gigabytes = float(match.group(1)) * (1024 if match.group(2).upper() in ('TB', 'ТБ') else 1)
+            return 0, gigabytes, natural_key(value)
+        return 1, 0, natural_key(value)
+    if kind == 'variant':
+        lowered = value.strip().lower()
+        order = VARIANT_ORDER.index(lowered) if lowered in VARIANT_ORDER else len(VARIANT_ORDER)
+        return order, 0, natural_key(value)
+    return 0, 0, natural_key(value)
+
+
+def dimension_fields(model) -> Dict[str, str]:
+    """{строковое поле: вид измерения} модели ({} у моделей без измерений)"""
+    return getattr(model, 'DIMENSIONS', {})
+
+
+def value_key_fields(model) -> List[str]:
+    """Ключ уникальности модели в строковых полях: generation_dim -> generation"""
+    by_dim = {f'{field}_dim': field for field in dimension_fields(model)}
+    return [by_dim.get(field, field) for field in model._meta.unique_together[0]]
+
+
+def rank_order(model, *fields: str) -> List[str]:
+    """Поля order_by: измерения сортируются по рангу (128GB < 256GB < 1TB), остальные - как есть"""
+    dimensions = dimension_fields(model)
+    return [f'{field}_dim__rank' if field in dimensions else field for field in fields]
+
+
+class DimensionCache:
+    """
+    Двунаправленный кэш измерений процесса: (вид, значение) <-> id и ранги.
+
+    Загружается целиком при старте (load) и заново при смене базы: тесты
+    переключают базы в одном процессе. Пакетное сохранение получает id из
+    памяти; новые значения добавляются одним запросом на вид, после чего
+    ранги вида пересчитываются (значений десятки). Значение, добавленное в
+    еще не зафиксированной транзакции, считается надежным только после ее
+    фиксации: при откате оно будет добавлено заново.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._database = None
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._values: Dict[int, Tuple[str, str]] = {}
+        self._ranks: Dict[int, int] = {}
+        self._unconfirmed: Set[Tuple[str, str]] = set()
+
+    @db_write
+    def load(self) -> int:
+        """Загружает кэш при старте приложения, возвращает число значений"""
+        return self.load_sync()
+
+    def load_sync(self) -> int:
+        """Загружает все значения и расставляет ранги, которых еще нет (после миграции)"""
+        from db_app.models import Dimension
+
+        with self._lock:
+            rows = list(Dimension.objects.values_list('pk', 'kind', 'value', 'rank'))
+            # Новые словари подменяют старые целиком: value и rank читают без блокировки
+            # и не должны видеть кэш очищенным на время запроса
+            self._ids = {(kind, value): pk for pk, kind, value, _ in rows}
+            self._values = {pk: (kind, value) for pk, kind, value, _ in rows}
+            self._ranks = {pk: rank for pk, _, _, rank in rows}
+            self._unconfirmed = set()
+            for kind in sorted({kind for _, kind, _, _ in rows}):
+                self._rerank(kind)
+            self._database = self._current_database()
+        logger.info(f"📚 Загружено значений измерений: {len(rows)}")
+        return len(rows)
+
+    def ids_sync(self, kind: str, values: Iterable[Optional[str]]) -> Dict[str, int]:
+        """{значение: id} вида; отсутствующие значения добавляются одним запросом, None не интернируется"""
+        values = {value for value in values if value is not None}
+        # Под блокировкой: другой поток шлюза может в это время перезагружать кэш
+        with self._lock:
+            self._ensure_loaded()
+            missing = {value for value in values if (kind, value) not in self._ids or (kind, value) in self._unconfirmed}
+            if missing:
+                self._add(kind, missing)
+            return {value: self._ids[(kind, value)] for value in values}
+
+    def with_ids_sync(self, model, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Добавляет к строкам со значениями полей модели id измерений (<поле>_dim_id)"""
+        dimensions = dimension_fields(model)
+        if not dimensions:
+            return rows
+
+        values: Dict[str, set] = {}
+        for row in rows:
+            for field, kind in dimensions.items():
+                if field in row:
+                    values.setdefault(kind, set()).add(row[field])
+        ids = {kind: self.ids_sync(kind, kind_values) for kind, kind_values in values.items()}
+
+        return [
+            {**row, **{f'{field}_dim_id': ids[kind].get(row[field]) for field, kind in dimensions.items() if field in row}}
+            for row in rows
+        ]
+
+    def value(self, dimension_id: Optional[int]) -> Optional[str]:
+        """Значение по id (None - нет в кэше)"""
+        entry = self._values.get(dimension_id)
+        return entry[1] if entry else None
+
+    def rank(self, dimension_id: Optional[int]) -> int:
+        """Ранг значения внутри вида (0 - нет в кэше)"""
+        return self._ranks.get(dimension_id, 0)
+
+    def _ensure_loaded(self):
+        if self._database != self._current_database():
+            self.load_sync()
+
+    def _current_database(self) -> str:
+        return str(connection.settings_dict['NAME'])
+
+    def _remember(self, pk: int, kind: str, value: str, rank: int):
+        self._ids[(kind, value)] = pk
+        self._values[pk] = (kind, value)
+        self._ranks[pk] = rank
+
+    def _add(self, kind: str, values: Set[str]):
+        """Добавляет значения вида (их мог добавить и другой процесс) и пересчитывает ранги"""
+        from db_app.models import Dimension
+
+        with self._lock:
+            Dimension.objects.bulk_create([Dimension(kind=kind, value=value) for value in values],
+                                          ignore_conflicts=True)
+            keys = {(kind, value) for value in values}
+            self._unconfirmed |= keys
+            transaction.on_commit(partial(self._confirm, keys))
+            self._rerank(kind)
+
+    def _confirm(self, keys: Set[Tuple[str, str]]):
+        with self._lock:
+            self._unconfirmed -= keys
+
+    def _rerank(self, kind: str):
+        """Перечитывает значения вида из базы и записывает изменившиеся ранги"""
+        from db_app.models import Dimension
+
+        dimensions = list(Dimension.objects.filter(kind=kind))
+        changed = []
+        for rank, dimension in enumerate(sorted(dimensions, key=lambda item: rank_key(kind, item.value)), 1):
+            if dimension.rank != rank:
+                dimension.rank = rank
+                changed.append(dimension)
+            self._remember(dimension.pk, kind, dimension.value, rank)
+        Dimension.objects.bulk_update(changed, ['rank'], batch_size=500)
+
+
+def _fill_dimension_ids(sender, instance, raw: bool = False, **kwargs):
+    """Записи, сохраняемые через save() и update_or_create, тоже получают id измерений"""
+    dimensions = dimension_fields(sender)
+    if raw or not dimensions:
+        return
+    row = dimension_cache.with_ids_sync(sender, [{field: getattr(instance, field) for field in dimensions}])[0]
+    for field in dimensions:
+        setattr(instance, f'{field}_dim_id', row[f'{field}_dim_id'])
+
+
+# Создаем глобальный экземпляр
+dimension_cache = DimensionCache()
+
+# bulk_create сигналы не вызывает: пакетное сохранение проставляет id само (bulk_upsert)
+pre_save.connect(_fill_dimension_ids, dispatch_uid='dimension_ids_pre_save')
@@ -0,0 +1,118 @@
+"""
+Построчное чтение прайсов из файлов (.txt, .csv, .xlsx) без загрузки файла в память
+"""
+import codecs
+import csv
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # openpyxl нужен только для .xlsx
+    load_workbook = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.txt', '.csv', '.xlsx')
+
+# Строк в одной части прайса: часть классифицируется, парсится и сохраняется пачкой
+CHUNK_LINES = 5000
+
+# Сколько байт начала файла проверяется при выборе кодировки
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+
+
+def is_supported(file_name: str) -> bool:
+    return Path(file_name).suffix.lower() in SUPPORTED_EXTENSIONS
+
+
+def detect_encoding(path: str) -> str:
+    """UTF-8, если начало файла в нем читается, иначе cp1251 (выгрузки из 1С и Excel)"""
+    with open(path, 'rb') as file:
+        sample = file.read(ENCODING_SAMPLE_SIZE)
+    try:
+        # Неполный символ на конце выборки не считается ошибкой
+        codecs.getincrementaldecoder('utf-8-sig')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1251'
+
+
+def iter_lines(path: str) -> Iterator[str]:
+    """Строки прайса из файла по одной"""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.xlsx':
+        yield from _iter_xlsx_lines(path)
+    elif suffix == '.csv':
+        yield from _iter_csv_lines(path)
+    else:
+        with open(path, encoding=detect_encoding(path), errors='replace', newline='') as file:
+            for line in file:
+                yield line.rstrip('\r\n')
+
+
+def count_lines(path: str) -> int:
+    """Число строк файла для отчета о ходе разбора (файл читается потоком)"""
+    if Path(path).suffix.lower() == '.xlsx':
+        return sum(1 for _ in iter_lines(path))
+    count = 0
+    block = b''
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            count += block.count(b'\n')
+    # Последняя строка без перевода строки на конце тоже строка
+    if block and not block.endswith(b'\n'):
+        count += 1
+    return count
+
+
+def iter_chunks(lines: Iterable[str], size: int = CHUNK_LINES) -> Iterator[List[str]]:
+    """Делит поток строк на части по size строк"""
+    iterator = iter(lines)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _join_cells(cells: Iterable) -> str:
+    """Строка прайса из ячеек: непустые значения через пробел"""
+    values = []
+    for cell in cells:
+        if cell is None:
+            continue
+        if isinstance(cell, float) and cell.is_integer():
+            cell = int(cell)
+        value = str(cell).strip()
+        if value:
+            values.append(value)
+    return ' '.join(values)
+
+
+def _iter_csv_lines(path: str) -> Iterator[str]:
+    encoding = detect_encoding(path)
+    with open(path, encoding=encoding, errors='replace', newline='') as file:
+        sample = file.read(64 * 1024)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(file, dialect):
+            yield _join_cells(row)
+
+
+def _iter_xlsx_lines(path: str) -> Iterator[str]:
+    if load_workbook is None:
+        raise RuntimeError("Для чтения .xlsx нужен пакет openpyxl (pip install openpyxl)")
+    # read_only читает лист потоком, не строя всю книгу в памяти
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield _join_cells(row)
+    finally:
+        workbook.close()
@@ -2,135 +2,220 @@
 Система парсинга только на шаблонах с детальным отчетом
 """
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable, Awaitable, Optional, Iterable
 import asyncio
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 # Импортируем наши специализированные парсеры
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from parsers.iphone_parser import iphone_parser
-from parsers.macbook_parser import macbook_parser
-from parsers.ipad_parser import iPadParser
-from parsers.apple_watch_parser import AppleWatchParser
-from parsers.imac_parser import iMacParser
-from parsers.airpods_parser import AirPodsParser
-from parsers.apple_pencil_parser import ApplePencilParser
-from services.iphone_service_simple import iphone_service_simple
-from services.macbook_service_simple import macbook_service_simple
-from services.ipad_service_simple import ipad_service_simple
-from services.apple_watch_service import AppleWatchService
-from services.imac_service import iMacService
-from services.airpods_service import AirPodsService
-from services.apple_pencil_service import ApplePencilService
-from services.macbook_service import macbook_service
-
-from bot.database_service_async import db_service
+from services.device_registry import build_device_handlers, LazyParsers
+from services.line_classifier import LineClassifier
+from services.line_dedup import line_dedup
+from services.parallel_parser import ParallelLineParser, PARSER_THREADS
+from services.line_budget import LineBudget
+from parsers.line_features import get_line_features
 
 logger = logging.getLogger(__name__)
 
+# Получает состояние разбора после каждого этапа (см. TemplateParser.parse_message)
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 class TemplateParser:
     """Парсер только на шаблонах с детальным отчетом"""
     
     def __init__(self):
-        # Инициализируем новые парсеры
-        self.apple_watch_parser = AppleWatchParser()
-        self.imac_parser = iMacParser()
-        self.airpods_parser = AirPodsParser()
-        self.apple_pencil_parser = ApplePencilParser()
-        
-        # Инициализируем новые сервисы
-        self.apple_watch_service = AppleWatchService()
-        self.imac_service = iMacService()
-        self.airpods_service = AirPodsService()
-        self.apple_pencil_service = ApplePencilService()
-        
-        self.device_parsers = {
-            'iphone': {
-                'parser': iphone_parser,
-                'service': iphone_service_simple,
-                'keywords': ['iphone', '16e', '16', '15', '14', '13', 'pro', 'plus', 'max'],
-                'priority': 1
-            },
-            'macbook': {
-                'parser': macbook_parser,
-                'service': macbook_service_simple,
-                'keywords': ['macbook', 'air', 'pro', 'm1 ', 'm2 ', 'm3 ', 'm4 '],
-                'priority': 2
-            },
-            'ipad': {
-                'parser': iPadParser(),
-                'service': ipad_service_simple,
-                'keywords': ['ipad', 'mini', 'air', 'pro', 'wifi', 'lte', 'wi-fi'],
-                'priority': 3
-            },
-            'apple_watch': {
-                'parser': self.apple_watch_parser,
-                'service': self.apple_watch_service,
-                'keywords': ['apple watch', 'aw ', 'watch', 'se', 'ultra', 'series', 's10'],
-                'priority': 4
-            },
-            'imac': {
-                'parser': self.imac_parser,
-                'service': self.imac_service,
-                'keywords': ['imac', 'mac mini', 'mini m2', 'mini m4'],
-                'priority': 5
-            },
-            'airpods': {
-                'parser': self.airpods_parser,
-                'service': self.airpods_service,
-                'keywords': ['airpods', '🎧', 'max', 'pro', 'anc', 'lightning', 'usb-c'],
-                'priority': 6
-            },
-            'apple_pencil': {
-                'parser': self.apple_pencil_parser,
-                'service': self.apple_pencil_service,
-                'keywords': ['pencil', '✒️', 'apple pencil'],
-                'priority': 7
-            }
-        }
+        # Парсеры и сервисы устройств импортируются при первом обращении (см. services/device_registry.py)
+        self.device_parsers = build_device_handlers()
+        
+        # Классификатор распределяет строки по парсерам за один проход
+        self.classifier = LineClassifier(self.device_parsers)
+        self.line_dedup = line_dedup
+        
+        # Большие блоки строк парсятся шардами в пуле процессов (включается PARSER_PROCESSES)
+        self.parallel = ParallelLineParser(LazyParsers({
+            device_type: parser_info
+            for device_type, parser_info in self.device_parsers.items()
+            if not parser_info.get('context')
+        }))
+        
+        # Классификация и парсинг идут в потоках, чтобы разбор большого прайса
+        # не останавливал event loop бота; число потоков ограничивает число
+        # одновременно разбираемых сообщений
+        self.executor = ThreadPoolExecutor(max_workers=PARSER_THREADS, thread_name_prefix='template-parser')
+    
+    async def preload(self):
+        """Загружает парсеры и сервисы всех устройств в потоке парсинга, чтобы первое сообщение их не ждало"""
+        from services.dimensions import dimension_cache
+
+        await dimension_cache.load()
+        for parser_info in self.device_parsers.values():
+            await self._run_blocking(parser_info.load)
+        logger.info("📦 Парсеры и сервисы устройств загружены")
     
-    async def parse_message(self, text: str, source: str = "") -> Dict[str, Any]:
+    async def parse_message(self, text: str, source: str = "",
+                            progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
         """
         Парсит сообщение с прайсами только шаблонами с детальным отчетом
         
+        Args:
+            progress: вызывается после классификации, перед парсингом и сохранением каждого
+                устройства и в конце со словарем stage, device_type, lines_done, lines_total, saved
+        
         Returns:
             Dict с результатами парсинга для каждого типа устройств
         """
         logger.info(f"🔄 Начинаем парсинг только шаблонами ({len(text.split())} слов)")
         
+        # Разбиваем текст на строки
+        lines = text.strip().split('\n')
+        return await self.parse_stream([lines], source, progress)
+    
+    async def parse_stream(self, chunks: Iterable[List[str]], source: str = "",
+                           progress: Optional[ProgressCallback] = None,
+                           lines_total: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Парсит прайс, читаемый частями (например, строки большого файла)
+        
+        Каждая часть классифицируется, парсится и сохраняется пачкой, после чего
+        ее строки и распарсенные объекты освобождаются; отчет - общий для всех частей.
+        Части читаются в потоке парсинга, поэтому генератор может читать файл.
+        
+        Args:
+            chunks: итератор списков строк
+            lines_total: число строк для отчета о ходе разбора, если известно заранее
+        """
+        try:
+            return await self._parse_chunks(chunks, source, progress, lines_total)
+        except asyncio.CancelledError:
+            # Часть устройств могла сохраниться: следующая загрузка источника разбирается целиком
+            self.line_dedup.forget(source)
+            logger.info(f"⛔ Парсинг сообщения ({source}) отменен")
+            raise
+    
+    async def _parse_chunks(self, chunks: Iterable[List[str]], source: str,
+                            progress: Optional[ProgressCallback], lines_total: Optional[int]) -> Dict[str, Any]:
         results = {
             'template_results': {},
             'total_saved': 0,
             'processing_summary': [],
             'unparsed_lines': [],
             'price_like_lines': [],
-            'parsed_lines': []
+            'parsed_lines': [],
+            'skipped_unchanged': 0,
+            'too_long_lines': 0,
+            'overruns': []
         }
         
-        # Разбиваем текст на строки
-        lines = text.strip().split('\n')
+        state = {
+            'budget': LineBudget(),  # Время разбора строк на все сообщение
+            'line_candidates': {},
+            'skipped_lines': set(),  # Строки, пропущенные как известные с прошлой загрузки
+            'line_offers': {},  # Предложения (код устройства, pk), сохраненные каждой строкой
+            'save_failed': False,
+            'section_starts': {},  # Контекст секций на конце предыдущей части
+            'saved': {},
+            'lines_before': 0,
+            'lines_total': lines_total
+        }
+        # Строки, запомненные до удаления записей (в том числе другим процессом), не пропускаются
+        state['dedup_generation'] = await self._dedup_generation()
+        state['dedup'] = self.line_dedup.check_generation(state['dedup_generation'])
+        
+        chunk_iterator = iter(chunks)
+        while True:
+            lines = await self._run_blocking(next, chunk_iterator, None)
+            if lines is None:
+                break
+            await self._parse_chunk(lines, source, results, state, progress)
+        results['overruns'] = state['budget'].overruns
+        
+        # Итог по устройствам в порядке приоритета парсеров
+        sorted_parsers = sorted(self.device_parsers.items(), key=lambda x: x[1].get('priority', 999))
+        for device_type, _ in sorted_parsers:
+            save_result = results['template_results'].get(device_type)
+            if not save_result:
+                continue
+            results['processing_summary'].append(
+                f"✅ {device_type}: {save_result['template_saved']} сохранено из {save_result['parsed_count']} распознанных "
+                f"(новых: {save_result['created']}, обновлено: {save_result['updated']}, "
+                f"без изменений: {save_result['unchanged']})"
+            )
+        
+        # Запоминаем строки только после успешного сохранения, иначе следующая загрузка их повторит.
+        # Нераспознанные строки не запоминаются: при повторе прайса они снова попадут в отчет
+        if state['save_failed']:
+            self.line_dedup.forget(source)
+        else:
+            remembered = set(results['parsed_lines']) | state['skipped_lines']
+            self.line_dedup.remember(source, {
+                line: candidates for line, candidates in state['line_candidates'].items()
+                if line.strip() in remembered
+            }, state['line_offers'], state['dedup_generation'])
+        
+        # Генерируем итоговый отчет
+        summary = self._generate_detailed_summary(results)
+        results['summary'] = summary
+        
+        logger.info(f"✅ Парсинг шаблонами завершен. Всего сохранено: {results['total_saved']}")
+        await self._report(progress, 'done', None, state['lines_before'], state['lines_before'], state['saved'])
+        
+        return results
+    
+    async def _parse_chunk(self, lines: List[str], source: str, results: Dict[str, Any],
+                           state: Dict[str, Any], progress: Optional[ProgressCallback]):
+        """Классифицирует, парсит и сохраняет одну часть прайса, дополняя общий результат"""
         processed_lines = set()  # Отслеживаем обработанные строки
+        device_unparsed = []  # Не распознанные парсерами устройств (могли распознаться другим парсером)
+        saved = state['saved']
+        
+        # Этап 0: Один проход классификатора вместо фильтрации строк каждым парсером.
+        # Строки, не изменившиеся с прошлой загрузки источника, не классифицируются и не парсятся
+        known_candidates = self.line_dedup.known_candidates(source, lines) if state['dedup'] else {}
+        routed_lines, line_candidates = await self._run_blocking(self.classifier.classify, lines, known_candidates)
+        routed_lines = self._skip_unchanged(routed_lines, known_candidates)
+        state['line_candidates'].update(line_candidates)
+        
+        known_lines = {line.strip() for line in known_candidates} - {''}
+        routed_set = {line.strip() for device_lines in routed_lines.values() for line in device_lines}
+        skipped_lines = known_lines - routed_set
+        # Слишком длинные строки не парсятся и не попадают в отчет целиком
+        too_long_lines = {line.strip() for line in lines if self.classifier.is_too_long(line)}
+        results['too_long_lines'] += sum(1 for line in lines if line.strip() in too_long_lines)
+        lines_to_report = [
+            line for line in lines if line.strip() not in skipped_lines and line.strip() not in too_long_lines
+        ]
         
         # Собираем все строки, которые выглядят как цены
-        price_like_lines = self._find_price_like_lines(lines)
-        results['price_like_lines'] = price_like_lines
+        price_like_lines = await self._run_blocking(self._find_price_like_lines, lines_to_report)
+        results['price_like_lines'].extend(price_like_lines)
         
         # Этап 1: Обработка специализированными парсерами (сортировка по приоритету)
         sorted_parsers = sorted(self.device_parsers.items(), key=lambda x: x[1].get('priority', 999))
-        for device_type, parser_info in sorted_parsers:
+        lines_done = self._lines_done_by_stage(lines, routed_lines, [device_type for device_type, _ in sorted_parsers])
+        lines_before = state['lines_before']
+        lines_total = state['lines_total'] or lines_before + lines_done[-1]
+        await self._report(progress, 'classify', None, lines_before + lines_done[0], lines_total, saved)
+        
+        for stage, (device_type, parser_info) in enumerate(sorted_parsers, 1):
             logger.info(f"📱 Обрабатываем {device_type} шаблонами...")
             
-            # Фильтруем строки для этого типа устройства
-            device_lines = self._filter_lines_for_device(lines, parser_info['keywords'], device_type)
+            # Строки-кандидаты, еще не распознанные парсером с более высоким приоритетом
+            device_lines = [line for line in routed_lines[device_type] if line.strip() not in processed_lines]
             
             if device_lines:
                 logger.info(f"Найдено {len(device_lines)} потенциальных строк для {device_type}")
+                # Первое обращение к устройству импортирует парсер и сервис - не в event loop
+                await self._run_blocking(parser_info.load)
                 
                 # Парсим шаблонами
-                parsed_data, unparsed_lines = parser_info['parser'].parse_lines(device_lines)
+                await self._report(progress, 'parse', device_type, lines_before + lines_done[stage - 1], lines_total, saved)
+                parsed_data, unparsed_lines = await self._parse_device_lines(
+                    device_type, device_lines, lines, state['section_starts'].get(device_type), state['budget']
+                )
                 
                 if parsed_data:
                     # Отмечаем обработанные строки
@@ -142,53 +227,17 @@ class TemplateParser:
                         if source_line:
                             processed_lines.add(source_line.strip())
                     
-                    # Сохраняем через специализированный сервис
-                    if device_type == 'macbook':
-                        # Для MacBook используем специальный метод
-                        saved_count = 0
-                        for data in parsed_data:
-                            price_data = data.to_dict()
-                            price_data['source'] = source
-                            result = await parser_info['service'].save_macbook_price(price_data)
-                            if result:
-                                saved_count += 1
-                        
-                        save_result = {
-                            'template_saved': saved_count,
-                            'total_saved': saved_count,
-                            'parsed_count': len(parsed_data)
-                        }
-                    else:
-                        # Для других устройств используем стандартный метод
-                        source_lines = []
-                        for data in parsed_data:
-                            if isinstance(data, dict):
-                                source_lines.append(data.get('source_line', ''))
-                            else:
-                                source_lines.append(getattr(data, 'source_line', ''))
-                        parse_result = await parser_info['service'].parse_and_save_prices(
-                            '\n'.join(source_lines), 
-                            source
-                        )
-                        # Приводим к единому формату
-                        if isinstance(parse_result, tuple):
-                            parsed_items, saved_count = parse_result
-                            save_result = {
-                                'total_saved': saved_count,
-                                'template_saved': saved_count,
-                                'parsed_count': len(parsed_data),
-                                'parsed_items': parsed_items
-                            }
-                        else:
-                            save_result = parse_result
-                            if 'total_saved' not in save_result:
-                                save_result['total_saved'] = save_result.get('saved', 0)
-                            if 'template_saved' not in save_result:
-                                save_result['template_saved'] = save_result.get('saved', 0)
-                            save_result['parsed_count'] = len(parsed_data)
+                    # Сохраняем уже распарсенные объекты через специализированный сервис,
+                    # не склеивая строки обратно в текст для повторного парсинга
+                    await self._report(progress, 'save', device_type, lines_before + lines_done[stage - 1], lines_total, saved)
+                    save_result = await parser_info['service'].save_parsed_prices(parsed_data, source)
+                    for line, line_offers in save_result.pop('offers', {}).items():
+                        self._add_offers(state['line_offers'], line, line_offers)
                     
-                    results['template_results'][device_type] = save_result
+                    self._add_save_result(results['template_results'], device_type, save_result)
                     results['total_saved'] += save_result['total_saved']
+                    state['save_failed'] = state['save_failed'] or save_result.get('failed', 0) > 0
+                    saved[device_type] = saved.get(device_type, 0) + save_result['total_saved']
                     
                     # Отмечаем обработанные строки
                     for data in parsed_data:
@@ -198,120 +247,165 @@ class TemplateParser:
                             line = getattr(data, 'source_line', '').strip()
                         processed_lines.add(line)
                         results['parsed_lines'].append(line)
-                    
-                    results['processing_summary'].append(
-                        f"✅ {device_type}: {save_result['template_saved']} сохранено из {save_result['parsed_count']} распознанных"
-                    )
                 
                 # Добавляем нераспознанные строки этого типа в общий список
                 for line in unparsed_lines:
                     if line.strip() and line.strip() not in processed_lines:
-                        results['unparsed_lines'].append(line)
+                        device_unparsed.append(line)
+            
+            # Контекст секций переходит в следующую часть прайса
+            if parser_info.get('context'):
+                state['section_starts'][device_type] = await self._run_blocking(
+                    parser_info['parser'].section_tracker.advance, lines, state['section_starts'].get(device_type)
+                )
+        
+        # Строки, известные с прошлой загрузки, уже были распознаны и сохранены. Парсер
+        # с контекстом получает их вместе с измененным блоком; если он их не распознал
+        # (строка другого устройства), они остаются пропущенными без изменений
+        unchanged_lines = known_lines - processed_lines
+        state['skipped_lines'] |= unchanged_lines
+        results['skipped_unchanged'] += sum(1 for line in lines if line.strip() in unchanged_lines)
+        await self._refresh_unchanged(source, [line for line in lines if line.strip() in unchanged_lines], state)
         
         # Этап 2: Собираем все оставшиеся нераспознанные строки
         # (те, которые не были обработаны ни одним парсером)
-        remaining_lines = [line for line in lines if line.strip() and line.strip() not in processed_lines]
-        results['unparsed_lines'].extend(remaining_lines)
-        
-        # Генерируем итоговый отчет
-        summary = self._generate_detailed_summary(results)
-        results['summary'] = summary
+        reported = set()
+        for line in device_unparsed + lines_to_report:
+            key = line.strip()
+            if key and key not in processed_lines and key not in unchanged_lines and key not in reported:
+                reported.add(key)
+                results['unparsed_lines'].append(line)
         
-        logger.info(f"✅ Парсинг шаблонами завершен. Всего сохранено: {results['total_saved']}")
-        
-        return results
+        state['lines_before'] = lines_before + lines_done[-1]
     
-    def _filter_lines_for_device(self, lines: List[str], keywords: List[str], device_type: str = None) -> List[str]:
-        """Фильтрует строки для конкретного типа устройства"""
-        filtered_lines = []
-        
-        for line in lines:
-            line_lower = line.lower()
-            
-            # Проверяем наличие ключевых слов
-            has_keyword = any(keyword in line_lower for keyword in keywords)
-            
-            # Для строк с флагами, проверяем наличие устройства более строго
-            if self._has_flag(line) and device_type:
-                if device_type == 'ipad' and 'ipad' in line_lower:
-                    has_keyword = True
-                elif device_type == 'iphone' and ('iphone' in line_lower or any(k in line_lower for k in ['13', '14', '15', '16', 'pro', 'plus', 'max'])):
-                    has_keyword = True
-                elif device_type == 'macbook' and 'macbook' in line_lower:
-                    has_keyword = True
-            
-            if has_keyword:
-                # Дополнительные проверки для качества
-                if (self._has_price(line) and 
-                    not self._is_exclude_line(line)):
-                    
-                    # Специальные проверки для MacBook - исключаем iPhone строки
-                    if device_type == 'macbook':
-                        # Если строка содержит iPhone-специфичные паттерны, пропускаем
-                        if self._is_iphone_line(line):
-                            continue
-                        # Дополнительная проверка - MacBook должен содержать слово "MacBook" или специфичные чипы
-                        if not self._is_macbook_line(line):
-                            continue
-                    
-                    filtered_lines.append(line)
-        
-        return filtered_lines
+    async def _dedup_generation(self) -> Optional[int]:
+        """Поколение сохраненных строк из базы (None - прочитать не удалось)"""
+        from services.db_gateway import db_gateway
+
+        try:
+            return await db_gateway.read(self.line_dedup.generation_sync)
+        except Exception as e:
+            logger.error(f"Ошибка чтения поколения строк прайсов: {e}")
+            return None
     
-    def _has_price(self, line: str) -> bool:
-        """Проверяет наличие цены в строке"""
-        import re
-        return bool(re.search(r'\d{4,6}', line))
+    async def _refresh_unchanged(self, source: str, unchanged_lines: List[str], state: Dict[str, Any]):
+        """Подтверждает предложения пропущенных строк: цены не сохраняются, но и не устаревают"""
+        from services.price_history import price_history_service
+
+        offers = set()
+        for line, line_offers in self.line_dedup.known_offers(source, unchanged_lines).items():
+            self._add_offers(state['line_offers'], line.strip(), line_offers)
+            offers.update(line_offers)
+        if offers and await price_history_service.refresh(source, sorted(offers)) is None:
+            state['save_failed'] = True
     
-    def _has_flag(self, line: str) -> bool:
-        """Проверяет наличие флага страны"""
-        import re
-        return bool(re.search(r'[🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]', line))
+    def _add_offers(self, line_offers: Dict[str, List[Tuple[int, int]]], line: str, offers: List[Tuple[int, int]]):
+        """Добавляет предложения строки (одна строка может сохраниться несколькими парсерами)"""
+        current = line_offers.setdefault(line, [])
+        current.extend(offer for offer in offers if offer not in current)
     
-    def _is_iphone_line(self, line: str) -> bool:
-        """Проверяет, является ли строка iPhone строкой"""
-        import re
-        line_lower = line.lower()
-        
-        # iPhone-специфичные паттерны
-        iphone_patterns = [
-            r'\b(13|14|15|16)\s+(128|256|512|1tb)\s+',  # iPhone 13 128GB
-            r'\b(13|14|15|16)\s+(plus|pro|max)\s+',     # iPhone 16 Pro
-            r'\b(13|14|15|16)\s+(black|white|blue|green|pink|starlight|midnight|natural|desert|ultramarine|teal)\s+',  # iPhone с цветами
-            r'\b(13|14|15|16)e\s+',  # iPhone 16E
-            r'iphone\s+',  # Слово iPhone
-        ]
+    def _add_save_result(self, template_results: Dict[str, Dict[str, Any]], device_type: str,
+                         save_result: Dict[str, Any]):
+        """Складывает результаты сохранения устройства по частям прайса"""
+        total = template_results.setdefault(device_type, {})
+        for key, value in save_result.items():
+            total[key] = total.get(key, 0) + value
+    
+    def _lines_done_by_stage(self, lines: List[str], routed_lines: Dict[str, List[str]],
+                             device_order: List[str]) -> List[int]:
+        """
+        Сколько непустых строк сообщения полностью обработано к каждому этапу
         
-        for pattern in iphone_patterns:
-            if re.search(pattern, line_lower):
-                return True
+        Элемент 0 - после классификации (строки без кандидатов), элемент i - после
+        i-го парсера: строка готова, когда пройден последний парсер-кандидат.
+        """
+        last_stage = {}
+        for stage, device_type in enumerate(device_order, 1):
+            for line in routed_lines.get(device_type, []):
+                last_stage[line.strip()] = stage
         
-        return False
-    
-    def _is_macbook_line(self, line: str) -> bool:
-        """Проверяет, является ли строка MacBook строкой"""
-        import re
-        line_lower = line.lower()
-        
-        # MacBook-специфичные паттерны
-        macbook_patterns = [
-            r'macbook\s+',  # Слово MacBook
-            r'\bm[1-4]\s+',  # Чипы M1, M2, M3, M4
-            r'\bm[1-4]\s+max\s+',  # Чипы M1 Max, M4 Max
-            r'\b(air|pro)\s+',  # Air, Pro
-        ]
+        counts = [0] * (len(device_order) + 1)
+        for line in lines:
+            if line.strip():
+                counts[last_stage.get(line.strip(), 0)] += 1
         
-        for pattern in macbook_patterns:
-            if re.search(pattern, line_lower):
-                return True
+        lines_done = []
+        total = 0
+        for count in counts:
+            total += count
+            lines_done.append(total)
+        return lines_done
+    
+    async def _report(self, progress: Optional[ProgressCallback], stage: str, device_type: Optional[str],
+                      lines_done: int, lines_total: int, saved: Dict[str, int]):
+        """Сообщает о ходе разбора (ошибка получателя не прерывает парсинг)"""
+        if progress is None:
+            return
+        try:
+            await progress({
+                'stage': stage,
+                'device_type': device_type,
+                'lines_done': lines_done,
+                'lines_total': lines_total,
+                'saved': dict(saved)
+            })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка отправки хода парсинга: {e}")
+    
+    async def _parse_device_lines(self, device_type: str, device_lines: List[str], lines: List[str],
+                                  section_start: Optional[Dict[str, str]] = None,
+                                  budget: Optional[LineBudget] = None) -> Tuple[List[Any], List[str]]:
+        """
+        Парсит строки устройства в потоке парсинга или шардами в пуле процессов
         
-        return False
+        В потоке строки разбираются по одной с замером времени (см. LineBudget).
+        """
+        budget = budget or LineBudget()
+        parser_info = self.device_parsers[device_type]
+        parser = parser_info['parser']
+        # Парсеру с контекстом секций нужны и заголовки из всего сообщения
+        if parser_info.get('context'):
+            return await self._run_blocking(self._parse_context_lines, device_type, device_lines, lines, section_start, budget)
+        if self.parallel.should_parallelize(len(device_lines)) and not budget.exhausted:
+            result = await self.parallel.parse_lines(device_type, device_lines)
+            if result is not None:
+                return result
+            # Пул процессов недоступен: строки разбираются в потоке парсинга, как без пула
+        return await self._run_blocking(
+            budget.parse_lines, device_type, lambda index, line: parser.parse_lines([line]), device_lines
+        )
+    
+    def _parse_context_lines(self, device_type: str, device_lines: List[str], lines: List[str],
+                             section_start: Optional[Dict[str, str]], budget: LineBudget) -> Tuple[List[Any], List[str]]:
+        """Парсит строки с контекстом секций: контекст считается один раз на весь блок"""
+        parser = self.device_parsers[device_type]['parser']
+        contexts = parser.section_contexts(device_lines, lines, section_start)
+        return budget.parse_lines(
+            device_type, lambda index, line: parser.parse_lines([line], contexts=[contexts[index]]), device_lines
+        )
     
-    def _is_exclude_line(self, line: str) -> bool:
-        """Проверяет, нужно ли исключить строку"""
-        exclude_words = ['гарантия', 'активаций', 'adapter', 'от 10 шт']
-        line_lower = line.lower()
-        return any(word in line_lower for word in exclude_words)
+    async def _run_blocking(self, func: Callable, *args, **kwargs):
+        """Выполняет синхронную работу парсинга в потоке, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    def _skip_unchanged(self, routed_lines: Dict[str, List[str]],
+                        known_candidates: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Оставляет парсерам только строки, изменившиеся с прошлой загрузки"""
+        if not known_candidates:
+            return routed_lines
+        
+        result = {}
+        for device_type, device_lines in routed_lines.items():
+            changed_lines = [line for line in device_lines if line not in known_candidates]
+            # Парсеру с контекстом соседних строк нужен весь блок, если в нем что-то изменилось
+            if changed_lines and self.device_parsers[device_type].get('context'):
+                result[device_type] = device_lines
+            else:
+                result[device_type] = changed_lines
+        return result
     
     def _find_price_like_lines(self, lines: List[str]) -> List[str]:
         """Находит строки, которые выглядят как цены"""
@@ -321,19 +415,20 @@ class TemplateParser:
             line = line.strip()
             if not line:
                 continue
+            features = get_line_features(line)
                 
             # Проверяем наличие цены (4-6 цифр или с точками/запятыми)
-            has_price = bool(re.search(r'\d{4,6}|\d+[.,]\d+', line))
+            has_price = features.has_price
             
             # Проверяем наличие флага страны
-            has_flag = bool(re.search(r'[🇺🇸🇯🇵🇮🇳🇨🇳🇦🇪🇭🇰🇰🇷🇪🇺🇷🇺🇨🇦🇻🇳]', line))
+            has_flag = features.has_flag
             
             # Проверяем наличие GB/TB или других признаков товара
-            has_config = bool(re.search(r'(gb|tb|gb|tb|\d+\s*(gb|tb))', line.lower()))
+            has_config = features.has_config
             
             # Исключаем очевидно не товарные строки
             exclude_words = ['гарантия', 'активаций', 'adapter', 'от 10 шт', 'mouse', 'trackpad']
-            has_exclude = any(word in line.lower() for word in exclude_words)
+            has_exclude = any(word in features.lower for word in exclude_words)
             
             if has_price and (has_flag or has_config) and not has_exclude:
                 price_like.append(line)
@@ -355,6 +450,12 @@ class TemplateParser:
         summary_parts.append(f"✅ Успешно распознано шаблонами: **{total_parsed}**")
         summary_parts.append(f"💾 Сохранено в базу: **{total_saved}**")
         summary_parts.append(f"❌ Не распознано: **{total_unparsed}**")
+        if results.get('skipped_unchanged'):
+            summary_parts.append(f"⏭️ Пропущено без изменений с прошлой загрузки: **{results['skipped_unchanged']}**")
+        if results.get('too_long_lines'):
+            summary_parts.append(f"✂️ Пропущено слишком длинных строк: **{results['too_long_lines']}**")
+        if results.get('overruns'):
+            summary_parts.append(f"⏱️ Строк, разбиравшихся дольше бюджета: **{len(results['overruns'])}**")
         
         # Статистика по устройствам
         if results['processing_summary']:
@@ -4,7 +4,10 @@
 import logging
 from typing import List, Dict, Any
 from django.utils import timezone
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
+
+from services.bulk_upsert import bulk_upsert_service, build_rows
+from parsers.imac_parser import iMacData
 
 logger = logging.getLogger(__name__)
 
@@ -21,48 +24,62 @@ class iMacService:
         parser = iMacParser()
         parsed_items, unparsed = parser.parse_lines(lines)
         
-        saved_count = 0
-        for item in parsed_items:
-            # Конвертируем в формат для save_imac_price
-            data = {
-                'device': 'iMac',
-                'generation': item.chip,
-                'variant': item.size,
-                'memory': item.memory,
-                'storage': item.storage,
-                'color': item.color,
-                'country': item.country,
-                'price': str(item.price),
-                'product_code': item.product_code,
-                'source': source
-            }
-            
-            if await self.save_imac_price(data):
-                saved_count += 1
+        save_result = await self.save_parsed_prices(parsed_items, source)
+        
+        return parsed_items, save_result['total_saved']
+    
+    async def save_parsed_prices(self, items: List[iMacData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены iMac одной пачкой"""
+        from db_app.models import iMac
         
-        return parsed_items, saved_count
+        rows = build_rows(items, lambda item: self._build_imac_row(self._item_to_dict(item, source)))
+        counts = await bulk_upsert_service.upsert(iMac, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
     
-    @sync_to_async
+    def _item_to_dict(self, item, source: str) -> Dict[str, Any]:
+        """Конвертирует распарсенный объект в формат save_imac_price"""
+        # Конвертируем в формат для save_imac_price
+        data = {
+            'device': item.model,
+            'generation': item.chip,
+            'variant': item.size,
+            'memory': item.memory,
+            'storage': item.storage,
+            'color': item.color,
+            'country': item.country_flag,
+            'price': str(item.price),
+            'product_code': item.product_code,
+            'source': source
+        }
+        return data
+    
+    def _build_imac_row(self, imac_data: Dict[str, Any]) -> tuple:
+        """Возвращает (ключ, значения) записи iMac для update_or_create/upsert"""
+        lookup = {
+            'model': imac_data.get('device', 'iMac'),
+            'chip': imac_data.get('generation', 'M1'),
+            'size': imac_data.get('variant', '24'),
+            'memory': imac_data.get('memory', '8GB'),
+            'storage': imac_data.get('storage', '256GB'),
+            'color': imac_data.get('color', 'Silver'),
+            'country': imac_data.get('country', '🇺🇸')
+        }
+        defaults = {
+            'price': imac_data.get('price', 0),
+            'product_code': imac_data.get('product_code', ''),
+            'source': f"Parsed at {timezone.now()}"
+        }
+        return lookup, defaults
+    
+    @db_write
     def save_imac_price(self, imac_data: Dict[str, Any]) -> bool:
         """Сохраняет цену iMac в базу данных"""
         try:
             from db_app.models import iMac
             
             # Создаем или обновляем запись
-            imac, created = iMac.objects.update_or_create(
-                model=imac_data.get('device', 'iMac'),
-                chip=imac_data.get('generation', 'M1'),
-                size=imac_data.get('variant', '24'),
-                memory=imac_data.get('memory', '8GB'),
-                storage=imac_data.get('storage', '256GB'),
-                color=imac_data.get('color', 'Silver'),
-                country=imac_data.get('country', '🇺🇸'),
-                defaults={
-                    'price': imac_data.get('price', 0),
-                    'product_code': imac_data.get('product_code', ''),
-                    'source': f"Parsed at {timezone.now()}",
-                }
-            )
+            lookup, defaults = self._build_imac_row(imac_data)
+            imac, created = iMac.objects.update_or_create(**lookup, defaults=defaults)
             
             action = "создана" if created else "обновлена"
             logger.info(f"iMac запись {action}: {imac}")
@@ -72,13 +89,13 @@ class iMacService:
             logger.error(f"Ошибка сохранения iMac: {e}")
             return False
     
-    @sync_to_async
+    @db_read
     def get_all_imacs(self) -> List[Dict[str, Any]]:
         """Получает все iMac из базы данных"""
         try:
             from db_app.models import iMac
             
-            imacs = iMac.objects.all().order_by('model', 'chip', 'size')
+            imacs = iMac.objects.with_display_price().order_by('model', 'chip', 'size')
             
             return [
                 {
@@ -102,13 +119,13 @@ class iMacService:
             logger.error(f"Ошибка получения iMac: {e}")
             return []
     
-    @sync_to_async
+    @db_read
     def get_imacs_by_model(self, model: str) -> List[Dict[str, Any]]:
         """Получает iMac по модели"""
         try:
             from db_app.models import iMac
             
-            imacs = iMac.objects.filter(model=model).order_by('chip', 'size')
+            imacs = iMac.objects.with_display_price().filter(model=model).order_by('chip', 'size')
             
             return [
                 {
@@ -4,15 +4,15 @@
 import logging
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_write
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import iPad, Markup
+from parsers.ipad_parser import iPadData
+from services.bulk_upsert import bulk_upsert_service, build_rows
 
 logger = logging.getLogger(__name__)
 
@@ -20,73 +20,89 @@ class iPadServiceSimple:
     def __init__(self):
         pass
 
-    @sync_to_async
+    async def save_parsed_prices(self, items: List[iPadData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены iPad одной пачкой"""
+        rows = build_rows(items, lambda data: self._build_ipad_row({**data.to_dict(), 'source': source}))
+        counts = await bulk_upsert_service.upsert(iPad, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
+
+    def _build_ipad_row(self, price_data: Dict[str, Any]) -> Optional[tuple]:
+        """Нормализует данные iPad и возвращает (ключ, значения) для update_or_create/upsert"""
+        # Извлекаем данные из price_data
+        generation = price_data.get('generation', '')
+        variant = price_data.get('variant', '')
+        size = price_data.get('size', '')
+        storage = price_data.get('storage', '')
+        color = price_data.get('color', '')
+        connectivity = price_data.get('connectivity', '')
+        product_code = price_data.get('product_code', '')
+        country = price_data.get('country', '')
+        price = price_data.get('price', 0)
+        source = price_data.get('source', '')
+
+        if not price or price <= 0:
+            logger.warning(f"Некорректная цена для iPad: {price_data}")
+            return None
+
+        # Исправляем неправильные данные от GPT
+        if generation and ' ' in generation:
+            # Если generation содержит пробелы (например "Air 11", "Pro 13"), исправляем
+            parts = generation.split()
+            if len(parts) >= 2:
+                if parts[0] in ['Air', 'Pro', 'Mini']:
+                    variant = parts[0]
+                    size = parts[1]
+                    generation = parts[2] if len(parts) > 2 else ''
+                else:
+                    generation = parts[0]
+                    if len(parts) > 1:
+                        size = parts[1]
+        
+        # Дополнительная проверка для исправления неправильных данных
+        if generation and generation in ['Air', 'Pro', 'Mini']:
+            # Если generation содержит только "Air", "Pro" или "Mini", это неправильно
+            if not variant:
+                variant = generation
+                generation = ''
+        
+        # Исправляем дублирование в generation
+        if generation and ' ' in generation:
+            parts = generation.split()
+            if len(parts) > 1 and parts[0] == parts[1]:
+                generation = parts[0]
+
+        lookup = {
+            'generation': generation,
+            'variant': variant,
+            'size': size,
+            'storage': storage,
+            'color': color,
+            'connectivity': connectivity,
+            'country': country,
+        }
+        defaults = {
+            'product_code': product_code,
+            'price': Decimal(price),
+            'source': source
+        }
+        return lookup, defaults
+
+    @db_write
     def save_ipad_price(self, price_data: Dict[str, Any]) -> Optional[iPad]:
         """Сохраняет цену iPad"""
         try:
-            # Извлекаем данные из price_data
-            generation = price_data.get('generation', '')
-            variant = price_data.get('variant', '')
-            size = price_data.get('size', '')
-            storage = price_data.get('storage', '')
-            color = price_data.get('color', '')
-            connectivity = price_data.get('connectivity', '')
-            product_code = price_data.get('product_code', '')
-            country = price_data.get('country', '')
-            price = price_data.get('price', 0)
-            source = price_data.get('source', '')
-
-            if not price or price <= 0:
-                logger.warning(f"Некорректная цена для iPad: {price_data}")
+            row = self._build_ipad_row(price_data)
+            if row is None:
                 return None
 
-            # Исправляем неправильные данные от GPT
-            if generation and ' ' in generation:
-                # Если generation содержит пробелы (например "Air 11", "Pro 13"), исправляем
-                parts = generation.split()
-                if len(parts) >= 2:
-                    if parts[0] in ['Air', 'Pro', 'Mini']:
-                        variant = parts[0]
-                        size = parts[1]
-                        generation = parts[2] if len(parts) > 2 else ''
-                    else:
-                        generation = parts[0]
-                        if len(parts) > 1:
-                            size = parts[1]
-            
-            # Дополнительная проверка для исправления неправильных данных
-            if generation and generation in ['Air', 'Pro', 'Mini']:
-                # Если generation содержит только "Air", "Pro" или "Mini", это неправильно
-                if not variant:
-                    variant = generation
-                    generation = ''
-            
-            # Исправляем дублирование в generation
-            if generation and ' ' in generation:
-                parts = generation.split()
-                if len(parts) > 1 and parts[0] == parts[1]:
-                    generation = parts[0]
-
             # Создаем или обновляем запись
-            ipad, created = iPad.objects.update_or_create(
-                generation=generation,
-                variant=variant,
-                size=size,
-                storage=storage,
-                color=color,
-                connectivity=connectivity,
-                country=country,
-                defaults={
-                    'product_code': product_code,
-                    'price': Decimal(price),
-                    'source': source
-                }
-            )
+            lookup, defaults = row
+            ipad, created = iPad.objects.update_or_create(**lookup, defaults=defaults)
 
             if created:
-                logger.info(f"Создан новый iPad: {ipad.full_name} - {price}₽")
+                logger.info(f"Создан новый iPad: {ipad.full_name} - {defaults['price']}₽")
             else:
-                logger.info(f"Обновлен iPad: {ipad.full_name} - {price}₽")
+                logger.info(f"Обновлен iPad: {ipad.full_name} - {defaults['price']}₽")
 
             return ipad
 
@@ -94,8 +110,7 @@ class iPadServiceSimple:
             logger.error(f"Ошибка сохранения iPad: {e}")
             return None
 
-    @sync_to_async
-    def parse_and_save_prices(self, text: str, source: str = "") -> Dict[str, int]:
+    async def parse_and_save_prices(self, text: str, source: str = "") -> Dict[str, int]:
         """Парсит и сохраняет цены iPad из текста"""
         try:
             from parsers.ipad_parser import iPadParser
@@ -104,17 +119,11 @@ class iPadServiceSimple:
             parser = iPadParser()
             parsed_data, unparsed_lines = parser.parse_lines(lines)
             
-            saved_count = 0
-            for data in parsed_data:
-                price_data = data.to_dict()
-                price_data['source'] = source
-                result = self.save_ipad_price(price_data)
-                if result:
-                    saved_count += 1
+            save_result = await self.save_parsed_prices(parsed_data, source)
             
             return {
                 'parsed': len(parsed_data),
-                'saved': saved_count,
+                'saved': save_result['total_saved'],
                 'unparsed': len(unparsed_lines)
             }
             
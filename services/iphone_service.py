@@ -4,14 +4,12 @@
 import logging
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
 
 # Настройка Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.iphone_models import (
     IPhoneGeneration, IPhoneVariant, IPhoneStorage, 
@@ -27,7 +25,7 @@ class IPhoneService:
     def __init__(self):
         pass  # Инициализация будет вызвана асинхронно
     
-    @sync_to_async
+    @db_write
     def _init_default_data(self):
         """Инициализирует базовые данные"""
         # Поколения
@@ -159,7 +157,7 @@ class IPhoneService:
             'unparsed_lines': unparsed_lines
         }
     
-    @sync_to_async
+    @db_write
     def _save_iphone_price(self, data: IPhonePriceData, source: str) -> bool:
         """Сохраняет цену iPhone в БД"""
         try:
@@ -243,7 +241,7 @@ class IPhoneService:
         except Exception as e:
             logger.error(f"Ошибка обновления лучшей цены: {e}")
     
-    @sync_to_async
+    @db_read
     def get_catalog_data(self) -> Dict[str, Any]:
         """Получает данные каталога iPhone"""
         try:
@@ -287,7 +285,7 @@ class IPhoneService:
             logger.error(f"Ошибка получения каталога iPhone: {e}")
             return {}
     
-    @sync_to_async
+    @db_write
     def clear_all_data(self) -> int:
         """Очищает все данные iPhone"""
         try:
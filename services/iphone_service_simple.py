@@ -4,17 +4,19 @@
 import logging
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
 
 # Настройка Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import IPhone
 from parsers.iphone_parser import IPhonePriceData, iphone_parser
+from services.bulk_upsert import bulk_upsert_service, build_rows
+from services.catalog_version import catalog_version
+from services.line_dedup import line_dedup
+from services.price_history import price_history_service
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +31,8 @@ class IPhoneServiceSimple:
         parsed_data, unparsed_lines = iphone_parser.parse_lines(lines)
         
         # Сохраняем распарсенные данные
-        saved_count = 0
-        for data in parsed_data:
-            try:
-                if await self._save_iphone_price(data, source):
-                    saved_count += 1
-            except Exception as e:
-                logger.error(f"Ошибка сохранения цены iPhone: {e}")
+        save_result = await self.save_parsed_prices(parsed_data, source)
+        saved_count = save_result['total_saved']
         
         return {
             'template_parsed': len(parsed_data),
@@ -46,23 +43,35 @@ class IPhoneServiceSimple:
             'unparsed_lines': unparsed_lines
         }
     
-    @sync_to_async
+    async def save_parsed_prices(self, items: List[IPhonePriceData], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены iPhone одной пачкой"""
+        rows = build_rows(items, lambda data: self._build_iphone_row(data, source))
+        counts = await bulk_upsert_service.upsert(IPhone, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
+    
+    def _build_iphone_row(self, data: IPhonePriceData, source: str) -> tuple:
+        """Возвращает (ключ, значения) записи iPhone для update_or_create/upsert"""
+        lookup = {
+            'generation': data.generation,
+            'variant': data.variant or None,
+            'storage': data.storage,
+            'color': data.color,
+            'country': data.country_flag,
+            'country_code': data.country_code or None,
+        }
+        defaults = {
+            'price': Decimal(data.price),
+            'source': source
+        }
+        return lookup, defaults
+    
+    @db_write
     def _save_iphone_price(self, data: IPhonePriceData, source: str) -> bool:
         """Сохраняет цену iPhone в БД"""
         try:
             # Создаем или обновляем iPhone запись
-            iphone, created = IPhone.objects.update_or_create(
-                generation=data.generation,
-                variant=data.variant or None,
-                storage=data.storage,
-                color=data.color,
-                country=data.country_flag,
-                country_code=data.country_code or None,
-                defaults={
-                    'price': Decimal(data.price),
-                    'source': source
-                }
-            )
+            lookup, defaults = self._build_iphone_row(data, source)
+            iphone, created = IPhone.objects.update_or_create(**lookup, defaults=defaults)
             
             if created:
                 logger.info(f"Создана новая цена iPhone: {iphone}")
@@ -75,7 +84,7 @@ class IPhoneServiceSimple:
             logger.error(f"Ошибка сохранения iPhone цены: {e}")
             return False
     
-    @sync_to_async
+    @db_read
     def get_catalog_data(self) -> Dict[str, Any]:
         """Получает данные каталога iPhone по поколениям"""
         try:
@@ -86,7 +95,7 @@ class IPhoneServiceSimple:
             
             for generation in generations:
                 # Получаем все iPhone этого поколения
-                iphones = IPhone.objects.filter(generation=generation).order_by('variant', 'storage', 'color', 'country')
+                iphones = IPhone.objects.with_display_price().filter(generation=generation).order_by('variant', 'storage', 'color', 'country')
                 
                 generation_data = []
                 for iphone in iphones:
@@ -110,12 +119,15 @@ class IPhoneServiceSimple:
             logger.error(f"Ошибка получения каталога iPhone: {e}")
             return {}
     
-    @sync_to_async
+    @db_write
     def clear_all_data(self) -> int:
         """Очищает все данные iPhone"""
         try:
             count = IPhone.objects.count()
             IPhone.objects.all().delete()
+            price_history_service.clear_latest_sync(['IPhone'])
+            catalog_version.bump("очистка iPhone")
+            line_dedup.invalidate_sync("очистка iPhone")
             logger.info(f"Очищены данные iPhone: {count} записей")
             return count
         except Exception as e:
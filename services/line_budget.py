@@ -0,0 +1,79 @@
+"""
+Бюджет времени на разбор одной строки прайса
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Any, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# Сколько может разбираться одна строка и после скольких превышений
+# разбор сообщения останавливается (обычная строка разбирается за десятки микросекунд)
+LINE_BUDGET_MS = float(os.getenv("PARSER_LINE_BUDGET_MS", "50"))
+MAX_OVERRUNS = int(os.getenv("PARSER_MAX_OVERRUNS", "10"))
+
+# Разбирает одну строку: (номер строки в блоке, строка) -> (распознанные, нераспознанные)
+LineParseFunc = Callable[[int, str], Tuple[List[Any], List[str]]]
+
+
+@dataclass
+class Overrun:
+    """Строка, разбор которой превысил бюджет"""
+    device_type: str
+    line: str
+    elapsed_ms: float
+
+
+class LineBudget:
+    """
+    Учет времени разбора строк одного сообщения.
+
+    Каждая строка парсится отдельно и замеряется; строки дольше budget_ms
+    попадают в overruns и в лог. После max_overruns превышений бюджет
+    исчерпан: оставшиеся строки сообщения возвращаются нераспознанными без
+    разбора, чтобы вставленный текст с тяжелыми для шаблонов строками не
+    занимал поток парсинга, нужный сообщениям других пользователей.
+    """
+
+    def __init__(self, budget_ms: float = LINE_BUDGET_MS, max_overruns: int = MAX_OVERRUNS):
+        self.budget_ms = budget_ms
+        self.max_overruns = max_overruns
+        self.overruns: List[Overrun] = []
+
+    @property
+    def exhausted(self) -> bool:
+        return len(self.overruns) >= self.max_overruns
+
+    def parse_lines(self, device_type: str, parse_line: LineParseFunc,
+                    lines: List[str]) -> Tuple[List[Any], List[str]]:
+        """Парсит строки по одной с замером времени каждой"""
+        parsed_data = []
+        unparsed_lines = []
+
+        for index, line in enumerate(lines):
+            if self.exhausted:
+                unparsed_lines.extend(lines[index:])
+                break
+
+            start = time.perf_counter()
+            line_parsed, line_unparsed = parse_line(index, line)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            parsed_data.extend(line_parsed)
+            unparsed_lines.extend(line_unparsed)
+            if elapsed_ms > self.budget_ms:
+                self._add_overrun(device_type, line, elapsed_ms)
+
+        return parsed_data, unparsed_lines
+
+    def _add_overrun(self, device_type: str, line: str, elapsed_ms: float):
+        self.overruns.append(Overrun(device_type, line, elapsed_ms))
+        logger.warning(
+            f"⏱️ Строка {device_type} разбиралась {elapsed_ms:.1f} мс (бюджет {self.budget_ms:.0f} мс, "
+            f"{len(line)} символов): {line[:80]!r}"
+        )
+        if self.exhausted:
+            logger.warning(f"⛔ Бюджет разбора исчерпан: {len(self.overruns)} медленных строк, "
+                           f"остальные строки сообщения пропускаются")
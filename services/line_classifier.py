@@ -0,0 +1,130 @@
+"""
+Однопроходный классификатор строк прайса по типам устройств
+"""
+import os
+import re
+import logging
+from typing import List, Dict, Any, Tuple, Set
+
+from parsers.line_features import get_line_features
+
+logger = logging.getLogger(__name__)
+
+EXCLUDE_WORDS = ['гарантия', 'активаций', 'adapter', 'от 10 шт']
+
+# Строки длиннее не бывают ценами (в прайсах до ~120 символов); на таких строках
+# ленивые группы шаблонов парсеров перебираются долго, поэтому они отсекаются сразу
+MAX_LINE_LENGTH = int(os.getenv("PARSER_MAX_LINE_LENGTH", "300"))
+
+# Признаки iPhone/MacBook для разделения пересекающихся ключевых слов (pro, air, max)
+IPHONE_LINE_RE = re.compile(
+    r'\b(13|14|15|16)\s+(128|256|512|1tb)\s+'
+    r'|\b(13|14|15|16)\s+(plus|pro|max)\s+'
+    r'|\b(13|14|15|16)\s+(black|white|blue|green|pink|starlight|midnight|natural|desert|ultramarine|teal)\s+'
+    r'|\b(13|14|15|16)e\s+'
+    r'|iphone\s+'
+)
+MACBOOK_LINE_RE = re.compile(r'macbook\s+|\bm[1-4]\s+|\b(air|pro)\s+')
+IPHONE_FLAG_HINTS = ['iphone', '13', '14', '15', '16', 'pro', 'plus', 'max']
+
+
+class LineClassifier:
+    """
+    Распределяет строки по парсерам за один проход.
+
+    Все ключевые слова устройств собираются в один regex с lookahead, поэтому
+    строка приводится к нижнему регистру и сканируется один раз, а найденные
+    ключевые слова через индекс сразу дают список кандидатов. Результат для
+    каждого устройства совпадает со старой фильтрацией по ключевым словам.
+    Строки длиннее max_line_length не получают кандидатов и до парсеров не доходят.
+    """
+
+    def __init__(self, device_parsers: Dict[str, Dict[str, Any]], max_line_length: int = MAX_LINE_LENGTH):
+        self.max_line_length = max_line_length
+        # Порядок кандидатов определяется приоритетом парсера
+        self.device_order = [
+            device_type for device_type, _ in
+            sorted(device_parsers.items(), key=lambda x: x[1].get('priority', 999))
+        ]
+        self.keyword_index = self._build_keyword_index(device_parsers)
+        # Длинные ключевые слова первыми: в каждой позиции находим самое длинное совпадение
+        keywords = sorted(self.keyword_index, key=len, reverse=True)
+        self.keyword_re = re.compile('(?=(' + '|'.join(re.escape(k) for k in keywords) + '))')
+
+    def _build_keyword_index(self, device_parsers: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+        """Строит индекс: ключевое слово -> устройства"""
+        owners: Dict[str, Set[str]] = {}
+        for device_type, parser_info in device_parsers.items():
+            for keyword in parser_info['keywords']:
+                owners.setdefault(keyword, set()).add(device_type)
+
+        # Если в позиции совпало длинное слово, то совпали и все его префиксы
+        # ('airpods' -> 'air', 'mini m2' -> 'mini'), поэтому добавляем их устройства
+        index = {}
+        for keyword in owners:
+            devices = set()
+            for other, other_devices in owners.items():
+                if keyword.startswith(other):
+                    devices |= other_devices
+            index[keyword] = devices
+        return index
+
+    def candidates(self, line: str) -> List[str]:
+        """Возвращает устройства-кандидаты для строки в порядке приоритета"""
+        if self.is_too_long(line):
+            return []
+
+        features = get_line_features(line)
+        if not features.has_price_digits:
+            return []
+
+        line_lower = features.lower
+        if any(word in line_lower for word in EXCLUDE_WORDS):
+            return []
+
+        devices = set()
+        for match in self.keyword_re.finditer(line_lower):
+            devices |= self.keyword_index[match.group(1)]
+
+        # Для строк с флагами проверяем наличие устройства более строго
+        if features.has_flag:
+            if 'ipad' in line_lower:
+                devices.add('ipad')
+            if any(k in line_lower for k in IPHONE_FLAG_HINTS):
+                devices.add('iphone')
+            if 'macbook' in line_lower:
+                devices.add('macbook')
+
+        # MacBook: исключаем iPhone строки и требуем признаки MacBook
+        if 'macbook' in devices:
+            if IPHONE_LINE_RE.search(line_lower) or not MACBOOK_LINE_RE.search(line_lower):
+                devices.discard('macbook')
+
+        return [device_type for device_type in self.device_order if device_type in devices]
+
+    def is_too_long(self, line: str) -> bool:
+        return len(line) > self.max_line_length
+
+    def classify(self, lines: List[str],
+                 known_candidates: Dict[str, List[str]] = None) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """
+        Классифицирует строки сообщения
+
+        Args:
+            known_candidates: уже известные кандидаты строк (например, из прошлой загрузки)
+
+        Returns:
+            Tuple[строки по устройствам в исходном порядке, кандидаты для каждой строки]
+        """
+        routed: Dict[str, List[str]] = {device_type: [] for device_type in self.device_order}
+        line_candidates: Dict[str, List[str]] = dict(known_candidates or {})
+
+        for line in lines:
+            devices = line_candidates.get(line)
+            if devices is None:
+                devices = self.candidates(line)
+                line_candidates[line] = devices
+            for device_type in devices:
+                routed[device_type].append(line)
+
+        return routed, line_candidates
@@ -0,0 +1,153 @@
+"""
+Пропуск строк прайса, не изменившихся с прошлой загрузки того же источника
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Имя строки DataVersion с поколением сохраненных строк: увеличивается при
+# удалении записей устройств в любом процессе (очистка базы, админка)
+LINE_DEDUP_VERSION_NAME = 'line_dedup'
+
+
+def line_hash(line: str) -> str:
+    """Хэш нормализованной строки (без учета пробелов по краям и их количества)"""
+    normalized = ' '.join(line.split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class LineDedup:
+    """
+    Строки последней успешной загрузки по каждому источнику.
+
+    Для каждой строки хранится хэш, устройства-кандидаты классификатора и
+    предложения (код устройства, pk), которые строка сохранила, поэтому
+    повторенная строка не проходит ни классификатор, ни шаблоны, ни
+    сохранение. Цена в таблице устройства общая для всех источников:
+    повтор строки без изменений не перезаписывает цену, которую между
+    загрузками поменял другой источник, а из нескольких строк одного
+    товара в сообщении действует последняя измененная. Предложения
+    источника (LatestPrice) при этом подтверждаются по сохраненным
+    pk (PriceHistoryService.refresh), иначе неизменный прайс устаревал бы
+    в индексе лучших цен.
+
+    Строки живут в памяти процесса, а записи удаляют и другие процессы
+    (очистка базы в боте, админка). Поэтому строки привязаны к поколению
+    из DataVersion: удаление увеличивает его (invalidate_sync), и процесс,
+    прочитавший новое поколение перед разбором (check_generation), забывает
+    все строки - иначе повтор строки удаленной записи пропускался бы, и
+    запись не появилась бы снова.
+    """
+
+    def __init__(self, max_sources: int = 1000):
+        self.max_sources = max_sources
+        # Поколение, при котором запомнены строки (None - еще не прочитано)
+        self._generation: Optional[int] = None
+        # Источник -> {хэш строки: (кандидаты, предложения)}
+        self._sources: "OrderedDict[str, Dict[str, Tuple[Tuple[str, ...], Tuple[Tuple[int, int], ...]]]]" = OrderedDict()
+
+    def generation_sync(self) -> int:
+        """Поколение сохраненных строк из базы"""
+        from db_app.models import DataVersion
+
+        return DataVersion.objects.filter(name=LINE_DEDUP_VERSION_NAME).values_list('value', flat=True).first() or 0
+
+    def check_generation(self, generation: Optional[int]) -> bool:
+        """
+        Сверяет поколение перед разбором прайса, возвращает, можно ли пропускать строки
+
+        Если записи удалялись (поколение сменилось), все строки забываются.
+        None - поколение прочитать не удалось: строки не пропускаются.
+        """
+        if generation is None:
+            return False
+        if generation != self._generation:
+            if self._sources:
+                logger.info(f"Записи устройств удалялись (поколение {generation}): сохраненные строки сброшены")
+            self._sources.clear()
+            self._generation = generation
+        return True
+
+    def invalidate_sync(self, reason: str = ""):
+        """
+        Сбрасывает строки во всех процессах (вызывается в транзакции удаления записей)
+
+        Поколение увеличивается в той же транзакции, поэтому процесс, прочитавший
+        новое поколение, видит и удаление.
+        """
+        from django.db.models import F
+        from db_app.models import DataVersion
+
+        versions = DataVersion.objects.filter(name=LINE_DEDUP_VERSION_NAME)
+        if not versions.update(value=F('value') + 1):
+            DataVersion.objects.get_or_create(name=LINE_DEDUP_VERSION_NAME)
+            versions.update(value=F('value') + 1)
+        self.reset()
+        logger.debug(f"Новое поколение сохраненных строк: {reason}")
+
+    def known_candidates(self, source: str, lines: List[str]) -> Dict[str, List[str]]:
+        """Кандидаты для строк, которые были в прошлой загрузке источника"""
+        seen = self._sources.get(source)
+        if not source or not seen:
+            return {}
+
+        known = {}
+        for line in lines:
+            entry = seen.get(line_hash(line))
+            if entry is not None:
+                known[line] = list(entry[0])
+        return known
+
+    def known_offers(self, source: str, lines: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """Предложения [(код устройства, pk)], сохраненные строками прошлой загрузки источника"""
+        seen = self._sources.get(source)
+        if not source or not seen:
+            return {}
+
+        known = {}
+        for line in lines:
+            entry = seen.get(line_hash(line))
+            if entry is not None:
+                known[line] = list(entry[1])
+        return known
+
+    def remember(self, source: str, line_candidates: Dict[str, List[str]],
+                 line_offers: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+                 generation: Optional[int] = None):
+        """
+        Запоминает строки загрузки (вызывается после успешного сохранения).
+
+        Передаются только распознанные и сохраненные строки: нераспознанные
+        при повторе прайса снова разбираются и попадают в отчет. line_offers -
+        предложения строк {строка без пробелов по краям: [(код устройства, pk)]}.
+        generation - поколение, прочитанное перед разбором: если за время разбора
+        записи удалялись, строки не запоминаются.
+        """
+        if not source or generation is None or generation != self._generation:
+            self.forget(source)
+            return
+        line_offers = line_offers or {}
+        self._sources[source] = {
+            line_hash(line): (tuple(candidates), tuple(line_offers.get(line.strip(), ())))
+            for line, candidates in line_candidates.items()
+            if line.strip()
+        }
+        self._sources.move_to_end(source)
+        while len(self._sources) > self.max_sources:
+            self._sources.popitem(last=False)
+
+    def forget(self, source: str):
+        """Следующая загрузка источника будет обработана полностью"""
+        self._sources.pop(source, None)
+
+    def reset(self):
+        """Сбрасывает все источники (например, после очистки базы)"""
+        self._sources.clear()
+        logger.info("Сброшены сохраненные строки прайсов")
+
+
+# Создаем глобальный экземпляр
+line_dedup = LineDedup()
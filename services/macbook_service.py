@@ -4,13 +4,11 @@
 import logging
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import Product, Markup
 
@@ -20,7 +18,7 @@ class MacBookService:
     def __init__(self):
         pass
 
-    @sync_to_async
+    @db_write
     def save_macbook_price(self, price_data: Dict[str, Any]) -> Optional[Product]:
         """Сохраняет цену MacBook"""
         try:
@@ -61,7 +59,7 @@ class MacBookService:
             logger.error(f"Ошибка сохранения MacBook: {e}")
             return None
 
-    @sync_to_async
+    @db_read
     def get_macbook_catalog(self) -> Dict[str, Any]:
         """Получает каталог MacBook"""
         try:
@@ -4,15 +4,15 @@
 import logging
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
-import os
-import django
+from db_app.django_setup import setup_django
 from django.conf import settings
-from asgiref.sync import sync_to_async
+from services.db_gateway import db_read, db_write
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
-django.setup()
+setup_django()
 
 from db_app.models import MacBook, Markup
+from parsers.macbook_parser import MacBookPrice
+from services.bulk_upsert import bulk_upsert_service, build_rows
 
 logger = logging.getLogger(__name__)
 
@@ -20,99 +20,115 @@ class MacBookServiceSimple:
     def __init__(self):
         pass
 
-    @sync_to_async
+    async def save_parsed_prices(self, items: List[MacBookPrice], source: str = "") -> Dict[str, Any]:
+        """Сохраняет уже распарсенные цены MacBook одной пачкой"""
+        rows = build_rows(items, lambda data: self._build_macbook_row({**data.to_dict(), 'source': source}))
+        counts = await bulk_upsert_service.upsert(MacBook, rows, source)
+        return bulk_upsert_service.save_result(len(items), counts)
+
+    def _build_macbook_row(self, price_data: Dict[str, Any]) -> Optional[tuple]:
+        """Нормализует данные MacBook и возвращает (ключ, значения) для update_or_create/upsert"""
+        # Извлекаем данные из price_data
+        generation = price_data.get('generation', '')
+        variant = price_data.get('variant', '')
+        size = price_data.get('size', '')
+        memory = price_data.get('memory', '')
+        storage = price_data.get('storage', '')
+        color = price_data.get('color', '')
+        configuration = price_data.get('configuration', '')
+        product_code = price_data.get('product_code', '')
+        country = price_data.get('country', '')
+        price = price_data.get('price', 0)
+        source = price_data.get('source', '')
+
+        if not price or price <= 0:
+            logger.warning(f"Некорректная цена для MacBook: {price_data}")
+            return None
+
+        # Исправляем неправильные данные от GPT
+        if generation and ' ' in generation:
+            # Если generation содержит пробелы (например "Air 13", "Pro 14"), исправляем
+            parts = generation.split()
+            if len(parts) >= 2:
+                if parts[0] in ['Air', 'Pro']:
+                    variant = parts[0]
+                    size = parts[1]
+                    generation = parts[2] if len(parts) > 2 else ''
+                else:
+                    generation = parts[0]
+                    if len(parts) > 1:
+                        size = parts[1]
+        
+        # Дополнительная проверка для исправления неправильных данных
+        if generation and generation in ['Air', 'Pro']:
+            # Если generation содержит только "Air" или "Pro", это неправильно
+            if not variant:
+                variant = generation
+                generation = ''
+        
+        # Исправляем дублирование в generation
+        if generation and ' ' in generation:
+            parts = generation.split()
+            if len(parts) > 1 and parts[0] == parts[1]:
+                generation = parts[0]
+
+        # Парсим конфигурацию для извлечения memory, storage, color
+        if configuration:
+            memory_parsed, storage_parsed, color_parsed = self._parse_configuration(configuration)
+            memory = memory or memory_parsed
+            storage = storage or storage_parsed
+            color = color or color_parsed
+
+        # Исправляем дублирование памяти
+        if memory and ' ' in memory:
+            # Если memory содержит пробелы, берем только первое значение
+            memory_parts = memory.split()
+            if len(memory_parts) > 1 and memory_parts[0] == memory_parts[1]:
+                memory = memory_parts[0]
+
+        # Исправляем дублирование storage
+        if storage and ' ' in storage:
+            # Если storage содержит пробелы, берем только первое значение
+            storage_parts = storage.split()
+            if len(storage_parts) > 1 and storage_parts[0] == storage_parts[1]:
+                storage = storage_parts[0]
+        
+        # Если размер не указан, извлекаем из generation
+        if not size:
+            size = self._extract_size(generation)
+
+        lookup = {
+            'generation': generation,
+            'variant': variant,
+            'size': size,
+            'memory': memory,
+            'storage': storage,
+            'color': color,
+            'country': country,
+        }
+        defaults = {
+            'product_code': product_code,
+            'price': Decimal(price),
+            'source': source
+        }
+        return lookup, defaults
+
+    @db_write
     def save_macbook_price(self, price_data: Dict[str, Any]) -> Optional[MacBook]:
         """Сохраняет цену MacBook"""
         try:
-            # Извлекаем данные из price_data
-            generation = price_data.get('generation', '')
-            variant = price_data.get('variant', '')
-            size = price_data.get('size', '')
-            memory = price_data.get('memory', '')
-            storage = price_data.get('storage', '')
-            color = price_data.get('color', '')
-            configuration = price_data.get('configuration', '')
-            product_code = price_data.get('product_code', '')
-            country = price_data.get('country', '')
-            price = price_data.get('price', 0)
-            source = price_data.get('source', '')
-
-            if not price or price <= 0:
-                logger.warning(f"Некорректная цена для MacBook: {price_data}")
+            row = self._build_macbook_row(price_data)
+            if row is None:
                 return None
 
-            # Исправляем неправильные данные от GPT
-            if generation and ' ' in generation:
-                # Если generation содержит пробелы (например "Air 13", "Pro 14"), исправляем
-                parts = generation.split()
-                if len(parts) >= 2:
-                    if parts[0] in ['Air', 'Pro']:
-                        variant = parts[0]
-                        size = parts[1]
-                        generation = parts[2] if len(parts) > 2 else ''
-                    else:
-                        generation = parts[0]
-                        if len(parts) > 1:
-                            size = parts[1]
-            
-            # Дополнительная проверка для исправления неправильных данных
-            if generation and generation in ['Air', 'Pro']:
-                # Если generation содержит только "Air" или "Pro", это неправильно
-                if not variant:
-                    variant = generation
-                    generation = ''
-            
-            # Исправляем дублирование в generation
-            if generation and ' ' in generation:
-                parts = generation.split()
-                if len(parts) > 1 and parts[0] == parts[1]:
-                    generation = parts[0]
-
-            # Парсим конфигурацию для извлечения memory, storage, color
-            if configuration:
-                memory_parsed, storage_parsed, color_parsed = self._parse_configuration(configuration)
-                memory = memory or memory_parsed
-                storage = storage or storage_parsed
-                color = color or color_parsed
-
-            # Исправляем дублирование памяти
-            if memory and ' ' in memory:
-                # Если memory содержит пробелы, берем только первое значение
-                memory_parts = memory.split()
-                if len(memory_parts) > 1 and memory_parts[0] == memory_parts[1]:
-                    memory = memory_parts[0]
-
-            # Исправляем дублирование storage
-            if storage and ' ' in storage:
-                # Если storage содержит пробелы, берем только первое значение
-                storage_parts = storage.split()
-                if len(storage_parts) > 1 and storage_parts[0] == storage_parts[1]:
-                    storage = storage_parts[0]
-            
-            # Если размер не указан, извлекаем из generation
-            if not size:
-                size = self._extract_size(generation)
-
             # Создаем или обновляем запись
-            macbook, created = MacBook.objects.update_or_create(
-                generation=generation,
-                variant=variant,
-                size=size,
-                memory=memory,
-                storage=storage,
-                color=color,
-                country=country,
-                defaults={
-                    'product_code': product_code,
-                    'price': Decimal(price),
-                    'source': source
-                }
-            )
+            lookup, defaults = row
+            macbook, created = MacBook.objects.update_or_create(**lookup, defaults=defaults)
 
             if created:
-                logger.info(f"Создан новый MacBook: {macbook.full_name} - {price}₽")
+                logger.info(f"Создан новый MacBook: {macbook.full_name} - {defaults['price']}₽")
             else:
-                logger.info(f"Обновлен MacBook: {macbook.full_name} - {price}₽")
+                logger.info(f"Обновлен MacBook: {macbook.full_name} - {defaults['price']}₽")
 
             return macbook
 
@@ -146,12 +162,12 @@ class MacBookServiceSimple:
         size_match = re.search(r'(\d+)(?:\s|$)', generation)
         return size_match.group(1) if size_match else None
 
-    @sync_to_async
+    @db_read
     def get_macbook_catalog(self) -> List[Dict[str, Any]]:
         """Получает каталог MacBook как список"""
         try:
             # Получаем все MacBook
-            macbooks = MacBook.objects.all().order_by('generation', 'variant', 'size', 'memory', 'storage', 'color', 'country')
+            macbooks = MacBook.objects.with_display_price().order_by('generation', 'variant', 'size', 'memory', 'storage', 'color', 'country')
             
             macbook_list = []
             for macbook in macbooks:
@@ -0,0 +1,133 @@
+"""
+Параллельный парсинг больших прайсов: строки делятся на шарды и парсятся в пуле процессов
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Mapping
+
+logger = logging.getLogger(__name__)
+
+# Число процессов парсинга (0 - параллельный режим выключен) и минимальный размер
+# блока строк устройства, начиная с которого он делится на шарды
+PARSER_PROCESSES = int(os.getenv("PARSER_PROCESSES", "0"))
+PARALLEL_MIN_LINES = int(os.getenv("PARSER_PARALLEL_MIN_LINES", "500"))
+
+# Сколько сообщений одновременно парсится вне event loop бота (остальные ждут в очереди)
+PARSER_THREADS = int(os.getenv("PARSER_THREADS", "2"))
+
+# Парсеры процесса пула (заполняются один раз при запуске процесса)
+_worker_parsers: Dict[str, Any] = {}
+
+
+def _init_worker(parsers: Dict[str, Any]):
+    """Инициализация процесса пула: парсеры с уже скомпилированными шаблонами"""
+    global _worker_parsers
+    _worker_parsers = parsers
+
+
+def _warm_up() -> int:
+    """Пустая задача, чтобы пул запустил процессы заранее"""
+    return os.getpid()
+
+
+def _parse_shard(device_type: str, lines: List[str]) -> Tuple[List[Any], List[str]]:
+    """Парсит шард строк в процессе пула"""
+    return _worker_parsers[device_type].parse_lines(lines)
+
+
+class ParallelLineParser:
+    """
+    Пул процессов для парсинга строк одного устройства шардами.
+
+    Процессы запускаются один раз при первом большом сообщении и живут
+    до shutdown: парсеры передаются в каждый процесс при его запуске, поэтому
+    шаблоны не компилируются заново на каждое сообщение. Блок строк делится
+    на непрерывные шарды, результаты склеиваются в порядке шардов - порядок
+    распознанных и нераспознанных строк совпадает с последовательным парсингом.
+    Сохранение остается в вызывающем процессе.
+
+    Годится только для парсеров, разбирающих каждую строку независимо;
+    парсеры с контекстом секций вызываются как раньше.
+    """
+
+    def __init__(self, parsers: Mapping[str, Any], processes: int = PARSER_PROCESSES,
+                 min_lines: int = PARALLEL_MIN_LINES):
+        self.parsers = parsers
+        self.processes = processes
+        self.min_lines = min_lines
+        self._executor = None
+        self._starting = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def should_parallelize(self, line_count: int) -> bool:
+        """Стоит ли делить блок строк на шарды (мелкие блоки быстрее разобрать на месте)"""
+        return self.enabled and line_count >= self.min_lines
+
+    async def start(self):
+        """Запускает процессы пула, не блокируя event loop (повторный вызов ничего не делает)"""
+        async with self._starting:
+            if self._executor is not None:
+                return
+            loop = asyncio.get_running_loop()
+            # Ленивые парсеры загружаются в потоке: первый запуск импортирует их модули
+            parsers = await loop.run_in_executor(None, dict, self.parsers)
+            # В боте уже работают потоки (парсинг, DatabaseGateway): fork скопировал бы
+            # их блокировки, поэтому процессы запускаются через forkserver (или spawn)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_init_worker,
+                initargs=(parsers,)
+            )
+            await asyncio.gather(*[loop.run_in_executor(self._executor, _warm_up) for _ in range(self.processes)])
+            logger.info(f"Запущен пул парсинга: {self.processes} процессов ({method})")
+
+    def shutdown(self, wait: bool = True):
+        """
+        Останавливает процессы пула
+
+        Из event loop вызывается с wait=False: ожидающие шарды отменяются,
+        а процессы завершаются в фоне, не останавливая loop.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def split(self, lines: List[str]) -> List[List[str]]:
+        """Делит строки на непрерывные шарды по числу процессов"""
+        shard_size = -(-len(lines) // self.processes)
+        return [lines[i:i + shard_size] for i in range(0, len(lines), shard_size)]
+
+    async def parse_lines(self, device_type: str, lines: List[str]) -> Optional[Tuple[List[Any], List[str]]]:
+        """
+        Парсит строки устройства шардами в пуле процессов
+
+        Returns:
+            Tuple[распознанные, нераспознанные] в исходном порядке строк или None при
+            ошибке пула: тогда строки разбирает вызывающий код в своем потоке парсинга
+        """
+        try:
+            await self.start()
+            loop = asyncio.get_running_loop()
+            shard_results = await asyncio.gather(*[
+                loop.run_in_executor(self._executor, _parse_shard, device_type, shard)
+                for shard in self.split(lines)
+            ])
+        except Exception as e:
+            logger.error(f"Ошибка параллельного парсинга {device_type}: {e}")
+            # Сломанный пул пересоздается при следующем сообщении
+            self.shutdown(wait=False)
+            return None
+
+        parsed, unparsed = [], []
+        for shard_parsed, shard_unparsed in shard_results:
+            parsed.extend(shard_parsed)
+            unparsed.extend(shard_unparsed)
+        return parsed, unparsed
@@ -0,0 +1,248 @@
+"""
+Фоновые задачи разбора прайсов с отчетом о ходе работы и отменой
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from services.document_reader import iter_lines, iter_chunks, count_lines
+
+logger = logging.getLogger(__name__)
+
+# Сколько прайсов разбирается одновременно и как часто обновляется сообщение о ходе разбора
+PARSE_JOB_WORKERS = int(os.getenv("PARSE_JOB_WORKERS", "2"))
+PROGRESS_INTERVAL = float(os.getenv("PARSE_PROGRESS_INTERVAL", "2.0"))
+
+# Названия устройств в сообщении о ходе разбора
+DEVICE_NAMES = {
+    'iphone': 'iPhone',
+    'macbook': 'MacBook',
+    'ipad': 'iPad',
+    'apple_watch': 'Apple Watch',
+    'imac': 'iMac',
+    'airpods': 'AirPods',
+    'apple_pencil': 'Apple Pencil'
+}
+
+STAGE_NAMES = {
+    'queued': 'в очереди',
+    'classify': 'классификация',
+    'parse': 'парсинг',
+    'save': 'сохранение',
+    'done': 'готово'
+}
+
+JobCallback = Callable[['ParseJob'], Awaitable[None]]
+
+
+@dataclass
+class ParseJob:
+    """Задача разбора одного прайса"""
+    id: int
+    text: str
+    source: str
+    chat_id: Optional[int] = None
+    document: Optional[str] = None  # Путь к файлу прайса (удаляется после разбора)
+    status: str = 'queued'  # queued, running, done, failed, cancelled
+    stage: str = 'queued'
+    device_type: Optional[str] = None
+    lines_done: int = 0
+    lines_total: int = 0
+    saved: Dict[str, int] = field(default_factory=dict)
+    results: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    on_progress: Optional[JobCallback] = None
+    on_done: Optional[JobCallback] = None
+    task: Optional[asyncio.Task] = None
+    last_report: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def progress_text(self) -> str:
+        """Ход разбора для пользователя: "Парсинг iPad: 1200/4000 строк, iPhone 310 сохранено" """
+        if self.status == 'queued':
+            return "⏳ Прайс в очереди на разбор..."
+
+        stage = STAGE_NAMES.get(self.stage, self.stage).capitalize()
+        if self.device_type:
+            stage += f" {DEVICE_NAMES.get(self.device_type, self.device_type)}"
+        parts = [f"🔄 {stage}: {self.lines_done}/{self.lines_total} строк"]
+        for device_type, count in self.saved.items():
+            parts.append(f"{DEVICE_NAMES.get(device_type, device_type)} {count} сохранено")
+        return ', '.join(parts)
+
+
+class ParseJobQueue:
+    """
+    Очередь фоновых задач разбора прайсов.
+
+    submit ставит прайс в очередь и сразу возвращает задачу, поэтому
+    обработчик сообщения не держит апдейт до конца парсинга и сохранения.
+    Воркеры разбирают задачи через TemplateParser.parse_message, ход разбора
+    передается в on_progress не чаще раза в progress_interval секунд,
+    итог (в том числе ошибка и отмена) - в on_done.
+    """
+
+    def __init__(self, parser=None, workers: int = PARSE_JOB_WORKERS,
+                 progress_interval: float = PROGRESS_INTERVAL, max_finished: int = 100):
+        self.parser = parser
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.max_finished = max_finished
+        self.jobs: Dict[int, ParseJob] = {}
+        self._ids = itertools.count(1)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def _get_parser(self):
+        if self.parser is None:
+            from services.hybrid_parser import template_parser
+            self.parser = template_parser
+        return self.parser
+
+    def start(self):
+        """Запускает воркеры в текущем event loop (повторный вызов ничего не делает)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"parse-job-worker-{number}")
+            for number in range(self.workers)
+        ]
+        logger.info(f"Запущено воркеров разбора прайсов: {self.workers}")
+
+    async def stop(self):
+        """Останавливает воркеры, задачи в работе отменяются"""
+        for job in self.jobs.values():
+            if not job.finished:
+                self.cancel(job.id)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, text: str, source: str, chat_id: Optional[int] = None,
+                     on_progress: Optional[JobCallback] = None,
+                     on_done: Optional[JobCallback] = None) -> ParseJob:
+        """Ставит прайс в очередь и сразу возвращает задачу"""
+        return await self._submit(ParseJob(
+            id=next(self._ids), text=text, source=source, chat_id=chat_id,
+            on_progress=on_progress, on_done=on_done
+        ))
+
+    async def submit_document(self, path: str, source: str, chat_id: Optional[int] = None,
+                              on_progress: Optional[JobCallback] = None,
+                              on_done: Optional[JobCallback] = None) -> ParseJob:
+        """
+        Ставит в очередь прайс из файла (.txt, .csv, .xlsx)
+
+        Файл читается частями по мере разбора и удаляется, когда задача завершится.
+        """
+        return await self._submit(ParseJob(
+            id=next(self._ids), text='', source=source, chat_id=chat_id, document=path,
+            on_progress=on_progress, on_done=on_done
+        ))
+
+    async def _submit(self, job: ParseJob) -> ParseJob:
+        self.start()
+        self.jobs[job.id] = job
+        self._forget_finished()
+        await self._queue.put(job)
+        logger.info(f"Прайс поставлен в очередь: задача {job.id} ({job.source})")
+        return job
+
+    def get(self, job_id: int) -> Optional[ParseJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: int) -> bool:
+        """Отменяет задачу в очереди или в работе, возвращает False для завершенной"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Воркер пропустит задачу, когда дойдет до нее
+            job.status = 'cancelled'
+        logger.info(f"Задача разбора {job_id} отменена")
+        return True
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == 'cancelled':
+                    await self._finish(job)
+                    continue
+                job.status = 'running'
+                job.task = asyncio.create_task(self._parse(job))
+                await asyncio.wait({job.task})
+                if job.task.cancelled():
+                    job.status = 'cancelled'
+                elif job.task.exception() is not None:
+                    job.status = 'failed'
+                    job.error = str(job.task.exception())
+                    logger.error(f"Ошибка разбора прайса (задача {job.id}): {job.error}")
+                else:
+                    job.status = 'done'
+                await self._finish(job)
+            finally:
+                job.task = None
+                job.text = ''
+                if job.document:
+                    Path(job.document).unlink(missing_ok=True)
+                self._queue.task_done()
+
+    async def _parse(self, job: ParseJob):
+        async def progress(state: Dict[str, Any]):
+            job.stage = state['stage']
+            job.device_type = state['device_type']
+            job.lines_done = state['lines_done']
+            job.lines_total = state['lines_total']
+            job.saved = state['saved']
+            await self._notify_progress(job)
+
+        parser = self._get_parser()
+        if job.document:
+            loop = asyncio.get_running_loop()
+            lines_total = await loop.run_in_executor(None, count_lines, job.document)
+            chunks = iter_chunks(iter_lines(job.document))
+            job.results = await parser.parse_stream(chunks, job.source, progress=progress, lines_total=lines_total)
+        else:
+            job.results = await parser.parse_message(job.text, job.source, progress=progress)
+
+    async def _notify_progress(self, job: ParseJob):
+        """Передает ход разбора не чаще раза в progress_interval (итог придет в on_done)"""
+        if job.on_progress is None or job.stage == 'done':
+            return
+        now = time.monotonic()
+        if now - job.last_report < self.progress_interval:
+            return
+        job.last_report = now
+        await job.on_progress(job)
+
+    async def _finish(self, job: ParseJob):
+        if job.on_done is None:
+            return
+        try:
+            await job.on_done(job)
+        except Exception as e:
+            logger.error(f"Ошибка отправки результата разбора (задача {job.id}): {e}")
+
+    def _forget_finished(self):
+        """Хранит только последние max_finished завершенных задач"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+
+# Создаем глобальный экземпляр
+parse_jobs = ParseJobQueue()
@@ -0,0 +1,223 @@
+"""
+История цен устройств: наблюдения только добавляются, последние цены хранятся отдельно
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from services.best_price import best_price_index
+from services.db_gateway import db_read, db_write
+
+logger = logging.getLogger(__name__)
+
+# Код модели устройства в PriceObservation/LatestPrice (не менять: коды уже в базе)
+PRICE_HISTORY_DEVICES = {
+    'IPhone': 1,
+    'MacBook': 2,
+    'iPad': 3,
+    'AppleWatch': 4,
+    'iMac': 5,
+    'AirPods': 6,
+    'ApplePencil': 7,
+}
+
+# Строк в одном INSERT (ограничение числа параметров SQLite)
+HISTORY_BATCH_SIZE = 500
+
+
+def encode_price(price: Any) -> int:
+    """Цена в рублях -> целое число копеек"""
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+def decode_price(value: int) -> Decimal:
+    """Целое число копеек -> цена в рублях"""
+    return Decimal(value) / 100
+
+
+class PriceHistoryService:
+    """
+    Записывает наблюдения цен при каждом сохранении прайса и отдает историю по SKU.
+
+    SKU - строка модели устройства (device, pk), источник - PriceSource.
+    В PriceObservation добавляется строка, только если цена SKU у источника
+    отличается от последней, поэтому история растет с числом изменений, а не
+    с числом повторов прайса. LatestPrice обновляется всегда: там последняя
+    цена и время ее последнего подтверждения для каждой пары SKU + источник.
+    По LatestPrice поддерживается индекс лучших цен (services/best_price.py).
+    """
+
+    def record_sync(self, model, source: str, prices: Dict[int, Any], configs: Dict[int, str],
+                    observed_at: Optional[int] = None) -> Dict[str, int]:
+        """
+        Сохраняет цены {pk: цена} модели от источника; configs - {pk: ключ конфигурации}.
+
+        Вызывается в транзакции сохранения прайса (BulkUpsertService). Возвращает
+        число новых строк истории и конфигураций, у которых сменилась лучшая цена.
+        """
+        from db_app.models import PriceSource, PriceObservation, LatestPrice
+
+        device = PRICE_HISTORY_DEVICES.get(model.__name__)
+        if device is None or not prices:
+            return {'history': 0, 'best': 0}
+
+        source_id = PriceSource.objects.get_or_create(name=source[:200])[0].pk
+        observed_at = observed_at or int(time.time())
+        encoded = {sku_id: encode_price(price) for sku_id, price in prices.items()}
+        config_ids = self._config_ids(device, configs)
+
+        latest = dict(
+            LatestPrice.objects.filter(device=device, source_id=source_id).values_list('sku_id', 'price')
+        )
+        changed = [
+            PriceObservation(device=device, sku_id=sku_id, source_id=source_id,
+                             price=price, observed_at=observed_at)
+            for sku_id, price in encoded.items()
+            if latest.get(sku_id) != price
+        ]
+        PriceObservation.objects.bulk_create(changed, batch_size=HISTORY_BATCH_SIZE)
+
+        LatestPrice.objects.bulk_create([
+            LatestPrice(device=device, sku_id=sku_id, source_id=source_id, config_id=config_ids[sku_id],
+                        price=price, observed_at=observed_at)
+            for sku_id, price in encoded.items()
+        ], batch_size=HISTORY_BATCH_SIZE, update_conflicts=True,
+            unique_fields=['device', 'source_id', 'sku_id'], update_fields=['config_id', 'price', 'observed_at'])
+
+        # Устаревание лучших цен конфигураций прайса проверяется здесь же,
+        # остальных - периодически (BestPriceIndex.expire_periodically)
+        best_changed = best_price_index.update_sync(device, source_id, observed_at, {
+            sku_id: (config_ids[sku_id], price) for sku_id, price in encoded.items()
+        })
+        return {'history': len(changed), 'best': best_changed}
+
+    @db_write
+    def refresh(self, source: str, offers: Iterable[Tuple[int, int]]) -> Optional[int]:
+        """Подтверждает предложения источника, не изменившиеся с прошлой загрузки (None - ошибка)"""
+        try:
+            best_changed = self.refresh_sync(source, offers)
+            if best_changed:
+                from services.catalog_version import catalog_version
+                catalog_version.bump(f"подтверждение цен {source}")
+            return best_changed
+
+        except Exception as e:
+            logger.error(f"Ошибка подтверждения цен {source}: {e}")
+            return None
+
+    def refresh_sync(self, source: str, offers: Iterable[Tuple[int, int]],
+                     observed_at: Optional[int] = None) -> int:
+        """
+        Обновляет время подтверждения предложений [(код устройства, sku_id)] без изменения цен.
+
+        Строки прайса, пропущенные как неизмененные (services/line_dedup.py), не
+        сохраняются заново, но их предложения по-прежнему действуют: без этого
+        они устаревали бы через BEST_PRICE_MAX_AGE_DAYS. История не меняется.
+        Возвращает число конфигураций, у которых сменилась лучшая цена.
+        """
+        from db_app.models import PriceSource, LatestPrice
+
+        source_id = PriceSource.objects.filter(name=source[:200]).values_list('pk', flat=True).first()
+        if source_id is None:
+            return 0
+        observed_at = observed_at or int(time.time())
+
+        by_device: Dict[int, set] = {}
+        for device, sku_id in offers:
+            by_device.setdefault(device, set()).add(sku_id)
+
+        best_changed = 0
+        for device, sku_ids in sorted(by_device.items()):
+            sku_ids = sorted(sku_ids)
+            for index in range(0, len(sku_ids), HISTORY_BATCH_SIZE):
+                latest = LatestPrice.objects.filter(device=device, source_id=source_id,
+                                                    sku_id__in=sku_ids[index:index + HISTORY_BATCH_SIZE])
+                latest.update(observed_at=observed_at)
+                best_changed += best_price_index.update_sync(device, source_id, observed_at, {
+                    sku_id: (config_id, price) for sku_id, config_id, price in latest.values_list('sku_id', 'config_id', 'price')
+                })
+        return best_changed
+
+    def clear_latest_sync(self, model_names: List[str]):
+        """Удаляет последние и лучшие цены моделей при очистке их таблиц (история остается)"""
+        best_price_index.clear_sync(PRICE_HISTORY_DEVICES[name] for name in model_names)
+
+    def remove_latest_sync(self, model_name: str, sku_ids: List[int]) -> int:
+        """Удаляет предложения записей модели при их удалении, возвращает число смененных лучших цен"""
+        return best_price_index.remove_sync(PRICE_HISTORY_DEVICES[model_name], sku_ids)
+
+    def _config_ids(self, device: int, configs: Dict[int, str]) -> Dict[int, int]:
+        """{pk: id конфигурации}; читаются только ключи прайса, новые добавляются одним запросом"""
+        from db_app.models import PriceConfig
+
+        keys = sorted({key[:200] for key in configs.values()})
+        ids = self._load_config_ids(device, keys)
+        new_keys = [key for key in keys if key not in ids]
+        if new_keys:
+            PriceConfig.objects.bulk_create([PriceConfig(device=device, key=key) for key in new_keys],
+                                            batch_size=HISTORY_BATCH_SIZE)
+            # pk новых конфигураций читаются заново: без RETURNING (SQLite до 3.35) bulk_create их не возвращает
+            ids.update(self._load_config_ids(device, new_keys))
+        return {sku_id: ids[key[:200]] for sku_id, key in configs.items()}
+
+    def _load_config_ids(self, device: int, keys: List[str]) -> Dict[str, int]:
+        """{ключ конфигурации: id} для существующих ключей"""
+        from db_app.models import PriceConfig
+
+        ids = {}
+        for index in range(0, len(keys), HISTORY_BATCH_SIZE):
+            ids.update(PriceConfig.objects.filter(device=device, key__in=keys[index:index + HISTORY_BATCH_SIZE])
+                       .values_list('key', 'pk'))
+        return ids
+
+    @db_read
+    def get_history(self, model_name: str, sku_id: int, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """История цен SKU по всем источникам в порядке времени"""
+        try:
+            from db_app.models import PriceObservation
+
+            observations = PriceObservation.objects.filter(device=PRICE_HISTORY_DEVICES[model_name], sku_id=sku_id)
+            if since is not None:
+                observations = observations.filter(observed_at__gte=int(since.timestamp()))
+            rows = list(observations.order_by('observed_at').values_list('source_id', 'price', 'observed_at'))
+            return self._to_dicts(rows)
+
+        except Exception as e:
+            logger.error(f"Ошибка получения истории цен {model_name} {sku_id}: {e}")
+            return []
+
+    @db_read
+    def get_latest_prices(self, model_name: str, sku_id: int) -> List[Dict[str, Any]]:
+        """Последние цены SKU у всех источников, от дешевой к дорогой"""
+        try:
+            from db_app.models import LatestPrice
+
+            rows = list(
+                LatestPrice.objects.filter(device=PRICE_HISTORY_DEVICES[model_name], sku_id=sku_id)
+                .order_by('price').values_list('source_id', 'price', 'observed_at')
+            )
+            return self._to_dicts(rows)
+
+        except Exception as e:
+            logger.error(f"Ошибка получения последних цен {model_name} {sku_id}: {e}")
+            return []
+
+    def _to_dicts(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        from db_app.models import PriceSource
+
+        names = dict(PriceSource.objects.filter(pk__in={source_id for source_id, _, _ in rows})
+                     .values_list('pk', 'name'))
+        return [
+            {
+                'source': names.get(source_id, ''),
+                'price': decode_price(price),
+                'observed_at': datetime.fromtimestamp(observed_at, tz=dt_timezone.utc),
+            }
+            for source_id, price, observed_at in rows
+        ]
+
+
+# Создаем глобальный экземпляр
+price_history_service = PriceHistoryService()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Тест индекса лучших цен: более дешевое предложение занимает место сразу,
+при подорожании, устаревании или удалении лучшего продвигается следующее,
+каталог показывает одну лучшую цену на конфигурацию
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+
+from services.best_price import DAY, best_price_index
+from services.db_gateway import db_gateway
+from services.price_history import PRICE_HISTORY_DEVICES, price_history_service
+
+TEST_DATABASE = 'file:test_best_price?mode=memory&cache=shared'
+IPHONE = PRICE_HISTORY_DEVICES['IPhone']
+
+
+def record(source: str, prices, observed_at: int, config: str = '16|Pro|256GB|Black|') -> int:
+    from db_app.models import IPhone
+
+    with transaction.atomic():
+        result = price_history_service.record_sync(IPhone, source, prices, {sku_id: config for sku_id in prices},
+                                                   observed_at)
+    return result['best']
+
+
+def best(config: str = '16|Pro|256GB|Black|'):
+    from db_app.models import BestPrice, PriceConfig, PriceSource
+
+    row = BestPrice.objects.get(device=IPHONE, config_id=PriceConfig.objects.get(device=IPHONE, key=config).pk)
+    return row.sku_id, PriceSource.objects.get(pk=row.source_id).name, row.price // 100, row.stale
+
+
+def check_updates():
+    now = int(time.time())
+    start = now - 10 * DAY
+
+    assert record("A", {1: 100}, start) == 1 and best() == (1, "A", 100, False)
+    assert record("B", {2: 90}, start) == 1 and best() == (2, "B", 90, False)
+    assert record("A", {1: 100}, start) == 0
+    # Лучшее подорожало - продвигается следующее по цене
+    assert record("B", {2: 120}, start) == 1 and best() == (1, "A", 100, False)
+    assert record("C", {3: 95}, start + 1) == 1 and best() == (3, "C", 95, False)
+    print("✅ Дешевое предложение становится лучшим, при подорожании лучшего продвигается следующее")
+
+    # Через 8 дней лучшее (C) устарело: место занимает подтвержденное A, хоть и дороже
+    assert record("A", {1: 100}, start + 8 * DAY) == 1 and best() == (1, "A", 100, False)
+    # Удалили предложения A: свежих нет, лучшим остается самое дешевое старое
+    with transaction.atomic():
+        assert best_price_index.remove_sync(IPHONE, [1]) == 1
+    assert best() == (3, "C", 95, True)
+    print("✅ Устаревшее и удаленное лучшее предложение заменяется следующим")
+
+    config = '16|Pro|512GB|Black|'
+    record("F", {6: 60}, now - 6 * DAY, config)
+    record("G", {7: 80}, now, config)
+    assert best(config) == (6, "F", 60, False)
+    with transaction.atomic():
+        assert best_price_index.expire_stale_sync(now + 2 * DAY) >= 1
+    assert best(config) == (7, "G", 80, False)
+    print("✅ Периодическая проверка заменяет устаревшие лучшие предложения")
+
+
+async def check_catalog():
+    from db_app.models import IPhone
+    from services.bulk_upsert import bulk_upsert_service
+    from services.catalog_service import CatalogService
+
+    def row(country: str, price: int):
+        lookup = {'generation': '15', 'variant': 'Pro', 'storage': '128GB', 'color': 'Blue',
+                  'country': country, 'country_code': None}
+        return lookup, {'price': price, 'source': ''}
+
+    await bulk_upsert_service.upsert(IPhone, [row('🇺🇸', 70000), row('🇯🇵', 69000)], "Канал 1")
+    await bulk_upsert_service.upsert(IPhone, [row('🇺🇸', 68000)], "Канал 2")
+
+    catalog = await CatalogService()._build_catalog_data()
+    items = [item for item in catalog['Apple']['iPhone'] if item['name'] == 'iPhone 15 Pro']
+    assert [(item['country'], item['price']) for item in items] == [('🇺🇸', 68000)], items
+
+    # Канал 2 поднял цену: лучшей снова становится японская из канала 1
+    await bulk_upsert_service.upsert(IPhone, [row('🇺🇸', 71000)], "Канал 2")
+    catalog = await CatalogService()._build_catalog_data()
+    items = [item for item in catalog['Apple']['iPhone'] if item['name'] == 'iPhone 15 Pro']
+    assert [(item['country'], item['price']) for item in items] == [('🇯🇵', 69000)], items
+    print("✅ Каталог показывает лучшую цену конфигурации по всем каналам и странам")
+
+    # Удаление записи в админке убирает ее предложения: лучшей становится следующая
+    await db_gateway.write(delete_in_admin, country='🇯🇵')
+    catalog = await CatalogService()._build_catalog_data()
+    items = [item for item in catalog['Apple']['iPhone'] if item['name'] == 'iPhone 15 Pro']
+    assert [(item['country'], item['price']) for item in items] == [('🇺🇸', 70000)], items
+    print("✅ Удаление записи в админке продвигает следующее лучшее предложение")
+
+
+def delete_in_admin(**lookup):
+    from django.contrib.admin.sites import site
+    from db_app.models import IPhone, LatestPrice
+
+    iphone = IPhone.objects.get(**lookup)
+    site._registry[IPhone].delete_model(None, iphone)
+    assert not LatestPrice.objects.filter(device=IPHONE, sku_id=iphone.pk).exists()
+
+
+def test_best_price():
+    """Проверяет поддержку индекса лучших цен"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: каталог читается из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        check_updates()
+        asyncio.run(check_catalog())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_best_price()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Тест пакетного сохранения: строки делятся на новые, измененные и неизмененные,
+записи с NULL в ключе обновляются по pk, а ошибка сохранения откатывает пачку
+и возвращается счетчиком failed
+"""
+import logging
+import os
+import sys
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.utils import timezone
+
+from services.db_gateway import db_gateway
+
+TEST_DATABASE = 'file:test_bulk_upsert?mode=memory&cache=shared'
+
+
+def row(storage: str, price: int, country_code=None, color: str = 'Black', source: str = 'Канал A'):
+    lookup = {'generation': '16', 'variant': 'Pro', 'storage': storage, 'color': color,
+              'country': '🇺🇸', 'country_code': country_code}
+    return lookup, {'price': price, 'source': source}
+
+
+def check_classification():
+    from db_app.models import IPhone
+    from services.bulk_upsert import bulk_upsert_service
+
+    counts = bulk_upsert_service.upsert_sync(IPhone, [row('128GB', 90000, 'eSIM'), row('256GB', 100000, 'eSIM')])
+    assert counts == {'created': 2, 'updated': 0, 'unchanged': 0, 'failed': 0}, counts
+
+    # Смена только источника не считается изменением цены
+    rows = [row('128GB', 89000, 'eSIM'), row('256GB', 100000, 'eSIM', source='Канал B'), row('512GB', 120000, 'eSIM')]
+    counts = bulk_upsert_service.upsert_sync(IPhone, rows)
+    assert counts == {'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 0}, counts
+    assert IPhone.objects.get(storage='128GB', country_code='eSIM').price == 89000
+
+    # Повтор ключа в одном сообщении сравнивается с предыдущей строкой, как в update_or_create
+    rows = [row('1TB', 150000, 'eSIM'), row('1TB', 150000, 'eSIM'), row('1TB', 149000, 'eSIM')]
+    counts = bulk_upsert_service.upsert_sync(IPhone, rows)
+    assert counts == {'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 0}, counts
+    assert IPhone.objects.get(storage='1TB', country_code='eSIM').price == 149000
+    print("✅ Строки делятся на новые, измененные и неизмененные")
+
+
+def check_null_key():
+    from db_app.models import IPhone
+    from services.bulk_upsert import bulk_upsert_service
+
+    assert bulk_upsert_service.upsert_sync(IPhone, [row('128GB', 90000)])['created'] == 1
+    pk = IPhone.objects.get(storage='128GB', country_code__isnull=True).pk
+
+    # NULL не конфликтует в уникальном индексе: без обновления по pk появился бы дубль
+    counts = bulk_upsert_service.upsert_sync(IPhone, [row('128GB', 87000), row('256GB', 99000)])
+    assert counts == {'created': 1, 'updated': 1, 'unchanged': 0, 'failed': 0}, counts
+    iphones = IPhone.objects.filter(storage='128GB', country_code__isnull=True)
+    assert [(iphone.pk, iphone.price) for iphone in iphones] == [(pk, 87000)]
+    print("✅ Запись с NULL в ключе обновляется по pk без дубля")
+
+
+def check_failed():
+    from db_app.models import IPhone
+    from services.bulk_upsert import bulk_upsert_service
+
+    total = IPhone.objects.count()
+    counts = bulk_upsert_service.upsert_sync(IPhone, [row('2TB', 'нет цены'), row('2TB', 170000, 'eSIM')])
+    assert counts == {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 2}, counts
+
+    # Ошибка записи откатывает всю пачку: ни новых, ни обновленных строк
+    with mock.patch.object(type(bulk_upsert_service), '_write', side_effect=RuntimeError("сбой записи")):
+        counts = bulk_upsert_service.upsert_sync(IPhone, [row('2TB', 170000, 'eSIM'), row('128GB', 1000, 'eSIM')])
+    assert counts == {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 2}, counts
+    assert IPhone.objects.count() == total
+    assert IPhone.objects.get(storage='128GB', country_code='eSIM').price == 89000
+    print("✅ Ошибка сохранения возвращается счетчиком failed, пачка откатывается")
+
+
+def check_pk_fallback():
+    from db_app.models import IPhone, LatestPrice
+    from services.bulk_upsert import bulk_upsert_service
+
+    # База без RETURNING: pk новых строк перечитываются по ключу уникальности
+    with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+        counts = bulk_upsert_service.upsert_sync(IPhone, [row('2TB', 170000, 'eSIM'), row('2TB', 171000, '2SIM')],
+                                                 source='Канал A')
+    assert counts['created'] == 2 and counts['failed'] == 0, counts
+    pks = set(IPhone.objects.filter(storage='2TB').values_list('pk', flat=True))
+    assert set(LatestPrice.objects.filter(sku_id__in=pks).values_list('sku_id', flat=True)) == pks
+
+    # Новые записи с NULL в ключе добавляются без ON CONFLICT и тоже находятся по полному ключу
+    with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+        counts = bulk_upsert_service.upsert_sync(IPhone, [row('2TB', 169000), row('2TB', 168000, color='Blue'),
+                                                          row('2TB', 170500, 'eSIM')], source='Канал A')
+    assert counts == {'created': 2, 'updated': 1, 'unchanged': 0, 'failed': 0}, counts
+    iphones = IPhone.objects.filter(storage='2TB', country_code__isnull=True)
+    assert sorted((iphone.color, iphone.price) for iphone in iphones) == [('Black', 169000), ('Blue', 168000)]
+    pks = {iphone.pk for iphone in iphones}
+    assert set(LatestPrice.objects.filter(sku_id__in=pks).values_list('sku_id', flat=True)) == pks
+
+    # Дубль ключа с NULL, добавленный другим процессом после чтения существующих записей,
+    # не подменяет pk новой записи: перечитываются только строки, записанные сейчас
+    lookup, _ = row('1TB', 0, color='Gold')
+    stale = IPhone.objects.create(price=1, **lookup)
+    IPhone.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=1))
+    load_existing, loads = type(bulk_upsert_service)._load_existing, []
+
+    def load_before_duplicate(self, *args, **kwargs):
+        existing = load_existing(self, *args, **kwargs)
+        loads.append(kwargs)
+        if len(loads) == 1:
+            existing = {key: obj for key, obj in existing.items() if obj.pk != stale.pk}
+        return existing
+
+    with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+            mock.patch.object(type(bulk_upsert_service), '_load_existing', load_before_duplicate):
+        counts = bulk_upsert_service.upsert_sync(IPhone, [row('1TB', 155000, color='Gold')], source='Канал A')
+    assert counts['created'] == 1 and counts['failed'] == 0, counts
+    created = IPhone.objects.get(color='Gold', price=155000)
+    assert list(LatestPrice.objects.filter(sku_id__in=[created.pk, stale.pk]).values_list('sku_id', flat=True)) == [created.pk]
+    print("✅ Без RETURNING история цен получает pk новых записей, в том числе с NULL в ключе")
+
+
+def test_bulk_upsert():
+    """Проверяет пакетное сохранение цен"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        check_classification()
+        check_null_key()
+        check_failed()
+        check_pk_fallback()
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_bulk_upsert()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Регрессионный тест количества SQL-запросов при построении каталога
+
+Каталог строится по прайсу bot/exampleprices.txt во временной базе в памяти.
+Наценка должна считаться в SQL: число запросов не зависит от числа товаров,
+а повторный запрос без изменений данных обслуживается из снимка после
+проверки общей версии данных. Запись из другого процесса (отдельное
+соединение SQLite) перестраивает снимок.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from services.db_gateway import db_gateway
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+TEST_DATABASE = 'file:test_catalog_queries?mode=memory&cache=shared'
+
+# Один запрос на таблицу: iPhone, MacBook, iPad, Apple Watch, iMac, AirPods, Apple Pencil, Product
+MAX_CATALOG_QUERIES = 8
+# Проверка версии данных перед выдачей снимка (и повторная - под блокировкой перестройки)
+VERSION_QUERIES = 2
+
+
+class QueryCounter:
+    """Считает SQL-запросы во всех потоках (обертка ставится на каждое новое соединение)"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def catalog_items(catalog_data):
+    """Все товары каталога плоским списком"""
+    for categories in catalog_data.values():
+        for items in categories.values():
+            yield from items
+
+
+async def check_catalog_queries(counter: QueryCounter):
+    from db_app.models import Markup
+    from services.hybrid_parser import template_parser
+    from services.catalog_service import CatalogService
+
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    await template_parser.parse_message(text, "Тест")
+    await sync_to_async(Markup.set_markup)(150)
+
+    catalog_service = CatalogService()
+
+    counter.queries = 0
+    catalog_data = await catalog_service.get_catalog_data()
+    items = list(catalog_items(catalog_data))
+    print(f"📋 Товаров в каталоге: {len(items)}, SQL-запросов: {counter.queries}")
+
+    assert len(items) > 100, "Каталог должен быть заполнен прайсом из примеров"
+    assert counter.queries <= MAX_CATALOG_QUERIES + VERSION_QUERIES, (
+        f"Построение каталога выполнило {counter.queries} запросов, "
+        f"ожидалось не больше {MAX_CATALOG_QUERIES + VERSION_QUERIES}"
+    )
+    for item in items:
+        assert item['display_price'] == item['price'] + 150, item
+
+    counter.queries = 0
+    await catalog_service.get_catalog_data()
+    print(f"📸 Повторный запрос каталога: {counter.queries} SQL-запросов")
+    assert counter.queries == 1, "Без изменений данных каталог должен отдаваться из снимка"
+
+    # Смена наценки перестраивает снимок и меняет цены
+    await sync_to_async(Markup.set_markup)(300)
+    counter.queries = 0
+    catalog_data = await catalog_service.get_catalog_data()
+    print(f"💰 После смены наценки: {counter.queries} SQL-запросов")
+    assert counter.queries <= MAX_CATALOG_QUERIES + VERSION_QUERIES
+    for item in catalog_items(catalog_data):
+        assert item['display_price'] == item['price'] + 300, item
+
+    # Другой процесс (userbot) меняет наценку и версию в своей транзакции
+    assert await catalog_service.get_current_markup() == 300
+    other = sqlite3.connect(TEST_DATABASE, uri=True)
+    with other:
+        other.execute(f"UPDATE {Markup._meta.db_table} SET amount = 500")
+        other.execute("UPDATE db_app_dataversion SET value = value + 1 WHERE name = 'catalog'")
+    other.close()
+    catalog_data = await catalog_service.get_catalog_data()
+    for item in catalog_items(catalog_data):
+        assert item['display_price'] == item['price'] + 500, item
+    assert await catalog_service.get_current_markup() == 500
+    print("🔄 Запись из другого соединения перестроила снимок и сбросила кэш наценки")
+
+    await sync_to_async(connections.close_all)()
+
+
+def test_catalog_queries():
+    """Проверяет, что каталог строится фиксированным числом запросов"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: запросы идут и из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    counter = QueryCounter()
+    connection_created.connect(counter.install)
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_catalog_queries(counter))
+        print("✅ Количество запросов каталога в норме")
+    finally:
+        connection_created.disconnect(counter.install)
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_catalog_queries()
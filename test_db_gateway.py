@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Тест DatabaseGateway: чтения идут пулом, записи объединяются в пачки,
+ошибка одной записи в пачке не откатывает остальные, занятая база - повтор
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connections
+
+from services.catalog_version import catalog_version
+from services.db_gateway import db_gateway, db_read, db_write
+
+TEST_DATABASE = 'file:test_db_gateway?mode=memory&cache=shared'
+WRITES = 50
+
+
+def add_markup(amount: int) -> int:
+    from db_app.models import Markup
+
+    if amount < 0:
+        raise ValueError("Отрицательная наценка")
+    return Markup.objects.create(amount=amount).pk
+
+
+@db_read
+def count_markups() -> int:
+    from db_app.models import Markup
+
+    return Markup.objects.count()
+
+
+@db_read
+def reader_thread() -> str:
+    return threading.current_thread().name
+
+
+@db_write
+def bump_catalog() -> int:
+    catalog_version.bump("тест шлюза")
+    return catalog_version.value
+
+
+class LockedOnce:
+    """Запись, которая первый раз падает, как при базе, занятой другим процессом"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self) -> int:
+        self.calls += 1
+        if self.calls == 1:
+            raise OperationalError("database is locked")
+        return add_markup(self.calls)
+
+
+async def check_gateway():
+    assert (await reader_thread()).startswith('db-read')
+
+    # Записи, отправленные разом, выполняются пачками; отрицательная падает одна
+    amounts = list(range(WRITES)) + [-1]
+    results = await asyncio.gather(*[db_gateway.write(add_markup, amount) for amount in amounts],
+                                   return_exceptions=True)
+    assert isinstance(results[-1], ValueError), results[-1]
+    assert all(isinstance(pk, int) for pk in results[:-1])
+    assert await count_markups() == WRITES
+
+    metrics = db_gateway.metrics()
+    assert metrics['write']['batches'] < WRITES, metrics
+    assert metrics['write']['failed'] == 1 and metrics['write']['depth'] == 0
+    print(f"✅ {WRITES + 1} записей выполнены за {metrics['write']['batches']} пачек, ошибка одной не откатила остальные")
+
+    # Версия каталога меняется только после фиксации транзакции записи
+    version = catalog_version.value
+    assert await bump_catalog() == version
+    assert catalog_version.value == version + 1
+    print("✅ Версия каталога меняется после фиксации записи")
+
+    locked = LockedOnce()
+    assert isinstance(await db_gateway.write(locked), int)
+    assert locked.calls == 2 and db_gateway.metrics()['write']['retries'] == 1
+    print("✅ Запись в занятую базу повторена")
+
+
+def test_db_gateway():
+    """Проверяет очереди чтения и записи шлюза базы данных"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: запросы идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_gateway())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_db_gateway()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Тест реестра устройств: парсеры и сервисы загружаются при первом обращении,
+классификатор строится без их импорта, Django настраивается один раз
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+from services.device_registry import DEVICE_HANDLERS, LAZY_KEYS, build_device_handlers
+from services.line_classifier import LineClassifier
+
+ROOT = Path(__file__).parent
+
+# Импорт TemplateParser в чистом процессе не должен тянуть парсеры, сервисы и Django
+FRESH_IMPORT_SCRIPT = """
+import sys
+from services.hybrid_parser import template_parser
+loaded = [name for name in sys.modules if name.startswith(('parsers.iphone', 'services.iphone', 'django.db'))]
+print(','.join(loaded))
+"""
+
+
+def check_lazy_handlers():
+    handlers = build_device_handlers()
+    classifier = LineClassifier(handlers)
+    assert classifier.candidates("16 Pro 128 Black 80100🇨🇳2Sim")[0] == 'iphone'
+    assert not any(dict.__contains__(handler, key) for handler in handlers.values() for key in LAZY_KEYS)
+
+    parser = handlers['apple_watch']['parser']
+    assert handlers['apple_watch']['parser'] is parser
+    assert not dict.__contains__(handlers['apple_watch'], 'service')
+    assert handlers['macbook'].get('context') and handlers['iphone']['priority'] == 1
+    print(f"✅ {len(DEVICE_HANDLERS)} устройств, парсер загружается при первом обращении")
+
+
+def check_fresh_import():
+    completed = subprocess.run([sys.executable, '-c', FRESH_IMPORT_SCRIPT], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    loaded = completed.stdout.strip()
+    assert loaded == '', loaded
+    print("✅ Импорт TemplateParser не загружает парсеры, сервисы и Django")
+
+
+def check_django_setup_once():
+    from django.apps import apps
+    from db_app.django_setup import setup_django
+
+    setup_django()
+    assert apps.ready
+    handlers = build_device_handlers()
+    service = handlers['airpods']['service']
+    assert hasattr(service, 'save_parsed_prices')
+    print("✅ Сервис загружается после однократной настройки Django")
+
+
+def test_device_registry():
+    """Проверяет ленивый реестр парсеров и сервисов"""
+    check_lazy_handlers()
+    check_fresh_import()
+    check_django_setup_once()
+
+
+if __name__ == "__main__":
+    test_device_registry()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Тест интернирования измерений: записи устройств получают целые id значений,
+повторный прайс обходится без запросов к таблице измерений, каталог
+сортирует память и поколения по рангу, а не как строки
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+
+from services.db_gateway import db_gateway
+from services.dimensions import dimension_cache, rank_key
+
+TEST_DATABASE = 'file:test_dimensions?mode=memory&cache=shared'
+
+
+def row(generation: str, storage: str, price: int, variant=None, color: str = 'Black'):
+    lookup = {'generation': generation, 'variant': variant, 'storage': storage, 'color': color,
+              'country': '🇺🇸', 'country_code': None}
+    return lookup, {'price': price, 'source': ''}
+
+
+class DimensionQueries:
+    """Считает запросы к таблице измерений"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'db_app_dimension' in sql:
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def check_ranks():
+    storages = ['1TB', '256GB', '128GB', '2TB', '512GB']
+    assert sorted(storages, key=lambda value: rank_key('storage', value)) == ['128GB', '256GB', '512GB', '1TB', '2TB']
+    generations = ['16E', '9', '16', 'S10', '13', 'S9']
+    assert sorted(generations, key=lambda value: rank_key('generation', value)) == ['9', '13', '16', '16E', 'S9', 'S10']
+    variants = ['Pro Max', 'Pro', '', 'Plus']
+    assert sorted(variants, key=lambda value: rank_key('variant', value)) == ['', 'Plus', 'Pro', 'Pro Max']
+    print("✅ Ранги: 128GB < 256GB < 1TB, 9 < 13 < 16 < 16E, обычный < Plus < Pro < Pro Max")
+
+
+def check_ingest():
+    from db_app.models import IPhone, Dimension
+    from services.bulk_upsert import bulk_upsert_service
+
+    rows = [row('16', '1TB', 150000, 'Pro'), row('16', '128GB', 90000, 'Pro'), row('16', '256GB', 100000, 'Pro')]
+    assert bulk_upsert_service.upsert_sync(IPhone, rows)['created'] == 3
+    iphone = IPhone.objects.get(storage='1TB')
+    assert dimension_cache.value(iphone.storage_dim_id) == '1TB'
+    assert dimension_cache.ids_sync('storage', ['1TB']) == {'1TB': iphone.storage_dim_id}
+    assert Dimension.objects.get(pk=iphone.generation_dim_id).value == '16'
+
+    # Повторный прайс: id берутся из кэша, ключ находит существующие записи
+    counter = DimensionQueries()
+    with connection.execute_wrapper(counter):
+        counts = bulk_upsert_service.upsert_sync(IPhone, [row('16', '1TB', 149000, 'Pro'), row('16', '128GB', 90000, 'Pro')])
+    assert counts == {'created': 0, 'updated': 1, 'unchanged': 1, 'failed': 0}, counts
+    assert counter.queries == 0 and IPhone.objects.count() == 3
+    print("✅ Повторный прайс находит записи по id измерений без запросов к таблице измерений")
+
+    # Построчное сохранение тоже получает id (сигнал pre_save) и попадает в тот же ключ
+    IPhone.objects.update_or_create(generation='15', variant=None, storage='512GB', color='Black',
+                                    country='🇺🇸', country_code=None, defaults={'price': 80000})
+    assert bulk_upsert_service.upsert_sync(IPhone, [row('15', '512GB', 81000)])['updated'] == 1
+    assert IPhone.objects.filter(generation='15').count() == 1
+    assert IPhone.objects.get(generation='15').storage_dim_id == dimension_cache.ids_sync('storage', ['512GB'])['512GB']
+    print("✅ update_or_create и пакетное сохранение используют один ключ")
+
+    # Значение из откаченной транзакции не остается в кэше с несуществующим id
+    try:
+        with transaction.atomic():
+            dimension_cache.ids_sync('color', ['Ultramarine'])
+            raise RuntimeError("откат")
+    except RuntimeError:
+        pass
+    assert bulk_upsert_service.upsert_sync(IPhone, [row('16', '128GB', 95000, color='Ultramarine')])['created'] == 1
+    iphone = IPhone.objects.get(color='Ultramarine')
+    assert Dimension.objects.get(pk=iphone.color_dim_id).value == 'Ultramarine'
+    print("✅ После отката значение измерения добавляется заново")
+
+
+def check_concurrent_load():
+    storages = ['128GB', '256GB', '512GB', '1TB']
+    expected = dimension_cache.ids_sync('storage', storages)
+    loaded = threading.Event()
+
+    def reload():
+        try:
+            for _ in range(50):
+                dimension_cache.load_sync()
+        finally:
+            loaded.set()
+            connections.close_all()
+
+    def read(_):
+        try:
+            while not loaded.is_set():
+                assert all(dimension_cache.rank(dimension_id) > 0 for dimension_id in expected.values())
+                assert dimension_cache.value(expected['1TB']) == '1TB'
+                assert dimension_cache.ids_sync('storage', storages) == expected
+        finally:
+            connections.close_all()
+
+    # Перезагрузка кэша в одном потоке шлюза не мешает чтению в других
+    loader = threading.Thread(target=reload)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        readers = [executor.submit(read, index) for index in range(4)]
+        loader.start()
+        try:
+            for reader in readers:
+                reader.result()
+        finally:
+            loaded.set()
+            loader.join()
+    print("✅ Чтение id и рангов во время перезагрузки кэша не видит его пустым")
+
+
+async def check_catalog():
+    from services.catalog_service import CatalogService
+
+    catalog = await CatalogService()._build_catalog_data()
+    configurations = [item['configuration'] for item in catalog['Apple']['iPhone'] if item['name'] == 'iPhone 16 Pro']
+    assert configurations == ['128GB Black', '256GB Black', '1TB Black'], configurations
+    names = [item['name'] for item in catalog['Apple']['iPhone']]
+    assert names.index('iPhone 15') < names.index('iPhone 16') < names.index('iPhone 16 Pro'), names
+    print("✅ Каталог сортирует по рангам: 128GB, 256GB, 1TB")
+
+
+def test_dimensions():
+    """Проверяет интернирование измерений устройств"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: каталог читается из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        check_ranks()
+        check_ingest()
+        check_concurrent_load()
+        asyncio.run(check_catalog())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_dimensions()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Тест загрузки прайсов файлами: чтение частями дает те же распознанные строки,
+что и разбор одним сообщением, а файл на 50 тысяч строк разбирается одной задачей
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from services.db_gateway import db_gateway
+from services.document_reader import iter_lines, iter_chunks, count_lines
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+TEST_DATABASE = 'file:test_document_ingest?mode=memory&cache=shared'
+
+BIG_FILE_LINES = 50000
+
+
+def check_readers(directory: Path):
+    csv_path = directory / "prices.csv"
+    # Выгрузка из Excel: cp1251 и ; между ячейками
+    csv_path.write_text("Модель;Память;Цена\niPhone 16;128 ГБ;85000\n", encoding='cp1251')
+    assert list(iter_lines(str(csv_path))) == ["Модель Память Цена", "iPhone 16 128 ГБ 85000"]
+
+    txt_path = directory / "prices.txt"
+    txt_path.write_text("16 128 Black 🇺🇸 85000\r\nстрока\r\n", encoding='utf-8')
+    assert list(iter_lines(str(txt_path))) == ["16 128 Black 🇺🇸 85000", "строка"]
+    assert [len(chunk) for chunk in iter_chunks(range(12), 5)] == [5, 5, 2]
+    print("✅ Чтение .txt и .csv построчно")
+
+    # Число строк совпадает с числом прочитанных строк с переводом строки на конце файла и без него
+    for text in ("16 128 Black 85000\nстрока\n", "16 128 Black 85000\nстрока", ""):
+        txt_path.write_text(text, encoding='utf-8')
+        assert count_lines(str(txt_path)) == len(list(iter_lines(str(txt_path)))) == len(text.splitlines()), text
+    print("✅ Подсчет строк не учитывает перевод строки в конце файла")
+
+
+async def check_chunks_match_message():
+    from parsers.macbook_parser import macbook_parser
+    from services.hybrid_parser import template_parser
+    from services.line_dedup import line_dedup
+
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    line_dedup.reset()
+    whole = await template_parser.parse_message(text, "Тест одним сообщением")
+    lines = text.strip().split('\n')
+    chunked = await template_parser.parse_stream(iter_chunks(lines, 700), "Тест частями")
+
+    assert Counter(chunked['parsed_lines']) == Counter(whole['parsed_lines'])
+    assert len(chunked['price_like_lines']) == len(whole['price_like_lines'])
+    print(f"✅ Частями по 700 строк распознано столько же: {len(chunked['parsed_lines'])}")
+
+    # Заголовок секции MacBook в одной части задает контекст строкам следующей
+    header, line = "MacBook Pro 14 M4", "🇺🇸 MX2H3 - 16/512 Gold — 158.000₽"
+    parsed, _ = macbook_parser.parse_lines([line], section_start=macbook_parser.section_tracker.advance([header]))
+    assert (parsed[0].model, parsed[0].size) == ('Pro', '14'), parsed
+
+
+async def check_big_file_job(directory: Path):
+    from services.parse_jobs import ParseJobQueue
+    from services.hybrid_parser import template_parser
+
+    # Копии прайса с разными ценами, пока не наберется BIG_FILE_LINES строк
+    base = EXAMPLES_FILE.read_text(encoding='utf-8').strip().split('\n')
+    path = directory / "big.txt"
+    with open(path, 'w', encoding='utf-8') as file:
+        for number in range(BIG_FILE_LINES):
+            copy, index = divmod(number, len(base))
+            file.write(base[index].replace('000', f'0{copy % 10}0') + '\n')
+    assert count_lines(str(path)) == BIG_FILE_LINES
+
+    queue = ParseJobQueue(template_parser, workers=1, progress_interval=0)
+    reports = []
+    finished = asyncio.Event()
+
+    async def on_progress(job):
+        reports.append((job.lines_done, job.lines_total))
+
+    async def on_done(job):
+        finished.set()
+
+    started = time.perf_counter()
+    job = await queue.submit_document(str(path), "Тест файла", on_progress=on_progress, on_done=on_done)
+    await asyncio.wait_for(finished.wait(), timeout=300)
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+
+    assert job.status == 'done', job.error
+    assert not path.exists(), "Файл должен удаляться после разбора"
+    assert reports and all(total == BIG_FILE_LINES for _, total in reports)
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports), "Ход разбора не должен идти назад"
+    print(f"✅ Файл на {BIG_FILE_LINES} строк разобран одной задачей за {elapsed:.1f}с: "
+          f"распознано {len(job.results['parsed_lines'])}, сохранено {job.results['total_saved']}")
+
+
+def test_document_ingest():
+    """Проверяет разбор прайсов из файлов частями"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: сохранения идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        with tempfile.TemporaryDirectory() as directory:
+            check_readers(Path(directory))
+            asyncio.run(check_chunks_match_message())
+            asyncio.run(check_big_file_job(Path(directory)))
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_document_ingest()
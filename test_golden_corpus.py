@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тест эталонного корпуса: разбор bot/exampleprices.txt совпадает с записанным
+эталоном, а маршрутизация строк корпуса - с TemplateParser.parse_message
+"""
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from benchmarks.golden_corpus import EXAMPLES_FILE, UNPARSED, check, parse_corpus
+from services.db_gateway import db_gateway
+
+TEST_DATABASE = 'file:test_golden_corpus?mode=memory&cache=shared'
+
+
+def check_golden():
+    diffs = check()
+    assert not diffs, '\n'.join(diffs[:5])
+    print("✅ Разбор совпадает с эталоном")
+
+
+async def check_same_as_parse_message():
+    from services.hybrid_parser import template_parser
+    from services.line_dedup import line_dedup
+
+    lines = EXAMPLES_FILE.read_text(encoding='utf-8').split('\n')
+    corpus_lines = {
+        line.strip() for line, result in zip(lines, parse_corpus(lines))
+        if result is not None and result[0] != UNPARSED
+    }
+
+    line_dedup.reset()
+    results = await template_parser.parse_message('\n'.join(lines), "Тест эталона")
+    assert corpus_lines == set(results['parsed_lines']), corpus_lines ^ set(results['parsed_lines'])
+    print(f"✅ Корпус и parse_message распознают одни и те же строки: {len(corpus_lines)}")
+
+
+def test_golden_corpus():
+    """Проверяет эталонный корпус результатов парсинга"""
+    logging.disable(logging.WARNING)
+    check_golden()
+
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: сохранения идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_same_as_parse_message())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_golden_corpus()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Тест защиты от враждебных строк: предел длины строки в классификаторе,
+бюджет времени на строку и шаблоны Apple Watch без долгого перебора
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from services.line_budget import LineBudget
+from parsers.apple_watch_parser import AppleWatchParser
+
+# Строки, на которых старые шаблоны Apple Watch перебирались секундами
+HOSTILE_WATCH_LINES = [
+    'Ultra 2 49mm Black' + ' ' * 280 + 'x',
+    'SE 2024 40mm ' + ' ' * 280 + ' M/L - x',
+    'Ultra 2 49mm ' + 'Black ' * 45 + 'M/L - x',
+]
+MAX_HOSTILE_LINE_MS = 50
+
+
+def check_long_lines():
+    from services.hybrid_parser import template_parser
+
+    classifier = template_parser.classifier
+    line = "16 Pro 128 Black 80100🇨🇳2Sim"
+    long_line = line + ' ' * classifier.max_line_length
+    assert classifier.candidates(line)
+    assert classifier.is_too_long(long_line)
+    assert classifier.candidates(long_line) == []
+    print(f"✅ Строки длиннее {classifier.max_line_length} символов не получают кандидатов")
+
+
+def check_budget():
+    def parse_line(index, line):
+        if line.startswith('slow'):
+            time.sleep(0.02)
+        return [line], []
+
+    budget = LineBudget(budget_ms=10, max_overruns=2)
+    lines = ['fast 1', 'slow 1', 'fast 2', 'slow 2', 'fast 3', 'slow 3']
+    parsed, unparsed = budget.parse_lines('test', parse_line, lines)
+    assert parsed == ['fast 1', 'slow 1', 'fast 2', 'slow 2'], parsed
+    assert unparsed == ['fast 3', 'slow 3'], unparsed
+    assert budget.exhausted
+    assert [overrun.line for overrun in budget.overruns] == ['slow 1', 'slow 2']
+    print(f"✅ Бюджет исчерпан после {budget.max_overruns} медленных строк, остальные не разбираются")
+
+
+def check_watch_patterns():
+    apple_watch_parser = AppleWatchParser()
+    for line in HOSTILE_WATCH_LINES:
+        start = time.perf_counter()
+        apple_watch_parser.parse_lines([line])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert elapsed_ms < MAX_HOSTILE_LINE_MS, (line[:40], elapsed_ms)
+
+    data = apple_watch_parser._parse_single_line("Ultra 2 49mm Black Trail Loop M/L - 60000")
+    assert data is not None and data.price == 60000
+    print(f"✅ Враждебные строки Apple Watch разбираются быстрее {MAX_HOSTILE_LINE_MS} мс")
+
+
+def test_line_budget():
+    """Проверяет предел длины строки и бюджет времени разбора"""
+    check_long_lines()
+    check_budget()
+    check_watch_patterns()
+
+
+if __name__ == "__main__":
+    test_line_budget()
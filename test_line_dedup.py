@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Тест пропуска неизмененных строк: повтор прайса источника не парсится заново,
+но нераспознанные строки остаются в отчете, а предложения пропущенных строк
+подтверждаются и не устаревают в индексе лучших цен
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from services.best_price import DAY
+from services.db_gateway import db_gateway
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+TEST_DATABASE = 'file:test_line_dedup?mode=memory&cache=shared'
+
+
+async def check_line_dedup():
+    from services.hybrid_parser import template_parser
+    from services.line_dedup import line_dedup
+
+    line_dedup.reset()
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    first = await template_parser.parse_message(text, "Канал A")
+    assert first['unparsed_lines'], "В примерах есть нераспознанные строки"
+
+    second = await template_parser.parse_message(text, "Канал A")
+    # Известные строки пропускаются; контекстные парсеры получают их блок заново
+    known = [line for line in text.split('\n') if line.strip() in set(first['parsed_lines'])]
+    reparsed = set(second['parsed_lines'])
+    assert second['skipped_unchanged'] == sum(1 for line in known if line.strip() not in reparsed)
+    assert second['skipped_unchanged'] > len(reparsed)
+    assert sorted(second['unparsed_lines']) == sorted(first['unparsed_lines'])
+    print(f"✅ Повтор прайса: пропущено {second['skipped_unchanged']} строк, "
+          f"нераспознанные ({len(second['unparsed_lines'])}) остались в отчете")
+
+    # Пропущенные строки подтверждают свои предложения, строки, убранные из прайса, - нет
+    await db_gateway.write(age_offers)
+    offers = line_dedup.known_offers("Канал A", text.split('\n'))
+    removed = next(
+        line for line, line_offers in offers.items()
+        if line_offers and not any(set(line_offers) & set(other) for key, other in offers.items() if key != line)
+    )
+    third = await template_parser.parse_message(text.replace(removed, ''), "Канал A")
+    assert third['skipped_unchanged'] > 0
+    fresh = await db_gateway.write(fresh_offers)
+    assert fresh == {offer for line, line_offers in offers.items() if line != removed for offer in line_offers}
+    print(f"✅ Подтверждено {len(fresh)} предложений пропущенных строк, убранная строка устаревает")
+
+    # Записи удалены другим процессом: строки этого процесса больше не пропускаются
+    count = await db_gateway.write(delete_elsewhere)
+    fourth = await template_parser.parse_message(text, "Канал A")
+    assert fourth['skipped_unchanged'] == 0
+    assert await db_gateway.read(iphone_count) == count
+    print(f"✅ После удаления записей в другом процессе прайс сохраняет их заново ({count} iPhone)")
+
+
+def age_offers():
+    """Сдвигает время подтверждения всех предложений на месяц назад"""
+    from django.db.models import F
+    from db_app.models import LatestPrice
+
+    LatestPrice.objects.update(observed_at=F('observed_at') - 30 * DAY)
+
+
+def delete_elsewhere() -> int:
+    """Удаляет iPhone, как очистка в другом процессе: меняется только поколение в базе"""
+    from django.db.models import F
+    from db_app.models import DataVersion, IPhone
+    from services.line_dedup import LINE_DEDUP_VERSION_NAME
+    from services.price_history import price_history_service
+
+    count = IPhone.objects.count()
+    IPhone.objects.all().delete()
+    price_history_service.clear_latest_sync(['IPhone'])
+    DataVersion.objects.get_or_create(name=LINE_DEDUP_VERSION_NAME)
+    DataVersion.objects.filter(name=LINE_DEDUP_VERSION_NAME).update(value=F('value') + 1)
+    return count
+
+
+def iphone_count() -> int:
+    from db_app.models import IPhone
+
+    return IPhone.objects.count()
+
+
+def fresh_offers():
+    """Предложения (код устройства, pk), подтвержденные за последний час"""
+    from db_app.models import LatestPrice
+
+    return set(LatestPrice.objects.filter(observed_at__gte=int(time.time()) - 3600).values_list('device', 'sku_id'))
+
+
+def test_line_dedup():
+    """Проверяет пропуск строк, не изменившихся с прошлой загрузки"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: сохранения идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_line_dedup())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_line_dedup()
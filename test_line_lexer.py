@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Тест лексера строк прайса и грамматики iPhone: порядок полей не важен,
+строки других устройств грамматикой не принимаются
+"""
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+from parsers.line_lexer import tokenize
+from parsers.iphone_parser import iphone_parser
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+
+# Одна и та же запись в разных форматах поставщиков
+SAME_RECORD_LINES = [
+    "16 Pro 128 Black 80100🇨🇳2Sim",
+    "🇨🇳16Pro 128 Black - 80100🇨🇳2Sim",
+    "16 Pro 128GB Black 2Sim 🇨🇳 80100",
+    "16 Prо 128 Black 2 Sim 🇨🇳 - 80.100🚘",
+    "Apple iPhone 16 Pro 128GB Black 2SIM 80100🇨🇳",
+    "🇨🇳 16 Pro 128Gb Black 2Sim - 80100",
+]
+
+# Строки других устройств, в которых есть число, похожее на поколение iPhone
+NOT_IPHONE_LINES = [
+    "S24 FE 8/512 Black 🇮🇳 60000",
+    "🇺🇸MW1J3 15\" M4 10/10 16 256GB  Starlight - 97.000",
+    "🇨🇦 Google Pixel 9 128Gb Obsidian - 49200",
+    "SE2 44 Starlight -                19700🇺🇸.",
+    "AIR 13 M2 512 Purple LTE 🇺🇸 98200",
+]
+
+
+def check_tokens():
+    tokens = tokenize("🇯🇵16 Prо Maх 1TB Black - 136.000🇯🇵2Sim 🚘")
+    assert [token.kind for token in tokens] == [
+        'FLAG', 'GENERATION', 'VARIANT', 'STORAGE', 'WORD', 'DASH', 'PRICE', 'FLAG', 'SIM', 'OTHER'
+    ], tokens
+    assert tokens[2].text == "Prо Maх"
+    assert [token.kind for token in tokenize("S24 8/256 16e 64 2 Sim")] == [
+        'PRODUCT_CODE', 'MEM_STORAGE', 'GENERATION', 'GENERATION', 'SIM'
+    ]
+    print("✅ Токены строки за один проход")
+
+
+def check_field_order():
+    records = set()
+    for line in SAME_RECORD_LINES:
+        data = iphone_parser._parse_single_line(line)
+        assert data is not None, line
+        records.add((data.generation, data.variant, data.storage, data.color,
+                     data.country_flag, data.country_code.upper().replace(' ', ''), data.price))
+    assert records == {('16', 'Pro', '128GB', 'Black', '🇨🇳', '2SIM', 80100)}, records
+    print(f"✅ {len(SAME_RECORD_LINES)} форматов строки дают одну запись")
+
+
+def check_other_devices():
+    for line in NOT_IPHONE_LINES:
+        assert iphone_parser._parse_single_line(line) is None, line
+    print(f"✅ Строки других устройств не принимаются: {len(NOT_IPHONE_LINES)}")
+
+
+def check_examples():
+    lines = EXAMPLES_FILE.read_text(encoding='utf-8').split('\n')
+    parsed, unparsed = iphone_parser.parse_lines(lines)
+    assert all(data.generation[:2] in ('11', '12', '13', '14', '15', '16', '17') for data in parsed)
+    print(f"✅ exampleprices: распознано {len(parsed)}, не распознано {len(unparsed)}")
+
+
+def test_line_lexer():
+    """Проверяет лексер и грамматику iPhone"""
+    check_tokens()
+    check_field_order()
+    check_other_devices()
+    check_examples()
+
+
+if __name__ == "__main__":
+    test_line_lexer()
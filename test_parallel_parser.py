@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тест параллельного парсинга: шарды в пуле процессов дают тот же результат
+и тот же порядок строк, что и последовательный парсинг
+"""
+import asyncio
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from parsers.iphone_parser import iphone_parser
+from parsers.ipad_parser import iPadParser
+from parsers.apple_watch_parser import AppleWatchParser
+from parsers.imac_parser import iMacParser
+from parsers.airpods_parser import AirPodsParser
+from parsers.apple_pencil_parser import ApplePencilParser
+from services.parallel_parser import ParallelLineParser
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+
+
+async def check_parallel_matches_sequential():
+    lines = EXAMPLES_FILE.read_text(encoding='utf-8').split('\n')
+    parsers = {
+        'iphone': iphone_parser,
+        'ipad': iPadParser(),
+        'apple_watch': AppleWatchParser(),
+        'imac': iMacParser(),
+        'airpods': AirPodsParser(),
+        'apple_pencil': ApplePencilParser(),
+    }
+    parallel = ParallelLineParser(parsers, processes=4, min_lines=1)
+
+    start = time.perf_counter()
+    await parallel.start()
+    print(f"⏱️ Запуск пула: {time.perf_counter() - start:.2f}с")
+
+    try:
+        for device_type, parser in parsers.items():
+            start = time.perf_counter()
+            expected_parsed, expected_unparsed = parser.parse_lines(lines)
+            sequential_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parsed, unparsed = await parallel.parse_lines(device_type, lines)
+            parallel_time = time.perf_counter() - start
+
+            assert parsed == expected_parsed, f"{device_type}: распознанные строки отличаются"
+            assert unparsed == expected_unparsed, f"{device_type}: нераспознанные строки отличаются"
+            print(f"✅ {device_type}: {len(parsed)} распознано, {len(unparsed)} нет "
+                  f"({sequential_time * 1000:.0f} мс последовательно, {parallel_time * 1000:.0f} мс в пуле)")
+
+        # Упавший процесс ломает пул: строки возвращаются вызывающему коду, пул пересоздается
+        os.kill(next(iter(parallel._executor._processes)), signal.SIGKILL)
+        start = time.perf_counter()
+        assert await parallel.parse_lines('iphone', lines) is None
+        print(f"✅ Сломанный пул закрыт за {(time.perf_counter() - start) * 1000:.0f} мс, строки разбираются на месте")
+        assert await parallel.parse_lines('iphone', lines) == iphone_parser.parse_lines(lines)
+        print("✅ Следующий вызов запускает пул заново")
+    finally:
+        parallel.shutdown()
+
+
+def test_parallel_parser():
+    """Сравнивает парсинг bot/exampleprices.txt в пуле процессов с последовательным"""
+    asyncio.run(check_parallel_matches_sequential())
+
+
+if __name__ == "__main__":
+    test_parallel_parser()
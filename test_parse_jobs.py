@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тест фоновых задач разбора прайсов: submit не ждет парсинга, ход разбора
+приходит не чаще интервала, задачи в очереди и в работе отменяются
+"""
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from services.parse_jobs import ParseJobQueue
+
+STAGES = ['iphone', 'macbook', 'ipad', 'apple_watch']
+
+
+class SlowParser:
+    """Парсер с интерфейсом TemplateParser.parse_message: этапы идут с паузами"""
+
+    def __init__(self, stage_delay: float):
+        self.stage_delay = stage_delay
+        self.cancelled = 0
+
+    async def parse_message(self, text, source="", progress=None):
+        lines_total = len(text.split('\n'))
+        saved = {}
+        try:
+            await progress({'stage': 'classify', 'device_type': None, 'lines_done': 0,
+                            'lines_total': lines_total, 'saved': dict(saved)})
+            for number, device_type in enumerate(STAGES):
+                await progress({'stage': 'parse', 'device_type': device_type,
+                                'lines_done': lines_total * number // len(STAGES),
+                                'lines_total': lines_total, 'saved': dict(saved)})
+                await asyncio.sleep(self.stage_delay)
+                saved[device_type] = (number + 1) * 10
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {'total_saved': sum(saved.values()), 'summary': f"📊 {source}: {lines_total} строк"}
+
+
+async def run_job(progress_interval: float):
+    queue = ParseJobQueue(SlowParser(stage_delay=0.01), workers=1, progress_interval=progress_interval)
+    reports = []
+    finished = asyncio.Event()
+
+    async def on_progress(job):
+        reports.append(job.progress_text())
+
+    async def on_done(job):
+        finished.set()
+
+    job = await queue.submit("\n".join(["строка"] * 4000), "Тест", on_progress=on_progress, on_done=on_done)
+    assert job.status == 'queued', "submit должен возвращаться, не дожидаясь разбора"
+
+    await asyncio.wait_for(finished.wait(), timeout=2)
+    await queue.stop()
+
+    assert job.status == 'done'
+    assert job.results['summary'] == "📊 Тест: 4000 строк"
+    return reports
+
+
+async def check_progress_and_result():
+    # Без ограничения приходит каждый этап, кроме итогового
+    reports = await run_job(progress_interval=0)
+    assert len(reports) == len(STAGES) + 1, reports
+    assert reports[-1] == ("🔄 Парсинг Apple Watch: 3000/4000 строк, iPhone 10 сохранено, "
+                           "MacBook 20 сохранено, iPad 30 сохранено"), reports[-1]
+    print(f"✅ Ход разбора: {reports[2]}")
+
+    # Интервал больше времени разбора - только первое сообщение
+    reports = await run_job(progress_interval=60)
+    assert reports == ["🔄 Классификация: 0/4000 строк"], reports
+    print("✅ Сообщения о ходе разбора ограничены интервалом")
+
+
+async def check_cancel():
+    parser = SlowParser(stage_delay=0.05)
+    queue = ParseJobQueue(parser, workers=1, progress_interval=0)
+    done = {}
+
+    async def on_done(job):
+        done[job.id] = job.status
+
+    running = await queue.submit("прайс 1", "Тест", on_done=on_done)
+    queued = await queue.submit("прайс 2", "Тест", on_done=on_done)
+    await asyncio.sleep(0.07)
+
+    assert running.status == 'running' and queued.status == 'queued'
+    assert queue.cancel(queued.id)
+    assert queue.cancel(running.id)
+    while len(done) < 2:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    assert done == {running.id: 'cancelled', queued.id: 'cancelled'}, done
+    assert parser.cancelled == 1, "Второй прайс не должен был начать разбираться"
+    assert not queue.cancel(running.id), "Завершенную задачу отменить нельзя"
+    print("✅ Отмена задач в работе и в очереди")
+
+
+def test_parse_jobs():
+    """Проверяет очередь фоновых задач разбора без Telegram и базы"""
+    logging.getLogger('services.parse_jobs').setLevel(logging.WARNING)
+    asyncio.run(check_progress_and_result())
+    asyncio.run(check_cancel())
+
+
+if __name__ == "__main__":
+    test_parse_jobs()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Тест отзывчивости бота во время парсинга большого прайса
+
+Пока разбирается прайс из нескольких копий bot/exampleprices.txt, в том же
+event loop обрабатываются "нажатия кнопок". Задержка каждого нажатия должна
+оставаться меньше MAX_CALLBACK_LATENCY: парсинг идет в потоках, а не в loop.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from services.db_gateway import db_gateway
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+TEST_DATABASE = 'file:test_parse_latency?mode=memory&cache=shared'
+
+MAX_CALLBACK_LATENCY = 0.1
+CALLBACK_INTERVAL = 0.01
+PRICE_LIST_COPIES = 10
+
+
+async def press_buttons(done: asyncio.Event, latencies: list):
+    """Имитирует callback-и пользователей: каждый ждет своей очереди в event loop"""
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(CALLBACK_INTERVAL)
+        latencies.append(time.perf_counter() - started - CALLBACK_INTERVAL)
+
+
+async def check_parse_latency():
+    from services.hybrid_parser import template_parser
+    from services.line_dedup import line_dedup
+
+    # Копии с разными ценами, чтобы ни одна строка не была пропущена как повтор
+    base = EXAMPLES_FILE.read_text(encoding='utf-8')
+    text = '\n'.join(base.replace('000', f'00{copy}') for copy in range(PRICE_LIST_COPIES))
+    line_dedup.reset()
+
+    done = asyncio.Event()
+    latencies = []
+    buttons = asyncio.create_task(press_buttons(done, latencies))
+
+    started = time.perf_counter()
+    results = await template_parser.parse_message(text, "Тест задержки")
+    parse_time = time.perf_counter() - started
+    done.set()
+    await buttons
+
+    worst = max(latencies)
+    print(f"📄 Строк: {len(text.splitlines())}, распознано: {len(results['parsed_lines'])}, "
+          f"парсинг: {parse_time:.2f}с")
+    print(f"🖱️ Нажатий во время парсинга: {len(latencies)}, худшая задержка: {worst * 1000:.0f} мс")
+
+    assert len(results['parsed_lines']) > 0
+    assert parse_time > MAX_CALLBACK_LATENCY, "Прайс слишком мал, чтобы проверить задержку"
+    assert worst < MAX_CALLBACK_LATENCY, (
+        f"Нажатие ждало {worst * 1000:.0f} мс, допустимо {MAX_CALLBACK_LATENCY * 1000:.0f} мс"
+    )
+
+
+def test_parse_latency():
+    """Проверяет, что парсинг не блокирует обработку callback-ов"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: сохранения идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_parse_latency())
+        print("✅ Бот отвечает во время парсинга")
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_parse_latency()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тест истории цен: каждое сохранение прайса пишет изменившиеся цены в историю,
+последняя цена каждого источника доступна без чтения истории
+"""
+import asyncio
+import logging
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'db_app.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from services.db_gateway import db_gateway, db_read
+from services.price_history import price_history_service, encode_price, decode_price
+
+EXAMPLES_FILE = Path(__file__).parent / "bot" / "exampleprices.txt"
+TEST_DATABASE = 'file:test_price_history?mode=memory&cache=shared'
+
+
+@db_read
+def history_counts():
+    from db_app.models import PriceObservation, LatestPrice, PriceSource
+
+    return PriceObservation.objects.count(), LatestPrice.objects.count(), PriceSource.objects.count()
+
+
+@db_read
+def first_iphone():
+    from db_app.models import IPhone
+
+    iphone = IPhone.objects.order_by('pk').first()
+    return iphone.pk, iphone.price
+
+
+async def check_price_history():
+    from services.hybrid_parser import template_parser
+    from services.line_dedup import line_dedup
+
+    assert encode_price('80100.50') == 8010050 and decode_price(8010050) == Decimal('80100.50')
+
+    text = EXAMPLES_FILE.read_text(encoding='utf-8')
+    results = await template_parser.parse_message(text, "Канал A")
+    observations, latest, sources = await history_counts()
+    assert observations == latest > 0 and sources == 1, (observations, latest, sources)
+    assert latest <= results['total_saved']
+    print(f"✅ Первое сохранение: {observations} цен в истории")
+
+    # Повтор того же прайса не добавляет историю, другой источник - добавляет
+    line_dedup.reset()
+    await template_parser.parse_message(text, "Канал A")
+    assert (await history_counts())[0] == observations
+    line_dedup.reset()
+    await template_parser.parse_message(text, "Канал B")
+    assert await history_counts() == (2 * observations, 2 * latest, 2)
+    print("✅ Повтор прайса не растит историю, новый источник получает свои цены")
+
+    # Изменение цены: в истории две цены источника, в последних - новая
+    pk, price = await first_iphone()
+    line_dedup.reset()
+    await template_parser.parse_message(text.replace(str(int(price)), str(int(price) + 500)), "Канал A")
+    history = await price_history_service.get_history('IPhone', pk)
+    channel_a = [entry['price'] for entry in history if entry['source'] == "Канал A"]
+    assert channel_a == [price, price + 500], history
+    assert [entry['observed_at'] for entry in history] == sorted(entry['observed_at'] for entry in history)
+
+    latest_prices = await price_history_service.get_latest_prices('IPhone', pk)
+    assert [entry['source'] for entry in latest_prices] == ["Канал B", "Канал A"], latest_prices
+    assert latest_prices[1]['price'] == price + 500
+    print(f"✅ Изменение цены попало в историю: {[str(value) for value in channel_a]}")
+
+
+def test_price_history():
+    """Проверяет запись и чтение истории цен"""
+    logging.disable(logging.WARNING)
+    database = settings.DATABASES['default']
+    original_name = database['NAME']
+
+    # Общая база в памяти: сохранения идут из потоков DatabaseGateway
+    connections.close_all()
+    database['NAME'] = TEST_DATABASE
+    try:
+        call_command('migrate', verbosity=0)
+        asyncio.run(check_price_history())
+    finally:
+        db_gateway.close()
+        connections.close_all()
+        database['NAME'] = original_name
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    test_price_history()
@@ -0,0 +1,109 @@
+"""
+Пул воркеров: забирают сообщения поставщиков из очереди, парсят и сохраняют цены
+"""
+import asyncio
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional, Callable, Awaitable
+
+from utils import RawMessage
+
+# Корень проекта для импорта services/parsers
+sys.path.append(str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[RawMessage], Awaitable[None]]
+
+
+async def parse_and_save(raw: RawMessage):
+    """
+    Парсит сообщение шаблонами TemplateParser и сохраняет цены пачкой
+
+    BulkUpsertService не пробрасывает ошибки сохранения, а возвращает их
+    счетчиком failed: такое сообщение считается необработанным, чтобы
+    воркер повторил его, а не подтвердил несохраненные цены.
+    """
+    from services.hybrid_parser import template_parser
+
+    results = await template_parser.parse_message(raw.text, raw.source)
+    failed = {
+        device_type: save_result['failed']
+        for device_type, save_result in results['template_results'].items()
+        if save_result.get('failed', 0) > 0
+    }
+    if failed:
+        raise RuntimeError(f"не сохранены строки: {failed}")
+    logger.info(
+        f"Сообщение {raw.key} ({raw.source}): распознано {len(results['parsed_lines'])}, "
+        f"сохранено {results['total_saved']}"
+    )
+
+
+class PriceWorkerPool:
+    """
+    Воркеры по одному на шард очереди.
+
+    Воркер обрабатывает сообщения шарда строго по очереди и подтверждает
+    сообщение только после сохранения. При ошибке то же сообщение
+    повторяется с растущей паузой, не пропуская его вперед следующих -
+    так сохраняется порядок цен внутри канала. После max_attempts неудач
+    сообщение пропускается, чтобы одно битое сообщение не остановило канал.
+    """
+
+    def __init__(self, queue, handler: Optional[MessageHandler] = None,
+                 retry_delay: float = 1.0, max_retry_delay: float = 60.0, max_attempts: int = 5):
+        self.queue = queue
+        self.handler = handler or parse_and_save
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.processed = 0
+        self.skipped = 0
+        self.failed_attempts = 0
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Запускает по воркеру на каждый шард"""
+        await self.queue.connect()
+        self._tasks = [
+            asyncio.create_task(self._run(shard), name=f"price-worker-{shard}")
+            for shard in range(self.queue.shards)
+        ]
+        logger.info(f"Запущено воркеров парсинга: {len(self._tasks)}")
+
+    async def stop(self):
+        """Останавливает воркеры (неподтвержденные сообщения будут доставлены снова)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, shard: int):
+        while True:
+            message = await self.queue.get(shard)
+            if await self._process(message.raw):
+                self.processed += 1
+            else:
+                self.skipped += 1
+            await self.queue.ack(message)
+
+    async def _process(self, raw: RawMessage) -> bool:
+        """Обрабатывает сообщение с повторами при ошибке, возвращает успех"""
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.handler(raw)
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_attempts += 1
+                if attempt == self.max_attempts:
+                    logger.error(f"Сообщение {raw.key} пропущено после {attempt} попыток: {e}")
+                    return False
+                logger.error(f"Ошибка обработки сообщения {raw.key}: {e}, повтор через {delay:.1f}с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        return False
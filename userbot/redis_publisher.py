@@ -0,0 +1,166 @@
+"""
+Очередь сообщений поставщиков между Telethon-клиентом и воркерами парсинга
+
+Два backend-а с одним интерфейсом:
+- RedisQueue - Redis Streams с группой потребителей (боевой режим)
+- InMemoryQueue - asyncio-очереди в памяти процесса (тесты и запуск без Redis)
+
+Очередь разбита на шарды по каналу: порядок сообщений сохраняется внутри
+канала, а разные каналы обрабатываются параллельно. Сообщение удаляется из
+очереди только после ack, поэтому доставка "хотя бы один раз": если воркер
+упал, следующий get того же шарда вернет неподтвержденное сообщение снова.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from utils import RawMessage, shard_for
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis нужен только для RedisQueue
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueueMessage:
+    """Доставленное воркеру сообщение (подтверждается через ack)"""
+    raw: RawMessage
+    shard: int
+    delivery_id: str
+
+
+class InMemoryQueue:
+    """Очередь в памяти процесса с ограниченным размером шарда"""
+
+    def __init__(self, shards: int = 4, maxsize: int = 1000):
+        self.shards = shards
+        # Ограничение размера дает обратное давление: publish ждет, пока воркеры разгребут шард
+        self._queues = [asyncio.Queue(maxsize=maxsize) for _ in range(shards)]
+        self._unacked: Dict[int, QueueMessage] = {}
+        self._counter = 0
+
+    async def connect(self):
+        pass
+
+    async def publish(self, raw: RawMessage):
+        """Добавляет сообщение в шард его канала (ждет, если шард заполнен)"""
+        shard = shard_for(raw.channel_id, self.shards)
+        self._counter += 1
+        await self._queues[shard].put(QueueMessage(raw, shard, str(self._counter)))
+
+    async def get(self, shard: int) -> QueueMessage:
+        """Следующее сообщение шарда; неподтвержденное выдается повторно"""
+        message = self._unacked.get(shard)
+        if message is None:
+            message = await self._queues[shard].get()
+            self._unacked[shard] = message
+        return message
+
+    async def ack(self, message: QueueMessage):
+        """Подтверждает обработку сообщения"""
+        if self._unacked.get(message.shard) is message:
+            del self._unacked[message.shard]
+            self._queues[message.shard].task_done()
+
+    async def backlog(self) -> int:
+        """Количество необработанных сообщений"""
+        return sum(queue.qsize() for queue in self._queues) + len(self._unacked)
+
+    async def close(self):
+        pass
+
+
+class RedisQueue:
+    """
+    Очередь на Redis Streams.
+
+    Каждый шард - отдельный stream с группой потребителей. Воркер шарда читает
+    под постоянным именем, поэтому после перезапуска сначала получает свои
+    неподтвержденные сообщения (XREADGROUP с id 0), затем новые.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", shards: int = 4,
+                 maxsize: int = 10000, group: str = "price_workers",
+                 prefix: str = "prices", block_ms: int = 5000, poll_interval: float = 0.5):
+        if redis is None:
+            raise RuntimeError("Для RedisQueue нужен пакет redis (pip install redis)")
+
+        self.shards = shards
+        self.maxsize = maxsize
+        self.group = group
+        self.prefix = prefix
+        self.block_ms = block_ms
+        self.poll_interval = poll_interval
+        self.client = redis.from_url(url)
+
+    def _stream(self, shard: int) -> str:
+        return f"{self.prefix}:shard:{shard}"
+
+    def _consumer(self, shard: int) -> str:
+        return f"{self.group}-{shard}"
+
+    async def connect(self):
+        """Создает группы потребителей для всех шардов"""
+        for shard in range(self.shards):
+            try:
+                await self.client.xgroup_create(self._stream(shard), self.group, id='0', mkstream=True)
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    async def publish(self, raw: RawMessage):
+        """Добавляет сообщение в stream шарда, пока очередь переполнена - ждет"""
+        stream = self._stream(shard_for(raw.channel_id, self.shards))
+        # Обрезать stream по MAXLEN нельзя - потеряются необработанные цены,
+        # поэтому обратное давление делаем ожиданием на стороне издателя
+        while await self.client.xlen(stream) >= self.maxsize:
+            await asyncio.sleep(self.poll_interval)
+        await self.client.xadd(stream, {'data': raw.to_json()})
+
+    async def get(self, shard: int) -> QueueMessage:
+        """Следующее сообщение шарда: сначала неподтвержденные, затем новые"""
+        stream = self._stream(shard)
+        consumer = self._consumer(shard)
+
+        message = await self._read(stream, consumer, shard, '0', None)
+        while message is None:
+            message = await self._read(stream, consumer, shard, '>', self.block_ms)
+        return message
+
+    async def _read(self, stream: str, consumer: str, shard: int,
+                    last_id: str, block: Optional[int]) -> Optional[QueueMessage]:
+        response = await self.client.xreadgroup(self.group, consumer, {stream: last_id}, count=1, block=block)
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                if not fields:  # запись удалена из stream, но осталась в pending
+                    await self.client.xack(stream, self.group, entry_id)
+                    continue
+                delivery_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                return QueueMessage(RawMessage.from_json(fields[b'data']), shard, delivery_id)
+        return None
+
+    async def ack(self, message: QueueMessage):
+        """Подтверждает обработку и удаляет сообщение из stream"""
+        stream = self._stream(message.shard)
+        await self.client.xack(stream, self.group, message.delivery_id)
+        await self.client.xdel(stream, message.delivery_id)
+
+    async def backlog(self) -> int:
+        """Количество необработанных сообщений"""
+        return sum([await self.client.xlen(self._stream(shard)) for shard in range(self.shards)])
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_queue(backend: str = "memory", **kwargs):
+    """Создает очередь выбранного backend-а (memory или redis)"""
+    if backend == "redis":
+        return RedisQueue(**kwargs)
+    if backend == "memory":
+        return InMemoryQueue(shards=kwargs.get('shards', 4), maxsize=kwargs.get('maxsize', 1000))
+    raise ValueError(f"Неизвестный backend очереди: {backend}")
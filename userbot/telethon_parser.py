@@ -1,9 +1,10 @@
 import telethon
+from telethon import events
 import logging
-import re
-import json
+import os
 import asyncio
 import redis_publisher, utils
+from price_workers import PriceWorkerPool
 
 
 logger = logging.getLogger(__name__)
@@ -12,27 +13,71 @@ API_ID = 18463571
 API_HASH = "fbef9db453a528c2648220730edbff50"
 SESSION_NAME = "89004924269"
 
+# Каналы поставщиков через запятую (id или username), очередь и число воркеров
+CHANNELS = [channel.strip() for channel in os.getenv("USERBOT_CHANNELS", "").split(",") if channel.strip()]
+QUEUE_BACKEND = os.getenv("USERBOT_QUEUE", "redis")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WORKERS = int(os.getenv("USERBOT_WORKERS", "8"))
+
 
 class TelethonParser:
-    def __init__(self, session_name: str, api_id: int, api_hash: str):
+    def __init__(self, session_name: str, api_id: int, api_hash: str, queue=None, channels=None):
         self.session_name = session_name
         self.api_id = api_id
         self.api_hash = api_hash
         self.client = telethon.TelegramClient(session_name, api_id, api_hash, device_model="iPhone 12 Pro", system_version="4.16.30-CUSTOM")
+        self.queue = queue or redis_publisher.InMemoryQueue()
+        self.channels = [int(channel) if channel.lstrip('-').isdigit() else channel for channel in (channels or [])]
 
 
     async def start(self):
         await self.client.start()
+        # Новые и отредактированные прайсы поставщиков идут в очередь без парсинга:
+        # обработчик событий Telethon не блокируется регулярками и базой
+        chats = self.channels or None
+        self.client.add_event_handler(self.parse_message, events.NewMessage(chats=chats))
+        self.client.add_event_handler(self.parse_message, events.MessageEdited(chats=chats))
+        logger.info(f"Подписка на каналы поставщиков: {len(self.channels) or 'все'}")
 
     async def stop(self):
         await self.client.disconnect()
 
-    async def parse_message(self, message: telethon.types.Message):
-        pass
+    async def parse_message(self, event):
+        """Публикует сообщение канала в очередь парсинга (ждет, если очередь переполнена)"""
+        message = event.message
+        if not message.text:
+            return
 
+        chat = event.chat
+        raw = utils.RawMessage(
+            channel_id=event.chat_id,
+            message_id=message.id,
+            text=message.text,
+            source=getattr(chat, 'title', None) or str(event.chat_id),
+            date=message.date.isoformat() if message.date else ""
+        )
+        await self.queue.publish(raw)
 
-if __name__ == "__main__":
-    parser = TelethonParser(SESSION_NAME, API_ID, API_HASH)
-    asyncio.run(parser.start())
-    asyncio.run(parser.stop())
+    async def run_until_disconnected(self):
+        await self.client.run_until_disconnected()
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+    queue = redis_publisher.create_queue(QUEUE_BACKEND, url=REDIS_URL, shards=WORKERS)
+    workers = PriceWorkerPool(queue)
+    parser = TelethonParser(SESSION_NAME, API_ID, API_HASH, queue=queue, channels=CHANNELS)
+
+    await workers.start()
+    await parser.start()
+    try:
+        await parser.run_until_disconnected()
+    finally:
+        await parser.stop()
+        await workers.stop()
+        await queue.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+"""
+Общие структуры userbot: сообщение из канала поставщика и распределение по шардам
+"""
+import json
+import zlib
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class RawMessage:
+    """Сообщение канала поставщика в том виде, в котором оно идет через очередь"""
+    channel_id: int
+    message_id: int
+    text: str
+    source: str = ""
+    date: str = ""
+
+    @property
+    def key(self) -> str:
+        """Идентификатор сообщения (повторная доставка дает тот же ключ)"""
+        return f"{self.channel_id}:{self.message_id}"
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data) -> "RawMessage":
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return cls(**json.loads(data))
+
+
+def shard_for(channel_id: int, shards: int) -> int:
+    """
+    Шард очереди для канала.
+
+    Все сообщения одного канала попадают в один шард, а шард обрабатывает
+    один воркер, поэтому порядок сообщений внутри канала сохраняется.
+    crc32 вместо hash(): номер шарда должен совпадать между процессами.
+    """
+    return zlib.crc32(str(channel_id).encode('utf-8')) % shards